@@ -23,22 +23,17 @@ async def run_pinot_async_example():
         host='localhost', port=8000, path='/query/sql', scheme='http',
         verify_ssl=False, session=session, extra_request_headers="Database=default")
 
-    # launch 10 requests in parallel spanning a limit/offset range
-    reqs = []
-    step = 10
+    # extract the table with 10 queries over disjoint ranges of yearID, run
+    # in parallel
     num_requests = 10
     start = time.perf_counter()
-    for i in range(num_requests):
-        req = conn.execute(f"""
+    async for row in conn.extract("""
               SELECT *
               FROM baseballStats
-              LIMIT 10, {i * step}
-        """)
-        reqs.append(req)
-
-    for curs in await asyncio.gather(*reqs):
-        for row in curs:
-            print(row)
+              WHERE {partition}
+              LIMIT 100000
+        """, partition_by='yearID', parts=num_requests):
+        print(row)
 
     print(f'{num_requests} requests took {time.perf_counter() - start} '
           'seconds')
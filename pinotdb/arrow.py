@@ -0,0 +1,179 @@
+"""
+Decoding of broker responses in the Arrow IPC stream format.
+
+This module requires `pyarrow`, and is only imported by cursors created with
+`response_format="arrow"`.
+
+A broker answering in this format sends the result table as an Arrow stream,
+with the Pinot data type of each column in the `pinot.type` field metadata
+and the rest of the broker response (stats, exceptions...) as JSON in the
+`pinot.response` schema metadata. Both are optional: column types are then
+derived from the Arrow ones.
+"""
+
+import json
+
+import ciso8601
+import pyarrow as pa
+
+from pinotdb.db import get_value_converter
+
+MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+_PINOT_TYPES = (
+    (pa.types.is_boolean, "BOOLEAN"),
+    (pa.types.is_int32, "INT"),
+    (pa.types.is_integer, "LONG"),
+    (pa.types.is_float32, "FLOAT"),
+    (pa.types.is_floating, "DOUBLE"),
+    (pa.types.is_decimal, "BIG_DECIMAL"),
+    (pa.types.is_timestamp, "TIMESTAMP"),
+    (pa.types.is_binary, "BYTES"),
+    (pa.types.is_large_binary, "BYTES"),
+    (pa.types.is_fixed_size_binary, "BYTES"),
+    (pa.types.is_map, "MAP"),
+)
+
+
+def is_arrow_response(response):
+    return response.headers.get("Content-Type", "").startswith(MEDIA_TYPE)
+
+
+def get_column_data_type(field):
+    if field.metadata and b"pinot.type" in field.metadata:
+        return field.metadata[b"pinot.type"].decode()
+    arrow_type = field.type
+    suffix = ""
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type):
+        arrow_type = arrow_type.value_type
+        suffix = "_ARRAY"
+    for check, data_type in _PINOT_TYPES:
+        if check(arrow_type):
+            return data_type + suffix
+    return "STRING" + suffix
+
+
+def read_table(content):
+    return pa.ipc.open_stream(content).read_all()
+
+
+def get_payload(table):
+    """
+    Return the broker response carried along with `table`, with the schema
+    of the table - but not its rows - as result table.
+    """
+    metadata = table.schema.metadata or {}
+    payload = json.loads(metadata.get(b"pinot.response", b"{}"))
+    payload["resultTable"] = {
+        "dataSchema": {
+            "columnNames": table.column_names,
+            "columnDataTypes": [
+                get_column_data_type(field) for field in table.schema],
+        },
+    }
+    return payload
+
+
+def _is_list(arrow_type):
+    return pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type)
+
+
+def _is_string(arrow_type):
+    return (
+        pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type))
+
+
+def _is_binary(arrow_type):
+    return (
+        pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type)
+        or pa.types.is_fixed_size_binary(arrow_type))
+
+
+def _convert_lists(column, convert):
+    """
+    Return the lists of the list `column`, with their values converted all
+    at once rather than list by list.
+    """
+    lists = []
+    for chunk in column.chunks:
+        offsets = chunk.offsets.to_pylist()
+        start = offsets[0]
+        # Also the values of null lists, which offsets account for.
+        values = chunk.values.slice(start, offsets[-1] - start)
+        if pa.types.is_timestamp(values.type):
+            values = values.cast(pa.string())
+        values = values.to_pylist()
+        if values.count(None):
+            values = [
+                convert(value) if value is not None else None
+                for value in values
+            ]
+        else:
+            values = list(map(convert, values))
+        for valid, begin, end in zip(
+                chunk.is_valid().to_pylist(), offsets, offsets[1:]):
+            lists.append(values[begin - start:end - start] if valid else None)
+    return lists
+
+
+def get_rows(table, types):
+    """
+    Return the rows of `table`, converted like the rows of JSON responses.
+
+    Values are read column by column; only columns sent as strings (e.g.
+    JSON ones) are converted cell by cell, as natively typed ones are already
+    read as the expected Python objects. The values of multi-value columns
+    needing conversion are converted all together.
+    """
+    columns = []
+    for column, data_type in zip(table.columns, types):
+        value_type = (
+            column.type.value_type if _is_list(column.type) else None)
+        if pa.types.is_timestamp(column.type):
+            # pyarrow creates datetimes much slower than ciso8601 parses
+            # their string representation.
+            strings = column.cast(pa.string()).to_pylist()
+            values = (
+                list(map(ciso8601.parse_datetime, strings))
+                if not column.null_count else [
+                    ciso8601.parse_datetime(value) if value is not None
+                    else None
+                    for value in strings
+                ]
+            )
+        elif value_type is not None and pa.types.is_timestamp(value_type):
+            values = _convert_lists(column, ciso8601.parse_datetime)
+        elif _is_binary(column.type):
+            # BYTES are sent as hex strings in JSON responses.
+            values = [
+                value.hex() if value is not None else None
+                for value in column.to_pylist()
+            ]
+        elif value_type is not None and _is_binary(value_type):
+            values = _convert_lists(column, bytes.hex)
+        elif (
+            value_type is not None and data_type.needs_conversion
+            and _is_string(value_type)
+        ):
+            values = _convert_lists(column, get_value_converter(data_type))
+        elif pa.types.is_map(column.type):
+            values = [
+                dict(value) if value is not None else None
+                for value in column.to_pylist()
+            ]
+        elif data_type.needs_conversion and _is_string(column.type):
+            convert = get_value_converter(data_type)
+            values = [
+                convert(value) if value is not None else None
+                for value in column.to_pylist()
+            ]
+        else:
+            values = column.to_pylist()
+        columns.append(values)
+    return list(map(list, zip(*columns)))
+
+
+def rows_to_table(column_names, rows):
+    columns = list(zip(*rows)) if rows else [()] * len(column_names)
+    return pa.table(
+        [pa.array(column) for column in columns], names=column_names)
@@ -1,19 +1,28 @@
-import asyncio
-from functools import wraps
+from functools import lru_cache, wraps
 from typing import Any
 
-import ciso8601
-import json
+import importlib.util
 import logging
-import uuid
-from collections import namedtuple
+import math
+import re
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from enum import Enum
-from pprint import pformat
 
-import httpx
 from urllib import parse
 
-from pinotdb import exceptions
+from pinotdb import exceptions, metrics, timings, tracing
+from pinotdb.lazy import LazyModule
+
+# Imported when first used, to keep `import pinotdb` fast.
+asyncio = LazyModule("asyncio")
+ciso8601 = LazyModule("ciso8601")
+decimal = LazyModule("decimal")
+httpx = LazyModule("httpx")
+json = LazyModule("json")
+pprint = LazyModule("pprint")
+uuid = LazyModule("uuid")
 
 logger = logging.getLogger(__name__)
 
@@ -73,7 +82,7 @@ def check_result(f):
 
     @wraps(f)
     def g(self, *args, **kwargs):
-        if self._results is None:
+        if self._rows is None:
             raise exceptions.Error("Called before `execute`")
         return f(self, *args, **kwargs)
 
@@ -114,40 +123,400 @@ def get_query_stats(payload):
     }
 
 
+def get_response_sizes(response):
+    """
+    Return the number of bytes of a broker response as transferred (possibly
+    compressed) and once decompressed, if known.
+    """
+    if not isinstance(response, httpx.Response):
+        return {}
+    decompressed = len(response.content)
+    compressed = response.num_bytes_downloaded
+    if not compressed:
+        # Responses not read from the network (e.g. from a mock transport)
+        # don't count their downloaded bytes.
+        content_length = response.headers.get("Content-Length", "")
+        compressed = (
+            int(content_length) if content_length.isdigit()
+            else decompressed)
+    return {
+        "compressedResponseBytes": compressed,
+        "decompressedResponseBytes": decompressed,
+    }
+
+
+class Preview:
+    """
+    Preview of a payload or rows to log, only formatted if logged, and capped
+    to the first `max_rows` rows (also of the result table of a payload) and
+    `max_chars` characters.
+    """
+
+    __slots__ = ("value", "max_rows", "max_chars")
+
+    def __init__(self, value, max_rows=10, max_chars=2000):
+        self.value = value
+        self.max_rows = max_rows
+        self.max_chars = max_chars
+
+    def _head(self, rows):
+        if len(rows) <= self.max_rows:
+            return rows
+        return rows[:self.max_rows] + [
+            f"... {len(rows) - self.max_rows} more rows"]
+
+    def _capped(self):
+        value = self.value
+        if isinstance(value, list):
+            return self._head(value)
+        table = value.get("resultTable") if isinstance(value, dict) else None
+        if isinstance(table, dict) and isinstance(table.get("rows"), list):
+            return {
+                **value,
+                "resultTable": {**table, "rows": self._head(table["rows"])},
+            }
+        return value
+
+    def __str__(self):
+        text = pprint.pformat(self._capped())
+        if len(text) > self.max_chars:
+            text = f"{text[:self.max_chars]}... ({len(text)} characters)"
+        return text
+
+    __repr__ = __str__
+
+
+# Content encodings httpx can only decode with an extra package installed.
+_COMPRESSION_MODULES = {
+    "br": ("brotli", "brotlicffi"),
+    "zstd": ("zstandard",),
+}
+_COMPRESSIONS = frozenset({"gzip", "deflate", "identity", "br", "zstd"})
+
+
+def get_accept_encoding(compression):
+    """Return the `Accept-Encoding` header value for a `compression`."""
+    encodings = [e.strip() for e in compression.split(",")]
+    for encoding in encodings:
+        if encoding not in _COMPRESSIONS:
+            raise exceptions.NotSupportedError(
+                f"Unknown compression {encoding!r}, expected one of "
+                f"{', '.join(sorted(_COMPRESSIONS))}"
+            )
+        modules = _COMPRESSION_MODULES.get(encoding, ())
+        if modules and not any(
+            importlib.util.find_spec(m) is not None for m in modules
+        ):
+            raise exceptions.NotSupportedError(
+                f"The {encoding!r} compression requires the {modules[0]} "
+                f"package, e.g. installed with `pip install "
+                f"httpx[{'brotli' if encoding == 'br' else encoding}]`"
+            )
+    return ", ".join(encodings)
+
+
+def import_arrow():
+    """Return the `pinotdb.arrow` module, provided pyarrow is installed."""
+    if importlib.util.find_spec("pyarrow") is None:
+        raise exceptions.NotSupportedError(
+            "The Arrow format requires the pyarrow package")
+    return importlib.import_module("pinotdb.arrow")
+
+
 TypeCodeAndValue = namedtuple(
     "TypeCodeAndValue", ["code", "is_iterable", "needs_conversion"]
 )
 
 
+# Type code, and whether values need to be converted, by base type of a
+# column (i.e. without `_ARRAY`); values of other types (e.g. OBJECT or
+# UNKNOWN) are returned as sent.
+_TYPE_CODES = {
+    "INT": (Type.NUMBER, False),
+    "LONG": (Type.NUMBER, False),
+    "FLOAT": (Type.NUMBER, False),
+    "DOUBLE": (Type.NUMBER, False),
+    # Sent as strings, not to lose precision.
+    "BIG_DECIMAL": (Type.NUMBER, True),
+    "STRING": (Type.STRING, False),
+    "BYTES": (Type.STRING, False),
+    "BOOLEAN": (Type.BOOLEAN, False),
+    "TIMESTAMP": (Type.TIMESTAMP, True),
+    "JSON": (Type.JSON, True),
+    # Sent as JSON objects.
+    "MAP": (Type.JSON, False),
+}
+_OTHER_TYPE_CODE = (Type.STRING, False)
+
+# Column data types of Pinot (`DataSchema.ColumnDataType`).
+PINOT_DATA_TYPES = (
+    "INT", "LONG", "FLOAT", "DOUBLE", "BIG_DECIMAL", "BOOLEAN", "TIMESTAMP",
+    "STRING", "JSON", "BYTES", "OBJECT", "MAP", "UNKNOWN",
+    "INT_ARRAY", "LONG_ARRAY", "FLOAT_ARRAY", "DOUBLE_ARRAY", "BOOLEAN_ARRAY",
+    "TIMESTAMP_ARRAY", "STRING_ARRAY", "BYTES_ARRAY",
+)
+
+
+def parse_column_data_type(column_data_type):
+    """Return the `TypeCodeAndValue` of a column data type."""
+    data_type, array, _ = column_data_type.partition("_ARRAY")
+    code, needs_conversion = _TYPE_CODES.get(data_type, _OTHER_TYPE_CODE)
+    return TypeCodeAndValue(code, bool(array), needs_conversion)
+
+
+# Types of all the Pinot column data types, shared by all results.
+COLUMN_TYPES = {
+    column_data_type: parse_column_data_type(column_data_type)
+    for column_data_type in PINOT_DATA_TYPES
+}
+
+
+@lru_cache(maxsize=256)
+def _get_types(column_data_types):
+    return tuple(
+        COLUMN_TYPES.get(column_data_type)
+        or parse_column_data_type(column_data_type)
+        for column_data_type in column_data_types
+    )
+
+
 def get_types_from_column_data_types(column_data_types):
-    types = [None] * len(column_data_types)
-    for column_index, column_data_type in enumerate(column_data_types):
-        data_type = column_data_type.split("_")[0]
-        is_iterable = "_ARRAY" in column_data_type
-        if (
-            data_type == "INT"
-            or data_type == "LONG"
-            or data_type == "FLOAT"
-            or data_type == "DOUBLE"
-        ):
-            types[column_index] = TypeCodeAndValue(
-                Type.NUMBER, is_iterable, False)
-        elif data_type == "STRING" or data_type == "BYTES":
-            types[column_index] = TypeCodeAndValue(
-                Type.STRING, is_iterable, False)
-        elif data_type == "BOOLEAN":
-            types[column_index] = TypeCodeAndValue(
-                Type.BOOLEAN, is_iterable, False)
-        elif data_type == "TIMESTAMP":
-            types[column_index] = TypeCodeAndValue(
-                Type.TIMESTAMP, is_iterable, True)
-        elif data_type == "JSON":
-            types[column_index] = TypeCodeAndValue(
-                Type.JSON, is_iterable, True)
-        else:
-            types[column_index] = TypeCodeAndValue(
-                Type.STRING, is_iterable, True)
-    return types
+    """
+    Return the `TypeCodeAndValue` of each of `column_data_types`, remembered
+    for the last schemas, which queries tend to repeat.
+    """
+    return _get_types(tuple(column_data_types))
+
+
+PARTITION_PLACEHOLDER = "{partition}"
+
+
+_FROM_TABLE = re.compile(r"\bFROM\s+([^\s,()]+)", re.IGNORECASE)
+
+
+def get_table_name(query):
+    """Return the first table queried by `query`, if found."""
+    match = _FROM_TABLE.search(query)
+    return match.group(1) if match else None
+
+
+def get_partition_bounds_query(query, partition_by):
+    table = get_table_name(query)
+    if not table:
+        raise exceptions.ProgrammingError(
+            f"Could not find the table queried in\n\n{query}\n\n"
+            "pass the bounds of the partitioning column instead"
+        )
+    return f"SELECT MIN({partition_by}), MAX({partition_by}) FROM {table}"
+
+
+# Integers beyond which doubles can't represent every integer.
+_MAX_EXACT_FLOAT_INT = 2 ** 53
+
+
+def _widen_bound(bound, direction):
+    """
+    Return the integral `bound` as an int, moved away by the rounding error
+    of the double it may have been read as (e.g. the MIN/MAX of a LONG).
+    """
+    if isinstance(bound, float) and abs(bound) > _MAX_EXACT_FLOAT_INT:
+        bound += direction * math.ulp(bound)
+    return int(bound)
+
+
+def get_partition_conditions(partition_by, low, high, parts):
+    """
+    Split the `[low, high]` range of `partition_by` values into at most
+    `parts` disjoint range conditions.
+    """
+    if (
+        low is None or high is None
+        or not (math.isfinite(low) and math.isfinite(high))
+        or low > high
+    ):
+        # Pinot returns infinite bounds for empty tables.
+        return []
+    if float(low).is_integer() and float(high).is_integer():
+        low, high = _widen_bound(low, -1), _widen_bound(high, 1)
+        step = -(-(high - low + 1) // parts)
+        boundaries = [*range(low, high + 1, step), high + 1]
+    else:
+        # Computed once, so that each range ends exactly where the next one
+        # starts; ranges left empty by rounding are skipped.
+        boundaries = [low]
+        for i in range(1, parts):
+            bound = low + (high - low) * i / parts
+            if boundaries[-1] < bound < high:
+                boundaries.append(bound)
+        boundaries.append(high)
+    conditions = [
+        f"{partition_by} >= {start} AND {partition_by} < {end}"
+        for start, end in zip(boundaries[:-2], boundaries[1:-1])
+    ]
+    conditions.append(
+        f"{partition_by} >= {boundaries[-2]} AND {partition_by} <= {high}")
+    return conditions
+
+
+def get_partition_queries(query, partition_by, parts, bounds):
+    if PARTITION_PLACEHOLDER not in query:
+        raise exceptions.ProgrammingError(
+            f"Expected a {PARTITION_PLACEHOLDER} placeholder for the "
+            f"partition condition in\n\n{query}"
+        )
+    return [
+        query.replace(PARTITION_PLACEHOLDER, f"({condition})")
+        for condition in get_partition_conditions(
+            partition_by, *bounds, parts)
+    ]
+
+
+def _option_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    raise ValueError(value)
+
+
+def _serialize_option(value):
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+def _option_int(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+    return int(value)
+
+
+class QueryOptions:
+    """
+    Pinot query options, sent along with queries as `queryOptions`.
+
+    Options are given as keyword arguments, a mapping or a string in the
+    broker format, e.g. `"timeoutMs=10000;useMultistageEngine=true"`. Values
+    of the well-known options below are checked and converted to their type,
+    others are sent as given.
+
+        >>> options = QueryOptions(timeoutMs=5000, maxExecutionThreads=4)
+        >>> str(options.merge("useMultistageEngine=true"))
+        'timeoutMs=5000;maxExecutionThreads=4;useMultistageEngine=true'
+
+    Instances are immutable, and serialized only once.
+    """
+
+    TYPES = {
+        "timeoutMs": _option_int,
+        "maxExecutionThreads": _option_int,
+        "numGroupsLimit": _option_int,
+        "minSegmentGroupTrimSize": _option_int,
+        "minServerGroupTrimSize": _option_int,
+        "groupTrimThreshold": _option_int,
+        "maxServerResponseSizeBytes": _option_int,
+        "maxQueryResponseSizeBytes": _option_int,
+        "numReplicaGroupsToQuery": _option_int,
+        "maxRowsInJoin": _option_int,
+        "useMultistageEngine": _option_bool,
+        "enableNullHandling": _option_bool,
+        "preserveType": _option_bool,
+        "skipUpsert": _option_bool,
+        "useStarTree": _option_bool,
+        "explainPlanVerbose": _option_bool,
+    }
+
+    def __init__(self, options=None, **kwargs):
+        if isinstance(options, QueryOptions):
+            options = options._options
+        elif isinstance(options, str):
+            options = self.parse(options)
+        self._options = {}
+        for key, value in [*(options or {}).items(), *kwargs.items()]:
+            # Unset options are skipped, to ease building them conditionally.
+            if value is not None:
+                self._options[key] = self._convert(key, value)
+        self._serialized = None
+
+    @staticmethod
+    def parse(options):
+        """Parse options in the broker format into a dict."""
+        parsed = {}
+        for option in options.split(";"):
+            if not option.strip():
+                continue
+            key, sep, value = option.partition("=")
+            if not sep:
+                raise exceptions.ProgrammingError(
+                    f"Invalid query option {option!r}, expected key=value")
+            parsed[key.strip()] = value.strip()
+        return parsed
+
+    @classmethod
+    def _convert(cls, key, value):
+        convert = cls.TYPES.get(key)
+        if convert is None:
+            return value
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            raise exceptions.ProgrammingError(
+                f"Invalid value {value!r} for query option {key!r}")
+
+    def merge(self, *others):
+        """
+        Return these options updated with `others` (`QueryOptions`, mappings
+        or strings), the last ones taking precedence.
+        """
+        others = [
+            other if isinstance(other, QueryOptions) else QueryOptions(other)
+            for other in others if other
+        ]
+        if not any(others):
+            return self
+        merged = QueryOptions(self)
+        for other in others:
+            merged._options.update(other._options)
+        return merged
+
+    def get(self, key, default=None):
+        return self._options.get(key, default)
+
+    def __getitem__(self, key):
+        return self._options[key]
+
+    def __contains__(self, key):
+        return key in self._options
+
+    def __iter__(self):
+        return iter(self._options)
+
+    def __len__(self):
+        return len(self._options)
+
+    def __eq__(self, other):
+        if not isinstance(other, QueryOptions):
+            return NotImplemented
+        return self._options == other._options
+
+    def __str__(self):
+        if self._serialized is None:
+            self._serialized = ";".join(
+                f"{key}={_serialize_option(value)}"
+                for key, value in self._options.items()
+            )
+        return self._serialized
+
+    def __repr__(self):
+        return f"QueryOptions({self._options!r})"
+
+
+def get_server_timeout_ms(timeout):
+    """
+    Return the broker `timeoutMs` for a client `timeout` in seconds, leaving
+    the broker some time (a tenth of the timeout, up to a second) to answer
+    before the client gives up.
+    """
+    timeout_ms = timeout * 1000
+    return max(1, int(timeout_ms - min(timeout_ms / 10, 1000)))
 
 
 class Connection:
@@ -160,6 +529,7 @@ class Connection:
         self.closed = False
         self.use_multistage_engine = kwargs.get('use_multistage_engine', False)
         self.query_options = kwargs.get('query_options', None)
+        self.slow_query_log = kwargs.get('slow_query_log')
         self.cursors = []
         self.session = kwargs.get('session')
         self.is_session_external = False
@@ -175,6 +545,11 @@ class Connection:
     def close(self):
         """Close the connection now."""
         self.closed = True
+        # Cursors share the session, which the first one closed closes: the
+        # stored responses of all of them are deleted before that.
+        for cursor in self.cursors:
+            if not cursor.closed:
+                cursor._close_pager()
         for cursor in self.cursors:
             try:
                 cursor.close()
@@ -194,8 +569,15 @@ class Connection:
         pass
 
     @check_closed
-    def cursor(self):
-        """Return a new Cursor Object using the connection."""
+    def cursor(self, server_side=None, query_options=None):
+        """
+        Return a new Cursor Object using the connection.
+
+        Passing `server_side=True` makes the cursor page through results kept
+        in the broker's response store instead of loading them at once.
+        `query_options` are added to those of the connection for the queries
+        of the cursor.
+        """
         if not self.session or self.session.is_closed:
             self.session = httpx.Client(
                 verify=self._kwargs.get('verify_ssl'),
@@ -207,7 +589,16 @@ class Connection:
             )
 
         self._kwargs['session'] = self.session
-        cursor = Cursor(*self._args, **self._kwargs)
+        kwargs = self._kwargs
+        if server_side is not None:
+            kwargs = {**kwargs, 'server_side': server_side}
+        if query_options:
+            kwargs = {
+                **kwargs,
+                'query_options': QueryOptions(
+                    kwargs.get('query_options')).merge(query_options),
+            }
+        cursor = Cursor(*self._args, **kwargs)
         self.cursors.append(cursor)
 
         return cursor
@@ -215,7 +606,78 @@ class Connection:
     @check_closed
     def execute(self, operation, parameters=None):
         cursor = self.cursor()
-        return cursor.execute(operation, parameters, self.query_options)
+        return cursor.execute(operation, parameters)
+
+    @check_closed
+    def prepare(self, operation):
+        """
+        Return a `PreparedStatement` for `operation`, to be executed in its
+        place when running it many times with different parameters, without
+        parsing it again every time.
+
+            >>> statement = conn.prepare('SELECT * FROM t WHERE id = %(id)s')
+            >>> for id in ids:
+            ...     curs.execute(statement, {'id': id})
+
+        """
+        return PreparedStatement(
+            operation, self._kwargs.get("paramstyle", "pyformat"))
+
+    @check_closed
+    def extract(
+            self, query, partition_by, parts=4, bounds=None, ordered=True,
+            max_workers=None, parameters=None
+    ):
+        """
+        Run `query` as `parts` queries over disjoint ranges of the
+        `partition_by` column, at most `max_workers` (defaults to `parts`) at
+        a time, and return an iterator over the rows of all of them.
+
+        The query needs a `{partition}` placeholder for the range condition,
+        e.g. `SELECT * FROM t WHERE {partition} AND x > 0 LIMIT 1000000`.
+        The range of values is read with `MIN`/`MAX` from the queried table
+        unless given as `bounds=(low, high)`. Rows are returned partition by
+        partition in range order, or as partitions complete if `ordered` is
+        false.
+
+        Partitions are read with server-side cursors: only the first page of
+        those waiting for their turn is kept in memory, and the others are
+        read as the partition is iterated over.
+        """
+        if bounds is None:
+            bounds = self.execute(
+                get_partition_bounds_query(query, partition_by)).fetchone()
+        queries = get_partition_queries(query, partition_by, parts, bounds)
+        # Cursors (and the session) are created upfront, as they aren't
+        # meant to be created concurrently.
+        cursors = [self.cursor(server_side=True) for _ in queries]
+        return self._extract(
+            cursors, queries, parameters, ordered, max_workers or parts)
+
+    def _extract(self, cursors, queries, parameters, ordered, max_workers):
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pinotdb-extract")
+        try:
+            futures = [
+                executor.submit(cursor.execute, query, parameters)
+                for cursor, query in zip(cursors, queries)
+            ]
+            for future in futures if ordered else as_completed(futures):
+                cursor = future.result()
+                yield from cursor
+                self._release_cursor(cursor)
+        finally:
+            # Queries still running are waited for, to release their cursors.
+            executor.shutdown(wait=True, cancel_futures=True)
+            for cursor in cursors:
+                self._release_cursor(cursor)
+
+    def _release_cursor(self, cursor):
+        # Closing the cursor would close the session shared with the others.
+        if cursor in self.cursors:
+            cursor._close_pager()
+            cursor.closed = True
+            self.cursors.remove(cursor)
 
     def __enter__(self):
         return self.cursor()
@@ -231,7 +693,7 @@ class AsyncConnection(Connection):
             assert isinstance(self.session, httpx.AsyncClient)
 
     @check_closed
-    def cursor(self):
+    def cursor(self, server_side=None, query_options=None):
         """Return a new Cursor Object using the connection."""
         if not self.session or self.session.is_closed:
             self.session = httpx.AsyncClient(
@@ -244,7 +706,16 @@ class AsyncConnection(Connection):
             )
 
         self._kwargs['session'] = self.session
-        cursor = AsyncCursor(*self._args, **self._kwargs)
+        kwargs = self._kwargs
+        if server_side is not None:
+            kwargs = {**kwargs, 'server_side': server_side}
+        if query_options:
+            kwargs = {
+                **kwargs,
+                'query_options': QueryOptions(
+                    kwargs.get('query_options')).merge(query_options),
+            }
+        cursor = AsyncCursor(*self._args, **kwargs)
         self.cursors.append(cursor)
 
         return cursor
@@ -253,6 +724,12 @@ class AsyncConnection(Connection):
     async def close(self):
         """Close the connection now."""
         self.closed = True
+        # Cursors share the session, which the first one closed closes: the
+        # stored responses of all of them are deleted before that.
+        await asyncio.gather(*(
+            cursor._aclose_pager() for cursor in self.cursors
+            if not cursor.closed
+        ))
         close_reqs = []
         for cursor in self.cursors:
             try:
@@ -268,7 +745,52 @@ class AsyncConnection(Connection):
     @check_closed
     async def execute(self, operation, parameters=None):
         cursor = self.cursor()
-        return await cursor.execute(operation, parameters, self.query_options)
+        return await cursor.execute(operation, parameters)
+
+    @check_closed
+    async def extract(
+            self, query, partition_by, parts=4, bounds=None, ordered=True,
+            max_workers=None, parameters=None
+    ):
+        """
+        Asynchronous flavour of `Connection.extract`, to be iterated with
+        `async for`; partitions are queried concurrently by tasks.
+        """
+        if bounds is None:
+            cursor = await self.execute(
+                get_partition_bounds_query(query, partition_by))
+            bounds = cursor.fetchone()
+        queries = get_partition_queries(query, partition_by, parts, bounds)
+        semaphore = asyncio.Semaphore(max_workers or parts)
+        cursors = [self.cursor(server_side=True) for _ in queries]
+
+        async def execute(cursor, query):
+            async with semaphore:
+                return await cursor.execute(query, parameters)
+
+        tasks = [
+            asyncio.ensure_future(execute(cursor, query))
+            for cursor, query in zip(cursors, queries)
+        ]
+        try:
+            for task in tasks if ordered else asyncio.as_completed(tasks):
+                cursor = await task
+                async for row in cursor:
+                    yield row
+                await self._release_cursor(cursor)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for cursor in cursors:
+                await self._release_cursor(cursor)
+
+    async def _release_cursor(self, cursor):
+        # Closing the cursor would close the session shared with the others.
+        if cursor in self.cursors:
+            await cursor._aclose_pager()
+            cursor.closed = True
+            self.cursors.remove(cursor)
 
     async def __aenter__(self):
         return self.cursor()
@@ -277,32 +799,264 @@ class AsyncConnection(Connection):
         await self.close()
 
 
-def convert_result_if_required(data_types, rows):
-    needs_conversion = any(t.needs_conversion for t in data_types)
-    if not needs_conversion:
-        return rows
-    for i, t in enumerate(data_types):
-        if t.needs_conversion:
+def _json_parser():
+    loads = json.loads
+
+    def parse_json(value):
+        # Pinot returns JSON as STRING
+        return loads(value) if value != '' else None
+
+    return parse_json
+
+
+def _decimal_parser():
+    Decimal = decimal.Decimal
+
+    def parse_decimal(value):
+        # Pinot returns BIG_DECIMAL as STRING
+        return Decimal(str(value))
+
+    return parse_decimal
+
+
+def get_value_converter(data_type):
+    """
+    Return the function converting the (single) values of `data_type` to
+    Python objects, or None if they are sent as such. The functions of the
+    lazily imported modules are looked up once here, not for every value.
+    """
+    if not data_type.needs_conversion:
+        return None
+    if data_type.code == Type.TIMESTAMP:
+        # Pinot returns TIMESTAMP as STRING
+        return ciso8601.parse_datetime
+    if data_type.code == Type.JSON:
+        return _json_parser()
+    if data_type.code == Type.NUMBER:
+        return _decimal_parser()
+    return json.dumps
+
+
+@lru_cache(maxsize=256)
+def get_row_converter(data_types):
+    """
+    Compile the conversion of rows of columns of `data_types` (a tuple), as
+    the index, value converter and whether it is multi-value (`_ARRAY`) of
+    each column needing it.
+    """
+    plan = []
+    for i, data_type in enumerate(data_types):
+        convert = get_value_converter(data_type)
+        if convert is not None:
+            plan.append((i, convert, data_type.is_iterable))
+    return tuple(plan)
+
+
+def convert_rows(row_converter, rows):
+    """Convert `rows` in place with a plan from `get_row_converter`."""
+    for i, convert, multi_value in row_converter:
+        if not multi_value:
             for row in rows:
-                if row[i] is not None:
-                    row[i] = convert_result(t, row[i])
+                value = row[i]
+                if value is not None:
+                    row[i] = convert(value)
+            continue
+        for row in rows:
+            values = row[i]
+            if not values:
+                continue
+            # Values of multi-value columns are hardly ever null.
+            if None in values:
+                row[i] = [
+                    convert(value) if value is not None else None
+                    for value in values
+                ]
+            else:
+                row[i] = list(map(convert, values))
     return rows
 
 
+def convert_result_if_required(data_types, rows):
+    return convert_rows(get_row_converter(tuple(data_types)), rows)
+
+
 def convert_result(data_type, raw_row):
-    if data_type.code == Type.TIMESTAMP:
-        # Pinot returns TIMESTAMP as STRING
-        return ciso8601.parse_datetime(raw_row)
-    elif data_type.code == Type.JSON:
-        # Pinot returns JSON as STRING
-        return json.loads(raw_row) if raw_row != '' else None
-    else:
-        return json.dumps(raw_row)
+    convert = get_value_converter(data_type) or json.dumps
+    return convert(raw_row)
+
+
+class ResponseStorePager:
+    """
+    Reads the pages of a query result kept in a broker's response store.
+
+    Brokers asked for a cursor (`getCursor=true`) answer with the first page
+    of rows only, along with the `requestId` under which the whole result is
+    stored; the following pages are read from
+    `/responseStore/{requestId}/results`, and the stored response is deleted
+    once the cursor is done with it.
+    """
+
+    def __init__(self, cursor, request_id, offset, num_rows):
+        self.cursor = cursor
+        self.url = cursor.broker_url(f"/responseStore/{request_id}")
+        # offset of the next page to be read
+        self.offset = offset
+        # total number of rows in the stored result
+        self.num_rows = num_rows
+
+    @property
+    def has_more_pages(self):
+        return self.offset < self.num_rows
+
+    def next_page_request(self):
+        url = f"{self.url}/results"
+        params = {"offset": self.offset, "numRows": self.cursor.page_size}
+        self.offset += self.cursor.page_size
+        return url, params
+
+    def fetch_page(self, url, params):
+        """Return the rows of a page, along with its size in bytes."""
+        r = self.cursor.session.get(
+            url, params=params, **self.cursor.auth_kwargs())
+        return self.cursor.normalize_page_response(url, r), len(r.content)
+
+    def next_page(self):
+        rows, _ = self.fetch_page(*self.next_page_request())
+        return rows
+
+    def can_delete(self):
+        if self.cursor.session.is_closed:
+            logger.warning(
+                "Could not delete the stored response at %s, as the session "
+                "is closed; the broker expires it eventually", self.url)
+            return False
+        return True
+
+    def close(self):
+        if not self.can_delete():
+            return
+        try:
+            self.cursor.session.delete(
+                self.url, **self.cursor.auth_kwargs())
+        except httpx.HTTPError as e:
+            logger.warning(
+                f"Could not delete the stored response at {self.url}: {e}")
+
+
+class AsyncResponseStorePager(ResponseStorePager):
+    async def fetch_page(self, url, params):
+        """Return the rows of a page, along with its size in bytes."""
+        r = await self.cursor.session.get(
+            url, params=params, **self.cursor.auth_kwargs())
+        return self.cursor.normalize_page_response(url, r), len(r.content)
+
+    async def next_page(self):
+        rows, _ = await self.fetch_page(*self.next_page_request())
+        return rows
+
+    async def close(self):
+        if not self.can_delete():
+            return
+        try:
+            await self.cursor.session.delete(
+                self.url, **self.cursor.auth_kwargs())
+        except httpx.HTTPError as e:
+            logger.warning(
+                f"Could not delete the stored response at {self.url}: {e}")
+
+
+class PrefetchMixin:
+    """
+    Reads up to `prefetch_pages` pages ahead of the one being consumed, or
+    fewer if they'd take more than `prefetch_max_bytes` - going by the
+    largest page read so far.
+    """
+
+    def init_prefetch(self):
+        # pages requested ahead, oldest first
+        self.pending = deque()
+        self.page_bytes = 0
+
+    @property
+    def has_more_pages(self):
+        return bool(self.pending) or self.offset < self.num_rows
+
+    def prefetch_depth(self):
+        depth = self.cursor.prefetch_pages
+        if self.page_bytes:
+            fitting = self.cursor.prefetch_max_bytes // self.page_bytes
+            depth = min(depth, max(1, fitting))
+        return depth
+
+    def prefetch(self):
+        while (
+            self.offset < self.num_rows
+            and len(self.pending) < self.prefetch_depth()
+        ):
+            self.pending.append(self.schedule(*self.next_page_request()))
+
+    def page_read(self, rows, size):
+        self.page_bytes = max(self.page_bytes, size)
+        self.prefetch()
+        return rows
+
+
+class PrefetchingResponseStorePager(PrefetchMixin, ResponseStorePager):
+    """Response store pager reading pages ahead in a background thread."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.init_prefetch()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pinotdb-prefetch")
+        self.prefetch()
+
+    def schedule(self, url, params):
+        return self._executor.submit(self.fetch_page, url, params)
+
+    def next_page(self):
+        self.prefetch()
+        return self.page_read(*self.pending.popleft().result())
+
+    def close(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self._executor.shutdown(wait=True)
+        super().close()
+
+
+class AsyncPrefetchingResponseStorePager(
+        PrefetchMixin, AsyncResponseStorePager):
+    """Response store pager reading pages ahead in background tasks."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.init_prefetch()
+        self.prefetch()
+
+    def schedule(self, url, params):
+        return asyncio.ensure_future(self.fetch_page(url, params))
+
+    async def next_page(self):
+        self.prefetch()
+        return self.page_read(*await self.pending.popleft())
+
+    async def close(self):
+        for task in self.pending:
+            task.cancel()
+        await asyncio.gather(*self.pending, return_exceptions=True)
+        self.pending.clear()
+        await super().close()
 
 
 class Cursor:
     """Connection cursor."""
 
+    pager_class = ResponseStorePager
+    prefetching_pager_class = PrefetchingResponseStorePager
+    request_timer_class = timings.RequestTimer
+
     def __init__(
         self,
         host,
@@ -325,12 +1079,36 @@ class Cursor:
         session=None,
         use_multistage_engine=False,
         query_options=None,
+        server_side=False,
+        page_size=10000,
+        prefetch_pages=0,
+        prefetch_max_bytes=64 * 1024 * 1024,
+        compression=None,
+        response_format="json",
+        max_query_length=1024 * 1024,
+        paramstyle="pyformat",
+        cancellable=False,
+        slow_query_log=None,
         **kwargs
     ):
         self.url = parse.urlunparse(
             (scheme, f"{host}:{port}", path, None, None, None))
+        self.broker = f"{host}:{port}"
+        # Other broker endpoints live next to the query one.
+        self._broker_base_url = parse.urlunparse(
+            (scheme, f"{host}:{port}", path.rpartition("/query")[0],
+             None, None, None))
         self.session = session
 
+        # Whether results are paged through the broker's response store,
+        # `page_size` rows at a time.
+        self.server_side = server_side
+        self.page_size = page_size
+        # Number of pages read ahead in the background while the current one
+        # is consumed, within roughly `prefetch_max_bytes` of responses.
+        self.prefetch_pages = prefetch_pages
+        self.prefetch_max_bytes = prefetch_max_bytes
+
         # This read/write attribute specifies the number of rows to fetch at a
         # time with .fetchmany(). It defaults to 1 meaning to fetch a single
         # row at a time.
@@ -342,14 +1120,41 @@ class Cursor:
         self.description = None
         self.schema = None
         self.rowcount = -1
-        self._results = None
+        self._rows = None
+        # Arrow table whose rows are yet to be created (see `_results`)
+        self._unconverted_table = None
+        # position of the next row to be fetched from `_results`
+        self._position = 0
+        self._types = []
+        # conversion of the rows of the result, from `get_row_converter`
+        self._row_converter = ()
+        self._pager = None
+        self._arrow_table = None
+        # client query id of the query being executed, if it can be cancelled
+        self._running_query_id = None
         self.raw_query_response = None
         self.query_stats = {}
         self.timeUsedMs = -1
+        # breakdown of the time spent executing the last query
+        self.timings = timings.Timings()
         self._debug = debug
-        self._preserve_types = preserve_types
-        self._use_multistage_engine = use_multistage_engine
-        self._query_options = query_options
+        # Options sent with every query of the cursor, to which those passed
+        # to `execute` are added.
+        self.query_options = QueryOptions(
+            useMultistageEngine=use_multistage_engine or None,
+            preserveType=preserve_types or None,
+        ).merge(query_options)
+        # Queries longer than this (e.g. with huge `IN` lists) are likely to
+        # be slow to send and parse, or to exceed the broker limits.
+        self.max_query_length = max_query_length
+        check_paramstyle(paramstyle)
+        self.paramstyle = paramstyle
+        # Whether queries are sent with a client query id (the correlation
+        # id) they can be cancelled with; brokers need query cancellation
+        # enabled for that.
+        self.cancellable = cancellable
+        # `slowlog.SlowQueryLog` recording the slow queries, if any.
+        self.slow_query_log = slow_query_log
         self.acceptable_respond_fraction = acceptable_respond_fraction
         if ignore_exception_error_codes:
             self._ignore_exception_error_codes = set(
@@ -371,15 +1176,46 @@ class Cursor:
                 extra_headers[k] = v
         if 'database' in kwargs:
             extra_headers['database'] = kwargs['database']
+        if compression:
+            # Otherwise httpx asks for any encoding it can decode.
+            extra_headers['Accept-Encoding'] = get_accept_encoding(compression)
+        # Brokers not supporting the Arrow format keep answering in JSON.
+        self._arrow = None
+        if response_format == "arrow":
+            self._arrow = import_arrow()
+            extra_headers['Accept'] = (
+                f"{self._arrow.MEDIA_TYPE}, application/json;q=0.9")
+        elif response_format != "json":
+            raise exceptions.NotSupportedError(
+                f"Unknown response format {response_format!r}, "
+                "expected 'json' or 'arrow'"
+            )
         self.session.headers.update(extra_headers)
 
     @check_closed
     def close(self):
         """Close the cursor."""
+        self._close_pager()
         if self.session is not None and not self.session.is_closed:
             self.session.close()
         self.closed = True
 
+    def _close_pager(self):
+        if self._pager is not None:
+            self._pager.close()
+            self._pager = None
+
+    def metric_labels(self, sql):
+        return self.broker, get_table_name(sql) or ""
+
+    def broker_url(self, path):
+        return f"{self._broker_base_url}{path}"
+
+    def auth_kwargs(self):
+        if self.auth and self.auth._username and self.auth._password:
+            return {"auth": (self.auth._username, self.auth._password)}
+        return {}
+
     def is_valid_exception(self, e):
         if "errorCode" not in e:
             return True
@@ -408,24 +1244,65 @@ class Cursor:
     def finalize_query_payload(
             self, operation, parameters=None, queryOptions=None
     ):
-        query = apply_parameters(operation, parameters or {})
-
-        if self._preserve_types:
-            query += " OPTION(preserveType='true')"
+        """
+        Return the request body for `operation`, with `parameters` applied
+        and the options of the cursor merged with `queryOptions`.
+        """
+        if isinstance(operation, PreparedStatement):
+            query = operation.bind(parameters or {})
+        else:
+            query = apply_parameters(
+                operation, parameters or {}, self.paramstyle)
+        if self.max_query_length and len(query) > self.max_query_length:
+            logger.warning(
+                f"Query of {len(query)} characters exceeds the "
+                f"{self.max_query_length} characters limit, consider "
+                "splitting it (e.g. its IN lists) into smaller queries, or "
+                "filtering with IN_ID_SET/IN_SUBQUERY instead"
+            )
 
-        if self._use_multistage_engine:
-            if queryOptions:
-                queryOptions += ";useMultistageEngine=true"
-            else:
-                queryOptions = "useMultistageEngine=true"
-        if queryOptions:
-            return {"sql": query, "queryOptions": queryOptions}
+        options = self.query_options.merge(queryOptions)
+        if options:
+            return {"sql": query, "queryOptions": str(options)}
         else:
             return {"sql": query}
 
+    def check_query_errors(self, input_query, query_response, payload):
+        # raise any error messages
+        if query_response.status_code != 200:
+            msg = (
+                f"Query\n\n{input_query}\n\nreturned an error: "
+                f"{query_response.status_code}\n"
+                f"Full response is {pprint.pformat(payload)}")
+            raise exceptions.ProgrammingError(msg)
+
+        query_exceptions = [
+            e for e in payload.get("exceptions", [])
+            if self.is_valid_exception(e)
+        ]
+        if query_exceptions:
+            msg = "\n".join(
+                pprint.pformat(exception) for exception in query_exceptions)
+            raise exceptions.DatabaseError(msg)
+
+    def read_payload(self, response):
+        """
+        Return the payload of a broker response, along with the Arrow table
+        of the result if the broker answered in the Arrow format.
+        """
+        if self._arrow is not None and self._arrow.is_arrow_response(response):
+            table = self._arrow.read_table(response.content)
+            return self._arrow.get_payload(table), table
+        return response.json(), None
+
     def normalize_query_response(self, input_query, query_response):
+        self._arrow_table = None
         try:
-            payload = query_response.json()
+            started = time.perf_counter()
+            with tracing.span("pinot.decode"):
+                payload, self._arrow_table = self.read_payload(
+                    query_response)
+            self.timings.decode = time.perf_counter() - started
             self.raw_query_response = {
                 "response": payload,
                 "status_code": query_response.status_code,
@@ -444,35 +1321,21 @@ class Cursor:
             status_code = (
                 0 if not query_response else query_response.status_code)
             logger.info(
-                f"Got the payload of type {type(payload)} "
-                f"with the status code {status_code}:\n{payload}"
-            )
+                "Got the payload of type %s with the status code %s:\n%s",
+                type(payload).__name__, status_code, Preview(payload))
 
         self.query_stats = get_query_stats(payload)
+        self.query_stats.update(get_response_sizes(query_response))
         num_servers_responded = self.query_stats.get("numServersResponded", -1)
         num_servers_queried = self.query_stats.get("numServersQueried", -1)
         self.timeUsedMs = self.query_stats.get("timeUsedMs", -1)
+        tracing.record_query_stats(self.query_stats)
 
         self.check_sufficient_responded(
             input_query, num_servers_queried, num_servers_responded
         )
 
-        # raise any error messages
-        if query_response.status_code != 200:
-            msg = (
-                f"Query\n\n{input_query}\n\nreturned an error: "
-                f"{query_response.status_code}\n"
-                f"Full response is {pformat(payload)}")
-            raise exceptions.ProgrammingError(msg)
-
-        query_exceptions = [
-            e for e in payload.get("exceptions", [])
-            if self.is_valid_exception(e)
-        ]
-        if query_exceptions:
-            msg = "\n".join(
-                pformat(exception) for exception in query_exceptions)
-            raise exceptions.DatabaseError(msg)
+        self.check_query_errors(input_query, query_response, payload)
 
         # array of array, where inner array is array of column values
         rows = []
@@ -485,65 +1348,243 @@ class Cursor:
             data_schema = results.get("dataSchema")
             column_names = data_schema.get("columnNames")
             column_data_types = data_schema.get("columnDataTypes")
-            values = results.get("rows")
+            values = results.get("rows", [])
             if column_names:
                 rows = values
             else:
                 raise exceptions.DatabaseError(
                     "Expected columns and results in resultTable, "
-                    f"but got {pformat(results)} instead"
+                    f"but got {pprint.pformat(results)} instead"
                 )
 
-        logger.debug(
-            f"Got the rows as a type {type(rows)} of size {len(rows)}")
-        if logger.isEnabledFor(logging.DEBUG):  # pragma: no cover
-            logger.debug(pformat(rows))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Got %d rows:\n%s", len(rows), Preview(rows))
         self.description = None
         self._results = []
+        self._position = 0
+        self._types = []
+        self._row_converter = ()
         if column_data_types:
             types = get_types_from_column_data_types(column_data_types)
+            self._types = types
+            self._row_converter = get_row_converter(types)
             if self._debug:
                 logger.info(
-                    f"Column_names are {pformat(column_names)}, "
-                    f"Column_data_types are {pformat(column_data_types)}, "
-                    f"Types are {pformat(types)}"
-                )
-            self._results = convert_result_if_required(types, rows)
+                    "Column_names are %s, Column_data_types are %s, "
+                    "Types are %s",
+                    column_names, column_data_types, types)
+            if self._arrow_table is not None:
+                self._unconverted_table = self._arrow_table
+            else:
+                started = time.perf_counter()
+                with tracing.span("pinot.convert"):
+                    self._results = convert_rows(self._row_converter, rows)
+                self.timings.convert = time.perf_counter() - started
             self.description = get_description_from_types(column_names, types)
             self.schema = get_columns_and_types(
                 column_names, column_data_types)
         return self
 
+    @property
+    def _results(self):
+        """
+        Rows of the result buffered by the cursor. Those of an Arrow table
+        are only created when first needed, so that `fetch_arrow_table`
+        returns the table without creating Python objects for its values.
+        """
+        if self._unconverted_table is not None:
+            table, self._unconverted_table = self._unconverted_table, None
+            started = time.perf_counter()
+            self._rows = self._arrow.get_rows(table, self._types)
+            self.timings.convert = time.perf_counter() - started
+        return self._rows
+
+    @_results.setter
+    def _results(self, rows):
+        self._unconverted_table = None
+        self._rows = rows
+
+    def _num_results(self):
+        """Return the number of buffered rows, without creating them."""
+        if self._unconverted_table is not None:
+            return self._unconverted_table.num_rows
+        return len(self._rows or ())
+
+    def normalize_page_response(self, url, page_response):
+        """Return the rows of a page read from the broker's response store."""
+        try:
+            payload, table = self.read_payload(page_response)
+        except Exception as e:
+            raise exceptions.DatabaseError(
+                f"Error when fetching results from {url}, "
+                f"raw response is:\n{page_response.text}"
+            ) from e
+
+        self.check_query_errors(url, page_response, payload)
+
+        if table is not None:
+            rows = self._arrow.get_rows(table, self._types)
+        else:
+            rows = convert_rows(
+                self._row_converter,
+                payload.get("resultTable", {}).get("rows", []))
+        logger.debug("Got a page of %d rows from %s", len(rows), url)
+        return rows
+
+    def open_pager(self):
+        payload = self.raw_query_response["response"]
+        if "requestId" not in payload or "numRowsResultSet" not in payload:
+            # The broker doesn't support cursors, so the whole result was
+            # returned at once.
+            return
+        offset = payload.get("offset", 0) + payload.get(
+            "numRows", self._num_results())
+        pager_class = (
+            self.prefetching_pager_class if self.prefetch_pages
+            else self.pager_class)
+        self._pager = pager_class(
+            self, payload["requestId"], offset, payload["numRowsResultSet"])
+
+    def execute_options(self, correlation_id, kwargs):
+        """
+        Return the query options making the broker give up on the query
+        slightly before the `timeout` passed to `execute` expires, and
+        identifying the query to cancel it, if it can be.
+        """
+        options = {}
+        timeout = kwargs.get("timeout")
+        if isinstance(timeout, httpx.Timeout):
+            timeout = timeout.read
+        if isinstance(timeout, (int, float)) and not isinstance(timeout, bool):
+            options["timeoutMs"] = get_server_timeout_ms(timeout)
+        if options or self.cancellable:
+            options["clientQueryId"] = correlation_id
+        return QueryOptions(options)
+
+    def cancel(self):
+        """
+        Cancel the query being executed (e.g. from another thread) on the
+        broker, provided the cursor is `cancellable` or the query has a
+        timeout. Return whether the broker cancelled it.
+        """
+        if self._running_query_id is None:
+            return False
+        return self._cancel_query(self._running_query_id)
+
+    def cancel_request(self, client_query_id):
+        url = self.broker_url(f"/query/{parse.quote(client_query_id)}")
+        return url, {"params": {"client": "true"}, **self.auth_kwargs()}
+
+    def _cancel_query(self, client_query_id):
+        url, kwargs = self.cancel_request(client_query_id)
+        try:
+            r = self.session.delete(url, **kwargs)
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not cancel query {client_query_id}: {e}")
+            return False
+        # The query may have completed in the meantime.
+        logger.debug(
+            f"Cancelling query {client_query_id} returned {r.status_code}")
+        return r.status_code == 200
+
+    def cursor_params(self, server_side, kwargs):
+        if server_side is None:
+            server_side = self.server_side
+        if server_side:
+            kwargs["params"] = {
+                **kwargs.get("params", {}),
+                "getCursor": "true",
+                "numRows": self.page_size,
+            }
+        return server_side
+
     @check_closed
+    @tracing.traced("pinot.query")
     # TODO: Rename queryOptions to query_options when releasing a breaking
     #  version - even though Pinot understands "queryOptions", we don't need
     #  to follow the same camel casing convention, but rather should stick
     #  to PEP-8 instead.
-    def execute(self, operation, parameters=None, queryOptions=None, **kwargs):
-        if not queryOptions:
-            queryOptions = ""
-        if self._query_options:
-            queryOptions = queryOptions + ";" + self._query_options
+    def execute(
+            self, operation, parameters=None, queryOptions=None,
+            server_side=None, **kwargs
+    ):
+        """
+        Execute `operation` with `parameters` applied.
 
+        A `timeout` (in seconds) is enforced on the broker too, which gives
+        up on the query slightly before, and the query is cancelled if the
+        client gives up anyway. Queries of `cancellable` cursors, or with a
+        timeout, can be cancelled with `cancel` while executed.
+        """
+        self.timings = timings.Timings()
+        # Not to report those of the previous query if this one fails.
+        self.query_stats, self.timeUsedMs = {}, -1
+        started = time.perf_counter()
+        correlation_id = str(uuid.uuid4())
+        queryOptions = self.execute_options(
+            correlation_id, kwargs).merge(queryOptions)
         query = self.finalize_query_payload(
             operation, parameters, queryOptions)
 
-        correlation_id = str(uuid.uuid4())
-        if self.auth and self.auth._username and self.auth._password:
-            r = self.session.post(
-                self.url,
-                json=query,
-                headers={"X-Correlation-Id": correlation_id},
-                auth=(self.auth._username, self.auth._password),
-                **kwargs)
-        else:
-            r = self.session.post(
-                self.url,
-                json=query,
-                headers={"X-Correlation-Id": correlation_id},
-                **kwargs)
+        self._close_pager()
+        server_side = self.cursor_params(server_side, kwargs)
 
-        return self.normalize_query_response(query, r)
+        tracing.set_attributes({
+            "db.system": "pinot", "db.statement": query["sql"]})
+        error = None
+        try:
+            with metrics.observe_query(self, query["sql"]):
+                r = self.post_query(
+                    query, correlation_id, queryOptions.get("clientQueryId"),
+                    kwargs)
+                self.normalize_query_response(query, r)
+            if server_side:
+                self.open_pager()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # Slow queries are recorded even if they failed (e.g. timed out).
+            self.timings.total = time.perf_counter() - started
+            if self.slow_query_log is not None:
+                self.slow_query_log.observe(
+                    self, query, correlation_id, error)
+        return self
+
+    def post_query(self, query, correlation_id, client_query_id, kwargs):
+        """
+        Send `query` to the broker, under a `client_query_id` to `cancel` it
+        with while waiting for the response, if any.
+        """
+        self._running_query_id = client_query_id
+        timer = self.request_timer_class(self.timings)
+        kwargs["extensions"] = {**kwargs.get("extensions", {}), "trace": timer}
+        try:
+            with tracing.span("pinot.request"):
+                timer.forward = tracing.request_phases()
+                headers = tracing.inject({"X-Correlation-Id": correlation_id})
+                if self.auth and self.auth._username and self.auth._password:
+                    return self.session.post(
+                        self.url,
+                        json=query,
+                        headers=headers,
+                        auth=(self.auth._username, self.auth._password),
+                        **kwargs)
+                else:
+                    return self.session.post(
+                        self.url,
+                        json=query,
+                        headers=headers,
+                        **kwargs)
+        except (httpx.ReadTimeout, httpx.WriteTimeout):
+            # Only queries sent (at least partly) to the broker can be
+            # running there, unlike on connect or pool timeouts.
+            self.cancel()
+            raise
+        finally:
+            timer.finish()
+            self._running_query_id = None
 
     @check_closed
     def executemany(self, operation, seq_of_parameters=None):
@@ -558,10 +1599,14 @@ class Cursor:
         Fetch the next row of a query result set, returning a single sequence,
         or `None` when no more data is available.
         """
-        try:
-            return self._results.pop(0)
-        except IndexError:
+        if (
+            self._position >= len(self._results)
+            and not self._fetch_next_page()
+        ):
             return None
+        row = self._results[self._position]
+        self._position += 1
+        return row
 
     @check_result
     @check_closed
@@ -572,9 +1617,24 @@ class Cursor:
         no more rows are available.
         """
         size = size or self.arraysize
-        output, self._results = self._results[:size], self._results[size:]
+        position = self._position
+        output = self._fetch_buffered(size)
+        try:
+            while len(output) < size and self._fetch_next_page():
+                output += self._fetch_buffered(size - len(output))
+        except exceptions.NotSupportedError:
+            # Leave the buffered rows to be fetched otherwise.
+            self._position = position
+            raise
         return output
 
+    def _fetch_buffered(self, size=None):
+        # Fetches up to `size` (or all) buffered rows, never reading a page.
+        start = self._position
+        end = len(self._results)
+        self._position = end if size is None else min(start + size, end)
+        return self._results[start:self._position]
+
     @check_result
     @check_closed
     def fetchall(self):
@@ -582,9 +1642,46 @@ class Cursor:
         Fetch all (remaining) rows of a query result, returning them as a
         sequence of sequences (e.g. a list of tuples).
         """
-        results, self._results = self._results, []
+        results = self._remaining_results()
+        if self._pager is not None:
+            results = list(results)
+            while self._fetch_next_page():
+                results.extend(self._results)
+        self._results, self._position = [], 0
         return results
 
+    @check_result
+    @check_closed
+    def fetch_arrow_table(self):
+        """
+        Fetch all (remaining) buffered rows of a query result as a
+        `pyarrow.Table`. If the broker answered in the Arrow format, its
+        table is returned as is, without creating Python objects for values.
+        """
+        if self._arrow_table is not None and self._pager is None:
+            table = self._arrow_table.slice(self._position)
+        else:
+            column_names = [column[0] for column in self.description or []]
+            table = import_arrow().rows_to_table(
+                column_names, self._remaining_results())
+        self._results, self._position = [], 0
+        self._arrow_table = None
+        return table
+
+    @check_closed
+    def fetch_page(self):
+        """
+        Replace the buffered rows with the next page of a server-side result,
+        returning whether there was a page left to fetch.
+        """
+        return self._fetch_next_page()
+
+    def _fetch_next_page(self):
+        if self._pager is None or not self._pager.has_more_pages:
+            return False
+        self._results, self._position = self._pager.next_page(), 0
+        return True
+
     @check_result
     @check_closed
     def fetchwithschema(self):
@@ -592,7 +1689,13 @@ class Cursor:
         Fetch results with schema. Schema includs column names and type
         """
         return {'schema': self.schema,
-                'results': self._results}
+                'results': self._remaining_results()}
+
+    def _remaining_results(self):
+        # Avoid copying the rows when none were fetched yet.
+        if not self._position:
+            return self._results
+        return self._results[self._position:]
 
     @check_closed
     def setinputsizes(self, sizes):
@@ -620,60 +1723,309 @@ class Cursor:
 
 
 class AsyncCursor(Cursor):
+    pager_class = AsyncResponseStorePager
+    prefetching_pager_class = AsyncPrefetchingResponseStorePager
+    request_timer_class = timings.AsyncRequestTimer
+
     @check_closed
+    @tracing.traced("pinot.query")
     async def execute(
-            self, operation, parameters=None, queryOptions=None, **kwargs
+            self, operation, parameters=None, queryOptions=None,
+            server_side=None, **kwargs
     ):
-        if not queryOptions:
-            queryOptions = ""
-        if self._query_options:
-            queryOptions = queryOptions + ";" + self._query_options
-
+        """
+        Asynchronous flavour of `Cursor.execute`; queries which can be
+        cancelled are also cancelled on the broker when the task running
+        them is.
+        """
+        self.timings = timings.Timings()
+        # Not to report those of the previous query if this one fails.
+        self.query_stats, self.timeUsedMs = {}, -1
+        started = time.perf_counter()
+        correlation_id = str(uuid.uuid4())
+        queryOptions = self.execute_options(
+            correlation_id, kwargs).merge(queryOptions)
         query = self.finalize_query_payload(
             operation, parameters, queryOptions)
 
-        correlation_id = str(uuid.uuid4())
-        if self.auth and self.auth._username and self.auth._password:
-            r = await self.session.post(
-                self.url,
-                json=query,
-                headers={"X-Correlation-Id": correlation_id},
-                auth=(self.auth._username, self.auth._password),
-                **kwargs)
-        else:
-            r = await self.session.post(
-                self.url,
-                json=query,
-                headers={"X-Correlation-Id": correlation_id},
-                **kwargs)
+        await self._aclose_pager()
+        server_side = self.cursor_params(server_side, kwargs)
 
-        return self.normalize_query_response(query, r)
+        tracing.set_attributes({
+            "db.system": "pinot", "db.statement": query["sql"]})
+        error = None
+        try:
+            with metrics.observe_query(self, query["sql"]):
+                r = await self.post_query(
+                    query, correlation_id, queryOptions.get("clientQueryId"),
+                    kwargs)
+                self.normalize_query_response(query, r)
+            if server_side:
+                self.open_pager()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # Slow queries are recorded even if they failed (e.g. timed out).
+            self.timings.total = time.perf_counter() - started
+            if self.slow_query_log is not None:
+                self.slow_query_log.observe(
+                    self, query, correlation_id, error)
+        return self
+
+    async def post_query(
+            self, query, correlation_id, client_query_id, kwargs
+    ):
+        self._running_query_id = client_query_id
+        timer = self.request_timer_class(self.timings)
+        kwargs["extensions"] = {**kwargs.get("extensions", {}), "trace": timer}
+        try:
+            with tracing.span("pinot.request"):
+                timer.forward = tracing.request_phases()
+                headers = tracing.inject({"X-Correlation-Id": correlation_id})
+                if self.auth and self.auth._username and self.auth._password:
+                    return await self.session.post(
+                        self.url,
+                        json=query,
+                        headers=headers,
+                        auth=(self.auth._username, self.auth._password),
+                        **kwargs)
+                else:
+                    return await self.session.post(
+                        self.url,
+                        json=query,
+                        headers=headers,
+                        **kwargs)
+        except (httpx.ReadTimeout, httpx.WriteTimeout,
+                asyncio.CancelledError):
+            await self.cancel()
+            raise
+        finally:
+            timer.finish()
+            self._running_query_id = None
 
     @check_closed
     async def close(self):
         """Close the cursor."""
+        await self._aclose_pager()
         await self.session.aclose()
         self.closed = True
 
+    async def _aclose_pager(self):
+        if self._pager is not None:
+            await self._pager.close()
+            self._pager = None
+
+    @check_closed
+    async def cancel(self):
+        """Asynchronous flavour of `Cursor.cancel`."""
+        if self._running_query_id is None:
+            return False
+        return await self._cancel_query(self._running_query_id)
+
+    async def _cancel_query(self, client_query_id):
+        url, kwargs = self.cancel_request(client_query_id)
+        try:
+            r = await self.session.delete(url, **kwargs)
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not cancel query {client_query_id}: {e}")
+            return False
+        logger.debug(
+            f"Cancelling query {client_query_id} returned {r.status_code}")
+        return r.status_code == 200
+
+    async def fetch_page(self):
+        """
+        Replace the buffered rows with the next page of a server-side result,
+        returning whether there was a page left to fetch.
+
+        The synchronous fetch methods can't wait for the next page, and raise
+        `NotSupportedError` once the buffered rows are fetched while pages
+        are left; iterating with `async for` fetches the pages as needed.
+        """
+        if self._pager is None or not self._pager.has_more_pages:
+            return False
+        self._results, self._position = await self._pager.next_page(), 0
+        return True
+
+    def _fetch_next_page(self):
+        if self._pager is not None and self._pager.has_more_pages:
+            raise exceptions.NotSupportedError(
+                "The next page of a server-side result can't be fetched "
+                "synchronously, iterate with `async for` or call "
+                "`await cursor.fetch_page()` instead"
+            )
+        return False
+
+    @check_closed
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._position >= len(self._results):
+            await self.fetch_page()
+        output = self._fetch_buffered(1)
+        if not output:
+            raise StopAsyncIteration
+
+        return output[0]
+
+
+# String literals, quoted identifiers and comments, in which placeholders
+# aren't looked for.
+_QUOTED = r"""'[^']*(?:''[^']*)*'|"[^"]*(?:""[^"]*)*"|--[^\n]*|/\*.*?\*/"""
+_PLACEHOLDERS = {
+    "qmark": r"\?",
+    "numeric": r"(?<![:\w]):(?P<key>\d+)",
+    "named": r"(?<![:\w]):(?P<key>[A-Za-z_]\w*)",
+    "pyformat": (
+        r"%\((?P<key>[^)]*)\)"
+        r"(?P<spec>[#0\- +]*\d*(?:\.\d+)?[diouxXeEfFgGcrsa])"
+    ),
+}
+PARAMSTYLES = frozenset(_PLACEHOLDERS)
+
+
+@lru_cache(maxsize=None)
+def get_operation_tokens(paramstyle):
+    """
+    Return the regex matching the placeholders of `paramstyle`, and what
+    to skip when looking for them, compiled on first use.
+    """
+    # The lookahead quickly skips characters no token starts with.
+    return re.compile(
+        f"(?=[-'\"/%?:])"
+        f"(?:(?P<quoted>{_QUOTED})"
+        f"|(?P<placeholder>{_PLACEHOLDERS[paramstyle]}))",
+        re.DOTALL)
 
-def apply_parameters(operation, parameters):
-    escaped_parameters = {
-        key: escape_parameter(value) for key, value in parameters.items()}
-    escaped_operation = escape_operation(operation)
-    return escaped_operation % escaped_parameters
+
+def check_paramstyle(paramstyle):
+    if paramstyle not in PARAMSTYLES:
+        raise exceptions.NotSupportedError(
+            f"Unknown paramstyle {paramstyle!r}, expected one of "
+            f"{', '.join(sorted(PARAMSTYLES))}"
+        )
+
+
+def _escape_text(text, paramstyle):
+    if paramstyle == "pyformat":
+        # `%%` stands for `%`, as when formatting the operation with `%`.
+        text = text.replace("%%", "%")
+    return text.replace("%", "%%")
+
+
+# Longer operations, mostly one-off queries (e.g. with large IN lists), are
+# parsed again every time rather than kept in the cache; `PreparedStatement`
+# parses them once when they are repeated.
+_MAX_CACHED_OPERATION_LENGTH = 4096
+
+
+def parse_operation(operation, paramstyle="pyformat"):
+    """
+    Parse `operation` in a single pass, returning a `%` formatting template
+    with positional placeholders, and the keys - names or positions - of the
+    parameters to put in them.
+    """
+    if len(operation) > _MAX_CACHED_OPERATION_LENGTH:
+        return _parse_operation(operation, paramstyle)
+    return _parse_cached_operation(operation, paramstyle)
+
+
+def _parse_operation(operation, paramstyle):
+    check_paramstyle(paramstyle)
+    parts = []
+    keys = []
+    position = 0
+    for match in get_operation_tokens(paramstyle).finditer(operation):
+        if match.lastgroup == "quoted":
+            continue
+        parts.append(
+            _escape_text(operation[position:match.start()], paramstyle))
+        position = match.end()
+        if paramstyle == "qmark":
+            keys.append(len(keys))
+        elif paramstyle == "numeric":
+            keys.append(int(match.group("key")) - 1)
+        else:
+            keys.append(match.group("key"))
+        spec = match.group("spec") if paramstyle == "pyformat" else "s"
+        parts.append(f"%{spec}")
+    parts.append(_escape_text(operation[position:], paramstyle))
+    return "".join(parts), tuple(keys)
+
+
+_parse_cached_operation = lru_cache(maxsize=512)(_parse_operation)
+
+
+class PreparedStatement:
+    """
+    SQL operation parsed once, to be executed repeatedly with different
+    parameters (see `Connection.prepare`).
+    """
+
+    def __init__(self, operation, paramstyle="pyformat"):
+        self.operation = operation
+        self.paramstyle = paramstyle
+        self._template, self._keys = parse_operation(operation, paramstyle)
+
+    def bind(self, parameters):
+        """Return the operation with the given parameters applied."""
+        return bind_parameters(
+            self._template, self._keys, parameters, self.paramstyle)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.operation!r})"
+
+
+def bind_parameters(template, keys, parameters, paramstyle):
+    if paramstyle in ("qmark", "numeric"):
+        needed = max(keys, default=-1) + 1
+        if len(parameters) < needed or min(keys, default=0) < 0:
+            raise exceptions.ProgrammingError(
+                f"Expected {needed} parameters, got {len(parameters)}")
+    return template % tuple([
+        escape_parameter(parameters[key]) for key in keys])
+
+
+def apply_parameters(operation, parameters, paramstyle="pyformat"):
+    template, keys = parse_operation(operation, paramstyle)
+    return bind_parameters(template, keys, parameters, paramstyle)
 
 
 def escape_parameter(value: Any) -> Any:
-    if value == "*":
-        return value
-    elif isinstance(value, str):
+    if isinstance(value, str):
+        if value == "*":
+            return value
         return "'{}'".format(value.replace("'", "''"))
     elif isinstance(value, bool):
         return "TRUE" if value else "FALSE"
+    elif isinstance(value, (int, float)):
+        return value
     elif isinstance(value, (list, tuple)):
-        return ", ".join(str(escape_parameter(element)) for element in value)
+        return escape_sequence(value)
+    elif hasattr(value, "dtype") and hasattr(value, "tolist"):
+        # NumPy arrays and scalars, converted to Python objects at once.
+        return escape_parameter(value.tolist())
     return value
 
 
+_NUMBER_TYPES = frozenset({int, float})
+
+
+def escape_sequence(values):
+    """
+    Escape a sequence of values, e.g. for an `IN` clause, with fast paths
+    for sequences of numbers only, or of strings only.
+    """
+    types = set(map(type, values))
+    if types <= _NUMBER_TYPES:
+        return ", ".join(map(str, values))
+    if types == {str} and "*" not in values:
+        return "'{}'".format(
+            "', '".join([value.replace("'", "''") for value in values]))
+    return ", ".join(str(escape_parameter(element)) for element in values)
+
+
 def escape_operation(value: str) -> str:
     return value.replace('%%', '%').replace('%', '%%').replace('%(', '(')
@@ -1,4 +1,4 @@
-CALCITE_KEYWORDS = set(
+CALCITE_KEYWORDS = frozenset(
     [
         "A",
         "ABS",
@@ -643,8 +643,12 @@ CALCITE_KEYWORDS = set(
     ]
 )
 
-SUPERSET_KEYWORDS = set(
+SUPERSET_KEYWORDS = frozenset(
     [
         "__timestamp",
     ]
 )
+
+# Words quoted when used as identifiers in the SQL compiled by SQLAlchemy.
+RESERVED_WORDS = frozenset(
+    keyword.lower() for keyword in CALCITE_KEYWORDS ^ SUPERSET_KEYWORDS)
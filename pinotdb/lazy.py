@@ -0,0 +1,36 @@
+"""
+Lazy imports of the modules not needed to import pinotdb, such as httpx,
+only imported when first used (e.g. when connecting to a broker), so that
+`import pinotdb` stays fast in short-lived processes.
+
+    >>> httpx = LazyModule("httpx")
+    >>> httpx.Client  # imports httpx
+"""
+
+import importlib
+import types
+
+_get = types.ModuleType.__getattribute__
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for the module `name`, imported on first access of one of its
+    attributes, which are always looked up on the module itself, so that
+    they can be patched (e.g. by tests or instrumentation).
+
+    Unlike `importlib.util.LazyLoader`, the module is never seen partially
+    initialized by concurrent threads, as its import holds the import lock.
+    """
+
+    def __getattribute__(self, attr):
+        # Looking up every attribute here is much faster than a `__getattr__`
+        # fallback, which modules only call once an AttributeError is raised.
+        namespace = _get(self, "__dict__")
+        module = namespace.get("_module")
+        if module is None:
+            # Imports the module, or waits for another thread importing it.
+            module = importlib.import_module(namespace["__name__"])
+            if not getattr(module.__spec__, "_initializing", False):
+                namespace["_module"] = module
+        return getattr(module, attr)
@@ -0,0 +1,328 @@
+"""
+Client metrics, exported in the Prometheus text format.
+
+Metrics are disabled by default, and only cost a function call per query
+until enabled:
+
+    >>> from pinotdb import metrics
+    >>> client_metrics = metrics.enable()
+    >>> ...  # run queries
+    >>> print(client_metrics.registry.render())
+
+`render()` returns the text exposition format, to be served by any HTTP
+handler (e.g. on a `/metrics` route) or pushed to a Pushgateway; no
+Prometheus client library or server is needed.
+
+Query metrics are labelled by broker (`host:port`) and table (the first one
+in the `FROM` clause of the query).
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+
+from pinotdb import exceptions
+
+# Buckets (upper bounds) of the histograms of durations in seconds, sizes in
+# bytes and numbers of rows.
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = tuple(4 ** i * 1024 for i in range(10))
+ROWS_BUCKETS = tuple(10 ** i for i in range(8))
+
+
+def _escape_label_value(value):
+    return (
+        str(value).replace("\\", r"\\").replace("\n", r"\n")
+        .replace('"', r'\"'))
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    labels = ",".join(
+        f'{name}="{_escape_label_value(value)}"'
+        for name, value in zip(names, values))
+    return f"{{{labels}}}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A metric, with a value per combination of label values."""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        """Yield the (suffix, label names, label values, value) samples."""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for suffix, names, values, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(names, values)} "
+                f"{_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield "", self.labelnames, labels, value
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def set(self, labels=(), value=0):
+        with self._lock:
+            self._values[labels] = value
+
+    def get(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield "", self.labelnames, labels, value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, labels=(), value=0):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # counts per bucket (not cumulative), sum, count
+                state = self._values[labels] = [[0] * len(self.buckets), 0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def get_count(self, labels=()):
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def get_sum(self, labels=()):
+        state = self._values.get(labels)
+        return state[1] if state else 0
+
+    def samples(self):
+        with self._lock:
+            values = [
+                (labels, list(counts), total, count)
+                for labels, (counts, total, count) in self._values.items()
+            ]
+        bucket_names = self.labelnames + ("le",)
+        for labels, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield (
+                    "_bucket", bucket_names,
+                    labels + (_format_value(bound),), cumulative)
+            yield "_sum", self.labelnames, labels, total
+            yield "_count", self.labelnames, labels, count
+
+
+class Registry:
+    """Registry of metrics, rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise exceptions.ProgrammingError(
+                    f"Metric {metric.name!r} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=()):
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(f"{metric.render()}\n" for metric in metrics)
+
+
+class ClientMetrics:
+    """The metrics of the queries run by the client."""
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else Registry()
+        query_labels = ("broker", "table")
+        self.query_duration = self.registry.histogram(
+            "pinotdb_query_duration_seconds",
+            "Client wall time of queries.", query_labels, DURATION_BUCKETS)
+        self.broker_duration = self.registry.histogram(
+            "pinotdb_broker_duration_seconds",
+            "Time spent by the broker on queries (timeUsedMs).",
+            query_labels, DURATION_BUCKETS)
+        self.decode_duration = self.registry.histogram(
+            "pinotdb_decode_duration_seconds",
+            "Time spent decoding query responses.",
+            query_labels, DURATION_BUCKETS)
+        self.response_bytes = self.registry.histogram(
+            "pinotdb_response_bytes",
+            "Size of query responses as transferred.",
+            query_labels, BYTES_BUCKETS)
+        self.rows = self.registry.histogram(
+            "pinotdb_rows_returned", "Number of rows returned by queries.",
+            query_labels, ROWS_BUCKETS)
+        self.errors = self.registry.counter(
+            "pinotdb_errors_total",
+            "Failed queries, by Pinot errorCode (or HTTP status code, or "
+            "client exception).",
+            query_labels + ("error_code",))
+        self.in_flight = self.registry.gauge(
+            "pinotdb_requests_in_flight",
+            "Queries sent to the broker and not answered yet.", ("broker",))
+        self.retries = self.registry.counter(
+            "pinotdb_retries_total",
+            "Retried requests, by target (e.g. controller).", ("target",))
+
+
+_client_metrics = None
+_NOT_OBSERVED = contextlib.nullcontext()
+
+
+def enable(registry=None):
+    """
+    Start recording client metrics, in `registry` if given, and return them.
+    """
+    global _client_metrics
+    _client_metrics = ClientMetrics(registry)
+    return _client_metrics
+
+
+def disable():
+    """Stop recording client metrics."""
+    global _client_metrics
+    _client_metrics = None
+
+
+def get_client_metrics():
+    """Return the client metrics being recorded, if enabled."""
+    return _client_metrics
+
+
+def get_error_codes(payload, status_code):
+    codes = [
+        str(e["errorCode"]) for e in payload.get("exceptions", [])
+        if isinstance(e, dict) and "errorCode" in e
+    ] if isinstance(payload, dict) else []
+    if not codes and status_code != 200:
+        codes = [f"http_{status_code}"]
+    return codes
+
+
+class QueryObservation:
+    """Records the metrics of a query sent and read by a cursor."""
+
+    def __init__(self, client_metrics, cursor, sql):
+        self.client_metrics = client_metrics
+        self.cursor = cursor
+        self.sql = sql
+
+    def __enter__(self):
+        self.broker, self.table = self.cursor.metric_labels(self.sql)
+        self.client_metrics.in_flight.inc((self.broker,))
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        m = self.client_metrics
+        labels = (self.broker, self.table)
+        m.in_flight.dec((self.broker,))
+        m.query_duration.observe(labels, elapsed)
+        stats = self.cursor.query_stats
+        if exc is None:
+            if "timeUsedMs" in stats:
+                m.broker_duration.observe(labels, stats["timeUsedMs"] / 1000)
+            if "compressedResponseBytes" in stats:
+                m.response_bytes.observe(
+                    labels, stats["compressedResponseBytes"])
+            m.decode_duration.observe(labels, self.cursor.timings.decode)
+            m.rows.observe(labels, self.cursor._num_results())
+        else:
+            codes = []
+            raw = self.cursor.raw_query_response
+            if isinstance(exc, exceptions.Error) and raw:
+                # The response was read, but reported errors.
+                codes = get_error_codes(raw["response"], raw["status_code"])
+            for code in codes or [exc_type.__name__]:
+                m.errors.inc(labels + (code,))
+        return False
+
+
+def observe_query(cursor, sql):
+    """
+    Return a context manager recording the metrics of the query `sql` sent
+    and read by `cursor` in its block, if metrics are enabled.
+    """
+    if _client_metrics is None:
+        return _NOT_OBSERVED
+    return QueryObservation(_client_metrics, cursor, sql)
+
+
+def observe_retry(target):
+    """Count a retried request to `target`."""
+    if _client_metrics is not None:
+        _client_metrics.retries.inc((target,))
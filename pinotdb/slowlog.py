@@ -0,0 +1,111 @@
+"""
+Log of slow queries, kept in memory.
+
+Queries taking longer than a threshold on the client (wall time of
+`execute`) or on the broker (its `timeUsedMs`) are logged as warnings and
+kept, with their query stats and the error failing them if any, in a ring
+buffer of the most recent ones:
+
+    >>> from pinotdb import connect, slowlog
+    >>> log = slowlog.SlowQueryLog(threshold=1.0, broker_threshold=0.5)
+    >>> conn = connect(host='localhost', slow_query_log=log)
+    >>> ...  # run queries
+    >>> for query in log.entries():
+    ...     print(query.sql, query.query_stats['numEntriesScannedInFilter'])
+
+A `sample_rate` below 1 only records that fraction of the slow queries, to
+limit the cost of logging when many queries are slow.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque, namedtuple
+
+from pinotdb import exceptions
+
+logger = logging.getLogger(__name__)
+
+SlowQuery = namedtuple(
+    "SlowQuery",
+    [
+        "sql", "query_options", "correlation_id", "duration", "time_used_ms",
+        "query_stats", "timestamp", "error",
+    ],
+    defaults=(None,),
+)
+
+
+class SlowQueryLog:
+    """
+    Ring buffer of the last `size` slow queries, i.e. those taking at least
+    `threshold` seconds on the client or `broker_threshold` seconds on the
+    broker (either can be None to ignore it), of which a `sample_rate`
+    fraction is recorded.
+    """
+
+    def __init__(
+            self, threshold=1.0, broker_threshold=None, sample_rate=1.0,
+            size=100
+    ):
+        if threshold is None and broker_threshold is None:
+            raise exceptions.ProgrammingError(
+                "A threshold or broker_threshold is needed")
+        if not 0 <= sample_rate <= 1:
+            raise exceptions.ProgrammingError(
+                f"Invalid sample_rate {sample_rate!r}, expected 0 to 1")
+        self.threshold = threshold
+        self.broker_threshold = broker_threshold
+        self.sample_rate = sample_rate
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def is_slow(self, duration, time_used_ms):
+        """Whether a query is slow given its client and broker times."""
+        if self.threshold is not None and duration >= self.threshold:
+            return True
+        return (
+            self.broker_threshold is not None
+            and time_used_ms >= self.broker_threshold * 1000
+        )
+
+    def observe(self, cursor, query, correlation_id, error=None):
+        """
+        Record the `query` executed by `cursor`, if slow and sampled, along
+        with the `error` it failed with, if any.
+        """
+        duration = cursor.timings.total
+        if not self.is_slow(duration, cursor.timeUsedMs):
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        entry = SlowQuery(
+            sql=query["sql"],
+            query_options=query.get("queryOptions", ""),
+            correlation_id=correlation_id,
+            duration=duration,
+            time_used_ms=cursor.timeUsedMs,
+            query_stats=dict(cursor.query_stats),
+            timestamp=time.time(),
+            error=error,
+        )
+        with self._lock:
+            self._entries.append(entry)
+        logger.warning(
+            "Slow query %s took %.3fs (%sms on the broker)%s: %s",
+            correlation_id, duration, entry.time_used_ms,
+            f", failing with {error!r}" if error is not None else "",
+            entry.sql)
+
+    def entries(self):
+        """Return the recorded slow queries, oldest first."""
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
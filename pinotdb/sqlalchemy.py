@@ -1,22 +1,29 @@
-import collections
+import itertools
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib import parse
 
-import requests
-from requests.auth import HTTPBasicAuth
-from sqlalchemy.engine import default
+from sqlalchemy.engine import default, reflection
 from sqlalchemy.engine.interfaces import AdaptedConnection
-from sqlalchemy.sql import compiler
+from sqlalchemy.engine.reflection import ObjectKind, ObjectScope
+from sqlalchemy.sql import compiler, elements
 from sqlalchemy import pool, types
-from sqlalchemy.util.concurrency import await_only
+from sqlalchemy.util.concurrency import await_only, in_greenlet
 
 import pinotdb
 from pinotdb import exceptions
 from pinotdb import keywords
+from pinotdb import metrics
+from pinotdb.lazy import LazyModule
 import logging
 
 import json
 
+# Imported when first used, to keep importing the dialect fast.
+asyncio = LazyModule("asyncio")
+httpx = LazyModule("httpx")
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,11 +31,28 @@ class PinotCompiler(compiler.SQLCompiler):
     def visit_select(self, select, **kwargs):
         return super().visit_select(select, **kwargs)
 
-    def visit_column(self, column, result_map=None, **kwargs):
-        result_map = result_map or kwargs.pop("add_to_result_map", None)
-        # This is a hack to modify the original column, but how do I clone it ?
-        column.is_literal = True
-        return super().visit_column(column, result_map, **kwargs)
+    def visit_column(
+        self, column, add_to_result_map=None, result_map_targets=(), **kwargs
+    ):
+        # Column names are rendered verbatim (see `escape_literal_column`).
+        # Render an equivalent literal column rather than flagging the given
+        # one, so that the statement - which may be shared, and is used as
+        # the compiled cache key - is never modified by compiling it.
+        if not column.is_literal:
+            result_map_targets = (column, column.key) + tuple(
+                result_map_targets)
+            column = elements.ColumnClause(
+                column.name,
+                type_=column.type,
+                is_literal=True,
+                _selectable=column.table,
+            )
+        return super().visit_column(
+            column,
+            add_to_result_map,
+            result_map_targets=result_map_targets,
+            **kwargs,
+        )
 
     def visit_function(self, func, **kw):
         if func.name and func.name.lower() == "count":
@@ -40,8 +64,8 @@ class PinotCompiler(compiler.SQLCompiler):
         return super().visit_function(func, **kw)
 
     def escape_literal_column(self, text):
-        # This is a hack to quote column names that conflict with reserved
-        # words since 'column.is_literal = True'
+        # Quote column names that conflict with reserved words, since columns
+        # are rendered as literals by `visit_column`.
         if text in self.preparer.reserved_words:
             return self.preparer.quote(super().escape_literal_column(text))
         return super().escape_literal_column(text)
@@ -111,10 +135,7 @@ class PinotTypeCompiler(compiler.GenericTypeCompiler):
 
 
 class PinotIdentifierPareparer(compiler.IdentifierPreparer):
-    reserved_words = set(
-        [e.lower()
-         for e in (keywords.CALCITE_KEYWORDS ^ keywords.SUPERSET_KEYWORDS)]
-    )
+    reserved_words = keywords.RESERVED_WORDS
 
     def __init__(
         self,
@@ -180,6 +201,8 @@ class PinotAsyncAdaptConnection(AdaptedConnection):
         self._connection = connection
 
     def cursor(self, server_side=False):
+        if server_side:
+            return PinotAsyncAdaptSSCursor(self)
         return PinotAsyncAdaptCursor(self)
 
     def execute(self, operation, parameters=None):
@@ -216,10 +239,13 @@ class PinotAsyncAdaptCursor:
         "_arraysize",
     )
 
+    server_side = False
+
     def __init__(self, adapt_connection):
         self._adapt_connection = adapt_connection
-        self._cursor = adapt_connection._connection.cursor()
-        self._rows = collections.deque()
+        self._cursor = adapt_connection._connection.cursor(
+            server_side=self.server_side)
+        self._rows = iter(())
         self._description = None
         self._rowcount = -1
         self._arraysize = self._cursor.arraysize
@@ -249,7 +275,7 @@ class PinotAsyncAdaptCursor:
             self._cursor.arraysize = value
 
     def close(self):
-        self._rows.clear()
+        self._rows = iter(())
         if self._cursor is None:
             return
 
@@ -268,37 +294,36 @@ class PinotAsyncAdaptCursor:
 
             self._description = self._cursor.description
             self._rowcount = self._cursor.rowcount
-            if self._description:
-                self._rows = collections.deque(self._cursor.fetchall())
-            else:
-                self._rows.clear()
+            self._buffer_rows()
             return self
         except Exception as error:
             self._adapt_connection._handle_exception(error)
 
+    def _buffer_rows(self):
+        # The underlying cursor may be closed before all rows are consumed
+        # (see `_async_soft_close`), so take over its buffered rows - without
+        # copying them - and serve them from an iterator.
+        if self._description:
+            self._rows = iter(self._cursor.fetchall())
+        else:
+            self._rows = iter(())
+
     def executemany(self, operation, seq_of_parameters=None):
         return self._cursor.executemany(operation, seq_of_parameters)
 
     def fetchone(self):
-        if self._rows:
-            return self._rows.popleft()
-        return None
+        return next(self._rows, None)
 
     def fetchmany(self, size=None):
         if size is None:
             size = self.arraysize
-        return [
-            self._rows.popleft() for _ in range(min(size, len(self._rows)))
-        ]
+        return list(itertools.islice(self._rows, size))
 
     def fetchall(self):
-        rows = list(self._rows)
-        self._rows.clear()
-        return rows
+        return list(self._rows)
 
     def __iter__(self):
-        while self._rows:
-            yield self._rows.popleft()
+        return self._rows
 
     def __enter__(self):
         return self
@@ -315,6 +340,50 @@ class PinotAsyncAdaptCursor:
         self._cursor = None
 
 
+class PinotAsyncAdaptSSCursor(PinotAsyncAdaptCursor):
+    """
+    Server-side flavour of the adapted cursor, used for
+    `stream_results=True` / `yield_per` executions: rows are streamed from
+    the underlying cursor as they're fetched instead of being buffered here,
+    and further pages are read from the broker's response store on demand.
+    """
+
+    __slots__ = ()
+
+    server_side = True
+
+    def _buffer_rows(self):
+        pass
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    # The fetch methods of the underlying cursor can't wait for its next
+    # page, so only its buffered rows are read before awaiting the page.
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        rows = self._cursor._fetch_buffered(size)
+        while len(rows) < size and await_only(self._cursor.fetch_page()):
+            rows += self._cursor._fetch_buffered(size - len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor._fetch_buffered()
+        while await_only(self._cursor.fetch_page()):
+            rows += self._cursor._fetch_buffered()
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+
+class PinotExecutionContext(default.DefaultExecutionContext):
+    def create_server_side_cursor(self):
+        return self._dbapi_connection.cursor(server_side=True)
+
+
 _PINOT_ASYNC_DBAPI = PinotAsyncAdaptDBAPIModule(pinotdb)
 
 
@@ -328,7 +397,7 @@ class PinotDialect(default.DefaultDialect):
     statement_compiler = PinotCompiler
     type_compiler = PinotTypeCompiler
     supports_schemas = False
-    supports_statement_cache = False
+    supports_statement_cache = True
     supports_alter = False
     supports_pk_autoincrement = False
     supports_default_values = False
@@ -339,13 +408,27 @@ class PinotDialect(default.DefaultDialect):
     description_encoding = None
     supports_native_boolean = True
     supports_simple_order_by_label = False
+    # `stream_results=True` executions page through the broker's response
+    # store.
+    supports_server_side_cursors = True
+    execution_ctx_cls = PinotExecutionContext
     broker_http_port = 8000
     broker_https_port = 443
+    # Maximum number of controller requests issued concurrently when
+    # reflecting many tables at once (e.g. `MetaData.reflect()`).
+    max_controller_workers = 8
+    # Number of retries for a controller request failing transiently (a
+    # transport error or a 502/503/504 response), with exponential backoff
+    # starting at `controller_retry_backoff` seconds.
+    controller_retries = 3
+    controller_retry_backoff = 0.1
+    controller_retry_statuses = frozenset({502, 503, 504})
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self._controller = None
+        self._controller_session = None
         self._username = None
         self._password = None
         self._debug = False
@@ -390,6 +473,8 @@ class PinotDialect(default.DefaultDialect):
             self._controller,
             self._debug,
         )
+        # Settings baked into the pooled controller client may have changed.
+        self.close_controller_session()
         return kwargs
 
     @classmethod
@@ -426,28 +511,100 @@ class PinotDialect(default.DefaultDialect):
         kwargs = self.update_from_kwargs(kwargs)
         return ([], kwargs)
 
-    def get_metadata_from_controller(self, path):
-        url = parse.urljoin(self._controller, path)
+    def get_controller_session(self):
+        """
+        Return the HTTP client used for controller metadata requests.
+
+        The client is created lazily and kept for the lifetime of the dialect,
+        so that connections to the controller are pooled and kept alive
+        across calls, including concurrent ones issued during reflection.
+        """
+        if (
+            self._controller_session is None
+            or self._controller_session.is_closed
+        ):
+            self._controller_session = httpx.Client(
+                **self._get_controller_client_kwargs())
+        return self._controller_session
+
+    def close_controller_session(self):
+        if self._controller_session is not None:
+            self._controller_session.close()
+            self._controller_session = None
+
+    def _get_controller_client_kwargs(self):
         headers = {"Accept": "application/json"}
         # Only send Database header when explicitly set to a non-None value,
-        # always as a string; Requests rejects non-string header values.
+        # always as a string; httpx rejects non-string header values.
         if self._database is not None:
             headers["Database"] = str(self._database)
 
-        # Only send basic auth when credentials are provided; passing None here
-        # triggers deprecation warnings in Requests.
-        auth = (
-            HTTPBasicAuth(self._username, self._password)
-            if self._username and self._password
-            else None
-        )
+        return {
+            "headers": headers,
+            # Only send basic auth when credentials are provided.
+            "auth": (
+                httpx.BasicAuth(self._username, self._password)
+                if self._username and self._password
+                else None
+            ),
+            "timeout": self._timeout if self._timeout else 10.0,
+            "transport": self._create_controller_transport(),
+        }
 
-        r = requests.get(
-            url,
-            headers=headers,
-            verify=self._verify_ssl,
-            auth=auth,
-        )
+    def _get_controller_transport_kwargs(self):
+        return {
+            "verify": self._verify_ssl,
+            "limits": httpx.Limits(
+                max_connections=self.max_controller_workers,
+                max_keepalive_connections=self.max_controller_workers,
+            ),
+            # Retries failed connection attempts only; failures after the
+            # request was sent are retried by `_get_from_controller`.
+            "retries": self.controller_retries,
+        }
+
+    def _create_controller_transport(self):
+        return httpx.HTTPTransport(**self._get_controller_transport_kwargs())
+
+    def _controller_retry_delays(self):
+        """
+        Yield the seconds to wait before each attempt of a controller
+        request (none before the first), counting the retries.
+        """
+        yield 0
+        for retry in range(self.controller_retries):
+            metrics.observe_retry("controller")
+            yield self.controller_retry_backoff * 2 ** retry
+
+    def _last_controller_response(self, url, response, error):
+        # All attempts failed: return the last response, or raise the error
+        # it failed with.
+        if error is not None:
+            raise exceptions.OperationalError(
+                f"Error when requesting {url}: {error}") from error
+        return response
+
+    def _get_from_controller(self, url):
+        session = self.get_controller_session()
+        r = error = None
+        for delay in self._controller_retry_delays():
+            if delay:
+                time.sleep(delay)
+            try:
+                r, error = session.get(url), None
+            except httpx.TransportError as e:
+                error = e
+                continue
+            if r.status_code not in self.controller_retry_statuses:
+                return r
+        return self._last_controller_response(url, r, error)
+
+    def get_metadata_from_controller(self, path):
+        url = parse.urljoin(self._controller, path)
+        r = self._get_from_controller(url)
+        return self._decode_controller_response(path, r)
+
+    def _decode_controller_response(self, path, r):
         try:
             result = r.json()
         except ValueError as e:
@@ -465,6 +622,19 @@ class PinotDialect(default.DefaultDialect):
             )
         return result
 
+    def get_many_metadata_from_controller(self, paths):
+        """
+        Fetch several controller paths concurrently, returning the decoded
+        payloads in the same order as `paths`.
+        """
+        paths = list(paths)
+        if len(paths) <= 1:
+            return [self.get_metadata_from_controller(p) for p in paths]
+        workers = min(len(paths), self.max_controller_workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(
+                executor.map(self.get_metadata_from_controller, paths))
+
     def get_schema_names(self, connection, **kwargs):
         if self._database:
             return [self._database]
@@ -474,6 +644,7 @@ class PinotDialect(default.DefaultDialect):
     def has_table(self, connection, table_name, schema=None):
         return table_name in self.get_table_names(connection, schema)
 
+    @reflection.cache
     def get_table_names(self, connection, schema=None, **kwargs):
         resp = self.get_metadata_from_controller("/tables")
         if 'tables' in resp:
@@ -487,11 +658,49 @@ class PinotDialect(default.DefaultDialect):
     def get_table_options(self, connection, table_name, schema=None, **kwargs):
         return {}
 
+    @reflection.cache
     def get_columns(self, connection, table_name, schema=None, **kwargs):
         payload = self.get_metadata_from_controller(
             f"/tables/{table_name}/schema"
         )
+        return self._get_columns_from_schema(table_name, payload)
 
+    def get_multi_columns(
+        self,
+        connection,
+        schema=None,
+        filter_names=None,
+        scope=ObjectScope.DEFAULT,
+        kind=ObjectKind.TABLE,
+        **kwargs,
+    ):
+        """
+        Reflect the columns of many tables at once, fetching their schemas
+        from the controller concurrently instead of one table at a time.
+        """
+        if (
+            filter_names
+            and scope is ObjectScope.ANY
+            and kind is ObjectKind.ANY
+        ):
+            names = list(filter_names)
+        elif ObjectKind.TABLE in kind and ObjectScope.DEFAULT in scope:
+            names = self.get_table_names(connection, schema, **kwargs)
+            if filter_names:
+                filter_names = set(filter_names)
+                names = [name for name in names if name in filter_names]
+        else:
+            return []
+
+        payloads = self.get_many_metadata_from_controller(
+            f"/tables/{name}/schema" for name in names
+        )
+        return [
+            ((schema, name), self._get_columns_from_schema(name, payload))
+            for name, payload in zip(names, payloads)
+        ]
+
+    def _get_columns_from_schema(self, table_name, payload):
         logger.info(
             "Getting columns for %s from %s: %s",
             table_name,
@@ -592,21 +801,92 @@ PinotHTTPDialect = PinotDialect
 
 class PinotHTTPSDialect(PinotDialect):
     scheme = "https"
+    supports_statement_cache = True
 
 
 class PinotMultiStageDialect(PinotDialect):
     engine_type = "multi_stage"
+    supports_statement_cache = True
 
 
 class PinotHTTPSMultiStageDialect(PinotDialect):
     engine_type = "multi_stage"
     scheme = "https"
+    supports_statement_cache = True
 
 
 class PinotAsyncDialect(PinotDialect):
     driver = "rest_async"
     is_async = True
-    supports_statement_cache = False
+    supports_statement_cache = True
+
+    def __init__(self, *args, **kwargs):
+        self._controller_session_loop = None
+        super().__init__(*args, **kwargs)
+
+    def get_controller_session(self):
+        """
+        Return the async HTTP client used for controller metadata requests.
+
+        Like the synchronous dialect, the client is kept and reused across
+        calls, as long as they happen within the same event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            self._controller_session is None
+            or self._controller_session.is_closed
+            or self._controller_session_loop is not loop
+        ):
+            self._controller_session = httpx.AsyncClient(
+                **self._get_controller_client_kwargs())
+            self._controller_session_loop = loop
+        return self._controller_session
+
+    def close_controller_session(self):
+        if self._controller_session is not None and in_greenlet():
+            await_only(self._controller_session.aclose())
+        # Outside of a greenlet the client can't be awaited on, so it's just
+        # dropped, leaving its connections to be garbage collected.
+        self._controller_session = None
+        self._controller_session_loop = None
+
+    def _create_controller_transport(self):
+        return httpx.AsyncHTTPTransport(
+            **self._get_controller_transport_kwargs())
+
+    def _get_from_controller(self, url):
+        # Reflection runs within SQLAlchemy's greenlet, so await the request
+        # there instead of blocking the event loop, as the cursor does.
+        return await_only(self._aget_from_controller(url))
+
+    async def _aget_from_controller(self, url):
+        session = self.get_controller_session()
+        r = error = None
+        for delay in self._controller_retry_delays():
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                r, error = await session.get(url), None
+            except httpx.TransportError as e:
+                error = e
+                continue
+            if r.status_code not in self.controller_retry_statuses:
+                return r
+        return self._last_controller_response(url, r, error)
+
+    def get_many_metadata_from_controller(self, paths):
+        return await_only(self._aget_many_metadata_from_controller(paths))
+
+    async def _aget_many_metadata_from_controller(self, paths):
+        semaphore = asyncio.Semaphore(self.max_controller_workers)
+
+        async def fetch(path):
+            async with semaphore:
+                r = await self._aget_from_controller(
+                    parse.urljoin(self._controller, path))
+            return self._decode_controller_response(path, r)
+
+        return list(await asyncio.gather(*map(fetch, paths)))
 
     @classmethod
     def get_pool_class(cls, url):
@@ -626,15 +906,18 @@ PinotHTTPAsyncDialect = PinotAsyncDialect
 
 class PinotHTTPSAsyncDialect(PinotAsyncDialect):
     scheme = "https"
+    supports_statement_cache = True
 
 
 class PinotMultiStageAsyncDialect(PinotAsyncDialect):
     engine_type = "multi_stage"
+    supports_statement_cache = True
 
 
 class PinotHTTPSMultiStageAsyncDialect(PinotAsyncDialect):
     engine_type = "multi_stage"
     scheme = "https"
+    supports_statement_cache = True
 
 
 def get_default(pinot_column_default):
@@ -0,0 +1,109 @@
+"""
+Breakdown of the time spent executing queries, exposed on `cursor.timings`.
+
+The phases of the request to the broker are timed with the httpx `trace`
+extension, whose events are only sent by the default (httpcore) transports:
+with other transports, the whole request is counted as waiting time.
+"""
+
+import time
+
+PHASES = (
+    "queue", "connect", "tls", "request", "wait", "download", "decode",
+    "convert", "total",
+)
+
+# Phases of a request, timed between two httpx trace events (without their
+# `connection.`/`http11.`/`http2.` prefix).
+_REQUEST_PHASES = (
+    ("connect", "connect_tcp.started", "connect_tcp.complete"),
+    ("tls", "start_tls.started", "start_tls.complete"),
+    ("request", "send_request_headers.started", "send_request_body.complete"),
+    (
+        "wait", "send_request_body.complete",
+        "receive_response_headers.complete",
+    ),
+    (
+        "download", "receive_response_headers.complete",
+        "receive_response_body.complete",
+    ),
+)
+# Events marking a connection to the broker as available.
+_CONNECTED_EVENTS = ("connect_tcp.started", "send_request_headers.started")
+
+
+class Timings:
+    """
+    Seconds spent in each phase of the last query executed by a cursor:
+
+    - `queue`: waiting for a connection to the broker from the pool;
+    - `connect`: opening a TCP connection, if no idle one could be reused;
+    - `tls`: the TLS handshake of a new connection, if any;
+    - `request`: writing the request;
+    - `wait`: waiting for the response (the broker time, plus the network
+      latency);
+    - `download`: reading the response body;
+    - `decode`: decoding the response (JSON or Arrow);
+    - `convert`: converting the rows to Python types;
+    - `total`: the wall time of `execute`.
+
+    Phases which didn't happen are 0.
+    """
+
+    __slots__ = PHASES
+
+    def __init__(self):
+        for phase in PHASES:
+            setattr(self, phase, 0.0)
+
+    @property
+    def time_to_first_byte(self):
+        """Seconds from getting a connection to receiving the response."""
+        return self.connect + self.tls + self.request + self.wait
+
+    def as_dict(self):
+        return {phase: getattr(self, phase) for phase in PHASES}
+
+    def __repr__(self):
+        phases = ", ".join(
+            f"{phase}={getattr(self, phase) * 1000:.3f}ms" for phase in PHASES)
+        return f"Timings({phases})"
+
+
+class RequestTimer:
+    """
+    httpx `trace` extension timing the phases of a request into `timings`,
+    and forwarding the events to `forward`, if given.
+    """
+
+    def __init__(self, timings, forward=None):
+        self.timings = timings
+        self.forward = forward
+        self.events = {}
+        self.started = time.perf_counter()
+
+    def __call__(self, event, info):
+        self.events[event.partition(".")[2]] = time.perf_counter()
+        if self.forward is not None:
+            self.forward(event, info)
+
+    def finish(self):
+        """Record the duration of the phases of the finished request."""
+        ended = time.perf_counter()
+        events = self.events
+        timings = self.timings
+        if not events:
+            timings.wait = ended - self.started
+            return
+        connected = min(
+            (events[e] for e in _CONNECTED_EVENTS if e in events),
+            default=self.started)
+        timings.queue = connected - self.started
+        for phase, start, end in _REQUEST_PHASES:
+            if start in events and end in events:
+                setattr(timings, phase, events[end] - events[start])
+
+
+class AsyncRequestTimer(RequestTimer):
+    async def __call__(self, event, info):
+        super().__call__(event, info)
@@ -0,0 +1,164 @@
+"""
+OpenTelemetry tracing of queries.
+
+Spans are only emitted when the `opentelemetry-api` package is installed, and
+recorded by the tracer provider the application configured, if any: without
+the package, the functions traced are left untouched.
+
+Each `execute` is traced as a `pinot.query` span, tagged with the statement
+and the query stats of the response, whose children are:
+
+- `pinot.request`, the request to the broker, carrying the trace context to
+  the broker in its headers, with children for sending the request
+  (`pinot.request.send`), waiting for the response (`pinot.response.wait`)
+  and reading its body (`pinot.response.read`);
+- `pinot.decode`, the decoding of the response;
+- `pinot.convert`, the conversion of the rows to Python types.
+"""
+
+import contextlib
+import functools
+import importlib.util
+import inspect
+
+from pinotdb.lazy import LazyModule
+
+
+class LazyTracer:
+    """Tracer `name`, only got (importing OpenTelemetry) when first used."""
+
+    def __init__(self, name):
+        self.name = name
+        self._tracer = None
+
+    def __getattr__(self, attr):
+        if self._tracer is None:
+            self._tracer = trace.get_tracer(self.name)
+        return getattr(self._tracer, attr)
+
+
+def _is_installed(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:  # pragma: no cover
+        return False
+
+
+# OpenTelemetry is imported once a query is executed, to keep `import
+# pinotdb` fast.
+if _is_installed("opentelemetry.trace"):
+    propagate = LazyModule("opentelemetry.propagate")
+    trace = LazyModule("opentelemetry.trace")
+    tracer = LazyTracer("pinotdb")
+else:  # pragma: no cover
+    trace = tracer = None
+
+_NO_SPAN = contextlib.nullcontext()
+
+# httpx trace events (without their `http11.`/`http2.` prefix) starting a
+# phase of a request, and the span tracing it.
+_REQUEST_PHASES = {
+    "send_request_headers.started": "pinot.request.send",
+    "send_request_body.complete": "pinot.response.wait",
+    "receive_response_headers.complete": "pinot.response.read",
+    "receive_response_body.complete": None,
+}
+
+
+def traced(name):
+    """Decorator tracing calls of a function or coroutine as `name` spans."""
+
+    def decorator(f):
+        if tracer is None:
+            return f
+
+        if inspect.iscoroutinefunction(f):
+            @functools.wraps(f)
+            async def traced_coroutine(*args, **kwargs):
+                with tracer.start_as_current_span(name):
+                    return await f(*args, **kwargs)
+
+            return traced_coroutine
+
+        @functools.wraps(f)
+        def traced_function(*args, **kwargs):
+            with tracer.start_as_current_span(name):
+                return f(*args, **kwargs)
+
+        return traced_function
+
+    return decorator
+
+
+def span(name):
+    """Return a context manager tracing its block as a `name` span."""
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.start_as_current_span(name)
+
+
+def _current_span():
+    if trace is None:
+        return None
+    current = trace.get_current_span()
+    return current if current.is_recording() else None
+
+
+def set_attributes(attributes):
+    """Set `attributes` on the current span."""
+    current = _current_span()
+    if current is not None:
+        current.set_attributes(attributes)
+
+
+def record_query_stats(query_stats):
+    """Tag the current span with the (scalar) query stats of a response."""
+    current = _current_span()
+    if current is not None:
+        current.set_attributes({
+            f"pinot.{key}": value for key, value in query_stats.items()
+            if isinstance(value, (str, bool, int, float))
+        })
+
+
+def inject(headers):
+    """Add the current trace context to the `headers` of a request."""
+    if trace is not None:
+        propagate.inject(headers)
+    return headers
+
+
+class RequestPhases:
+    """
+    Callback of httpx `trace` events tracing the phases of a request as
+    children of the span it was created in.
+    """
+
+    def __init__(self):
+        self.context = trace.set_span_in_context(trace.get_current_span())
+        self.span = None
+
+    def __call__(self, event, info):
+        _, _, phase = event.partition(".")
+        if phase.endswith(".failed"):
+            self.end()
+        elif phase in _REQUEST_PHASES:
+            self.end()
+            name = _REQUEST_PHASES[phase]
+            if name is not None:
+                self.span = tracer.start_span(name, context=self.context)
+
+    def end(self):
+        if self.span is not None:
+            self.span.end()
+            self.span = None
+
+
+def request_phases():
+    """
+    Return the callback of httpx trace events adding the phases of a request
+    to the current span, if it is recorded.
+    """
+    if _current_span() is None:
+        return None
+    return RequestPhases()
@@ -0,0 +1,90 @@
+"""
+Compares the time spent decoding a large selection result sent by the broker
+as JSON and in the Arrow format.
+
+Run with `pytest -s tests/benchmark/` to see the timings.
+"""
+
+import datetime
+import json
+import timeit
+from unittest import TestCase, skipIf
+
+import httpx
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from pinotdb import db
+
+ROWS = 100_000
+
+
+@skipIf(pa is None, 'pyarrow is not installed')
+class ArrowDecodingBenchmark(TestCase):
+    def setUp(self):
+        from pinotdb import arrow
+
+        column_names = ['id', 'carrier', 'delay', 'ts']
+        column_data_types = ['LONG', 'STRING', 'DOUBLE', 'TIMESTAMP']
+        start = datetime.datetime(2024, 1, 1)
+        timestamps = [
+            start + datetime.timedelta(seconds=i) for i in range(ROWS)]
+        json_body = json.dumps({
+            'numServersResponded': 1,
+            'numServersQueried': 1,
+            'resultTable': {
+                'dataSchema': {
+                    'columnNames': column_names,
+                    'columnDataTypes': column_data_types,
+                },
+                'rows': [
+                    [i, f'C{i % 20}', i * 0.5, str(ts)]
+                    for i, ts in enumerate(timestamps)
+                ],
+            },
+        }).encode()
+        table = pa.table({
+            'id': pa.array(range(ROWS), pa.int64()),
+            'carrier': [f'C{i % 20}' for i in range(ROWS)],
+            'delay': [i * 0.5 for i in range(ROWS)],
+            'ts': pa.array(timestamps, pa.timestamp('ms')),
+        }).replace_schema_metadata({
+            'pinot.response': json.dumps({
+                'numServersResponded': 1,
+                'numServersQueried': 1,
+            }),
+        })
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        self.json_response = httpx.Response(
+            200, content=json_body,
+            headers={'Content-Type': 'application/json'})
+        self.arrow_response = httpx.Response(
+            200, content=sink.getvalue().to_pybytes(),
+            headers={'Content-Type': arrow.MEDIA_TYPE})
+
+    def _time_decoding(self, response, response_format):
+        cursor = db.Cursor(
+            host='localhost', session=httpx.Client(),
+            response_format=response_format)
+
+        def run():
+            cursor.normalize_query_response('some statement', response)
+            assert len(cursor.fetchall()) == ROWS
+
+        return min(timeit.repeat(run, number=1, repeat=3))
+
+    def test_decodes_arrow_responses_faster_than_json(self):
+        json_time = self._time_decoding(self.json_response, 'json')
+        arrow_time = self._time_decoding(self.arrow_response, 'arrow')
+
+        print(
+            f"\nDecoding {ROWS} rows: {json_time * 1000:.1f}ms from JSON, "
+            f"{arrow_time * 1000:.1f}ms from Arrow "
+            f"({ROWS / arrow_time:,.0f} rows/s)"
+        )
+        self.assertLess(arrow_time, json_time)
@@ -0,0 +1,49 @@
+"""
+Measures the time spent importing pinotdb, as reported by
+`python -X importtime`, which matters to short-lived processes, and checks
+that it does not import the modules only needed once connected.
+
+Run with `pytest -s tests/benchmark/` to see the timings.
+"""
+
+import re
+import subprocess
+import sys
+from unittest import TestCase
+
+RUNS = 5
+
+
+def _import_time(module):
+    """Return the microseconds spent importing `module` in a new process."""
+    report = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        check=True, capture_output=True, text=True,
+    ).stderr
+    return int(re.search(
+        rf'^import time:\s+\d+ \|\s+(\d+) \| {re.escape(module)}$',
+        report, re.MULTILINE).group(1))
+
+
+class ImportTimeBenchmark(TestCase):
+    def test_imports_pinotdb(self):
+        # The first import may compile the modules.
+        _import_time('pinotdb')
+        pinotdb = min(_import_time('pinotdb') for _ in range(RUNS))
+        httpx = min(_import_time('httpx') for _ in range(RUNS))
+
+        print(
+            f"\nimport pinotdb: {pinotdb / 1000:.1f}ms "
+            f"(import httpx alone: {httpx / 1000:.1f}ms)"
+        )
+        self.assertLess(pinotdb, httpx)
+
+    def test_imports_pinotdb_without_httpx_or_ciso8601(self):
+        loaded = subprocess.run(
+            [sys.executable, '-c',
+             'import sys, pinotdb; print(*sorted(sys.modules))'],
+            check=True, capture_output=True, text=True,
+        ).stdout.split()
+
+        self.assertNotIn('httpx', loaded)
+        self.assertNotIn('ciso8601', loaded)
@@ -0,0 +1,42 @@
+"""
+Compares the time spent looking up the attributes of a lazily imported
+module with a `__getattribute__` override, as `LazyModule` does, and with a
+`__getattr__` fallback, only called by modules once an AttributeError is
+raised.
+
+Run with `pytest -s tests/benchmark/` to see the timings.
+"""
+
+import importlib
+import timeit
+import types
+from unittest import TestCase
+
+from pinotdb.lazy import LazyModule
+
+LOOKUPS = 200_000
+
+
+class FallbackLazyModule(types.ModuleType):
+    """Lazy module importing `name` on a failed attribute lookup."""
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self.__name__), attr)
+
+
+class LazyModuleBenchmark(TestCase):
+    def test_looks_up_attributes_faster_than_fallback(self):
+        def time(module):
+            return min(timeit.repeat(
+                lambda: module.loads, number=LOOKUPS, repeat=3))
+
+        plain = time(importlib.import_module('json'))
+        fallback = time(FallbackLazyModule('json'))
+        lazy = time(LazyModule('json'))
+
+        print(
+            f"\n{LOOKUPS} attribute lookups: {plain * 1000:.1f}ms on the "
+            f"module, {fallback * 1000:.1f}ms with a __getattr__ fallback, "
+            f"{lazy * 1000:.1f}ms with LazyModule"
+        )
+        self.assertLess(lazy, fallback)
@@ -0,0 +1,87 @@
+"""
+Compares the time spent converting a multi-value TIMESTAMP_ARRAY column value
+by value and all at once, in JSON and Arrow responses.
+
+Run with `pytest -s tests/benchmark/` to see the timings.
+"""
+
+import datetime
+import timeit
+from unittest import TestCase, skipIf
+
+import ciso8601
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from pinotdb import db
+
+ROWS = 20_000
+VALUES = 5
+START = datetime.datetime(2024, 1, 1)
+
+
+def _timestamps(row):
+    return [
+        START + datetime.timedelta(seconds=row * VALUES + i)
+        for i in range(VALUES)
+    ]
+
+
+class MultiValueConversionBenchmark(TestCase):
+    def test_converts_json_multi_values(self):
+        lists = [[str(ts) for ts in _timestamps(row)] for row in range(ROWS)]
+        types = db.get_types_from_column_data_types(['TIMESTAMP_ARRAY'])
+
+        def by_value(rows):
+            for row in rows:
+                row[0] = [
+                    ciso8601.parse_datetime(value) if value is not None
+                    else None
+                    for value in row[0]
+                ]
+
+        def per_list(rows):
+            db.convert_rows(db.get_row_converter(types), rows)
+
+        def time(convert):
+            return min(
+                timeit.timeit(
+                    'convert(rows)',
+                    setup='rows = [[values] for values in lists]',
+                    globals={'convert': convert, 'lists': lists},
+                    number=1)
+                for _ in range(3))
+
+        print(
+            f"\nConverting {ROWS} JSON lists of {VALUES} timestamps: "
+            f"{time(by_value) * 1000:.1f}ms value by value, "
+            f"{time(per_list) * 1000:.1f}ms list by list"
+        )
+
+    @skipIf(pa is None, 'pyarrow is not installed')
+    def test_converts_arrow_multi_values(self):
+        from pinotdb import arrow
+
+        table = pa.table({
+            'ts': pa.array(
+                [_timestamps(row) for row in range(ROWS)],
+                pa.list_(pa.timestamp('ms'))),
+        })
+        types = db.get_types_from_column_data_types(['TIMESTAMP_ARRAY'])
+
+        def by_list():
+            table.column('ts').to_pylist()
+
+        def at_once():
+            arrow.get_rows(table, types)
+
+        print(
+            f"\nConverting {ROWS} Arrow lists of {VALUES} timestamps: "
+            f"{min(timeit.repeat(by_list, number=1, repeat=3)) * 1000:.1f}"
+            "ms with pyarrow, "
+            f"{min(timeit.repeat(at_once, number=1, repeat=3)) * 1000:.1f}"
+            "ms all at once"
+        )
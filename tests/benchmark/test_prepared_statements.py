@@ -0,0 +1,52 @@
+"""
+Compares the time spent applying parameters to the same SQL operation over
+and over, parsing it every time and with a prepared statement.
+
+Run with `pytest -s tests/benchmark/` to see the timings.
+"""
+
+import timeit
+from unittest import TestCase
+
+from pinotdb import db
+
+EXECUTIONS = 20_000
+OPERATION = """
+    SELECT Carrier, SUM(ArrDelay)
+    FROM airlineStats
+    WHERE AirlineID = %(airline_id)s
+      AND Origin LIKE '%%S%%'
+      AND Dest = %(dest)s
+      AND DaysSinceEpoch BETWEEN %(start)s AND %(end)s
+    GROUP BY Carrier
+    LIMIT 10
+"""
+
+
+class PreparedStatementBenchmark(TestCase):
+    def test_binds_parameters_faster_with_prepared_statement(self):
+        parameters = [
+            {'airline_id': i, 'dest': 'SFO', 'start': 16071, 'end': 16100}
+            for i in range(EXECUTIONS)
+        ]
+        statement = db.PreparedStatement(OPERATION)
+
+        def apply():
+            for p in parameters:
+                template, keys = db._parse_operation(
+                    OPERATION, 'pyformat')
+                db.bind_parameters(template, keys, p, 'pyformat')
+
+        def bind():
+            for p in parameters:
+                statement.bind(p)
+
+        applied = min(timeit.repeat(apply, number=1, repeat=3))
+        bound = min(timeit.repeat(bind, number=1, repeat=3))
+
+        print(
+            f"\n{EXECUTIONS} parameter bindings: "
+            f"{applied * 1000:.1f}ms parsing the operation every time, "
+            f"{bound * 1000:.1f}ms with a prepared statement"
+        )
+        self.assertLess(bound, applied)
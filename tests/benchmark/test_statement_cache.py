@@ -0,0 +1,82 @@
+"""
+Compares the time spent compiling repeated Superset-style queries with and
+without SQLAlchemy's compiled statement cache.
+
+Run with `pytest -s tests/benchmark/` to see the timings.
+"""
+
+import timeit
+from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, create_engine, func,
+    select,
+)
+from sqlalchemy.dialects import registry
+
+EXECUTIONS = 200
+
+
+def superset_query(table, carriers):
+    time_column = func.DATETIMECONVERT(
+        table.c.DaysSinceEpoch, '1:DAYS:EPOCH', '1:DAYS:EPOCH', '1:DAYS',
+    ).label('__timestamp')
+    return (
+        select(
+            time_column,
+            table.c.Carrier,
+            func.sum(table.c.ArrDelay).label('total_delay'),
+            func.count().label('count'),
+        )
+        .where(table.c.DaysSinceEpoch >= 16071)
+        .where(table.c.Carrier.in_(carriers))
+        .group_by(time_column, table.c.Carrier)
+        .order_by(func.sum(table.c.ArrDelay).desc())
+        .limit(100)
+    )
+
+
+class StatementCacheBenchmark(TestCase):
+    def setUp(self):
+        registry.register('pinot', 'pinotdb.sqlalchemy', 'PinotDialect')
+        patcher = patch('pinotdb.sqlalchemy.pinotdb.connect')
+        connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        cursor = connect.return_value.cursor.return_value
+        cursor.description = [
+            (name, None, None, None, None, None, None)
+            for name in ('__timestamp', 'Carrier', 'total_delay', 'count')
+        ]
+        cursor.fetchall.return_value = []
+        self.engine = create_engine(
+            'pinot://localhost:8000/query/sql'
+            '?controller=http://localhost:9000/')
+        self.table = Table(
+            'airlineStats', MetaData(),
+            Column('DaysSinceEpoch', Integer),
+            Column('Carrier', String),
+            Column('ArrDelay', Integer),
+            Column('Date', DateTime),
+        )
+
+    def _time_executions(self, engine):
+        def run():
+            with engine.connect() as connection:
+                for i in range(EXECUTIONS):
+                    connection.execute(
+                        superset_query(self.table, ['AA', 'DL', str(i)]))
+
+        return min(timeit.repeat(run, number=1, repeat=3))
+
+    def test_compiles_repeated_queries_faster_with_cache(self):
+        uncached = self._time_executions(
+            self.engine.execution_options(compiled_cache=None))
+        cached = self._time_executions(self.engine)
+
+        print(
+            f"\n{EXECUTIONS} Superset-style executions: "
+            f"{uncached * 1000:.1f}ms without statement cache, "
+            f"{cached * 1000:.1f}ms with statement cache"
+        )
+        self.assertLess(cached, uncached)
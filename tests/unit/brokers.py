@@ -0,0 +1,145 @@
+"""
+Fake Pinot brokers, as httpx transports to create the sessions of cursors
+with, recording the requests they receive.
+"""
+
+import json
+import re
+
+import httpx
+
+
+class Broker(httpx.MockTransport):
+    """Transport answering requests with `handler`, and recording them."""
+
+    def __init__(self, handler):
+        super().__init__(handler)
+        self.requests = []
+
+    @property
+    def queries(self):
+        """Return the SQL of the queries received."""
+        return [
+            json.loads(request.content)['sql'] for request in self.requests
+            if request.method == 'POST'
+        ]
+
+    def handle_request(self, request):
+        self.requests.append(request)
+        return super().handle_request(request)
+
+    async def handle_async_request(self, request):
+        self.requests.append(request)
+        return await super().handle_async_request(request)
+
+
+def result(rows=([1],), column_names=('n',), column_data_types=('INT',),
+           **stats):
+    """
+    Return the JSON of a broker response with the result `rows`, and the
+    `stats` added to (or replacing) the default ones.
+    """
+    return {
+        'numServersResponded': 1,
+        'numServersQueried': 1,
+        'resultTable': {
+            'dataSchema': {
+                'columnNames': list(column_names),
+                'columnDataTypes': list(column_data_types),
+            },
+            'rows': [list(row) for row in rows],
+        },
+        **stats,
+    }
+
+
+def broker(status_code=200, **result_args):
+    """
+    Return a broker answering all requests with the `status_code` and the
+    result of `result_args` (see `result`).
+    """
+    response = result(**result_args)
+    return Broker(lambda request: httpx.Response(status_code, json=response))
+
+
+def stored_page(rows, request_id, offset, size):
+    """
+    Return the response of a broker with the page of `size` rows at
+    `offset` of the result `rows` kept in its response store.
+    """
+    page = rows[offset:offset + size]
+    return httpx.Response(200, json=result(
+        page, requestId=request_id, offset=offset, numRows=len(page),
+        numRowsResultSet=len(rows)))
+
+
+def paging_broker(num_rows, page_size, cursor_support=True):
+    """
+    Return a broker serving `num_rows` single-column rows in pages, like a
+    broker keeping results in its response store.
+    """
+    rows = [[i] for i in range(num_rows)]
+
+    def handler(request):
+        if request.method == 'POST':
+            if not cursor_support:
+                return httpx.Response(200, json=result(rows))
+            return stored_page(rows, '42', 0, page_size)
+        if request.method == 'DELETE':
+            return httpx.Response(200, json={})
+        return stored_page(
+            rows, '42', int(request.url.params['offset']),
+            int(request.url.params['numRows']))
+
+    return Broker(handler)
+
+
+def partitioned_broker(values=range(10)):
+    """
+    Return a broker answering MIN/MAX queries and range queries on the `n`
+    column over `values`, serving the results of the latter in pages when
+    asked for a cursor.
+    """
+    stored = {}
+
+    def handler(request):
+        params = request.url.params
+        if request.method == 'DELETE':
+            return httpx.Response(200, json={})
+        if request.method == 'GET':
+            request_id = request.url.path.split('/')[2]
+            return stored_page(
+                stored[request_id], request_id, int(params['offset']),
+                int(params['numRows']))
+        sql = json.loads(request.content)['sql']
+        if 'MIN(n)' in sql:
+            return httpx.Response(200, json=result(
+                [[float(min(values)), float(max(values))]],
+                ['min(n)', 'max(n)'], ['DOUBLE', 'DOUBLE']))
+        low, op, high = re.search(
+            r'n >= (\d+) AND n (<=?) (\d+)', sql).groups()
+        rows = [
+            [n] for n in values
+            if int(low) <= n and (
+                n <= int(high) if op == '<=' else n < int(high))
+        ]
+        if params.get('getCursor') != 'true':
+            return httpx.Response(200, json=result(rows))
+        # Ranges start at different values, identifying their results.
+        stored[low] = rows
+        return stored_page(rows, low, 0, int(params['numRows']))
+
+    return Broker(handler)
+
+
+def timing_out_broker(timeout=httpx.ReadTimeout):
+    """
+    Return a broker raising `timeout` on queries, and acknowledging query
+    cancellations.
+    """
+    def handler(request):
+        if request.method == 'DELETE':
+            return httpx.Response(200, json={})
+        raise timeout('timed out', request=request)
+
+    return Broker(handler)
@@ -0,0 +1,267 @@
+import datetime
+import json
+from unittest import TestCase, skipIf
+from unittest.mock import patch
+
+import httpx
+
+try:
+    from unittest import IsolatedAsyncioTestCase
+except ImportError:
+    from mock.backports import IsolatedAsyncioTestCase
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from pinotdb import db, exceptions
+
+if pa is not None:
+    from pinotdb import arrow
+
+
+class FakeBroker:
+    """
+    Serves a broker response in the Arrow format to clients accepting it
+    (unless `supports_arrow` is false), and in JSON to the others.
+    """
+
+    stats = {'numServersResponded': 1, 'numServersQueried': 1}
+    column_names = ['id', 'name', 'created', 'tags', 'doc']
+    column_data_types = ['INT', 'STRING', 'TIMESTAMP', 'INT_ARRAY', 'JSON']
+
+    def __init__(self, supports_arrow=True):
+        self.supports_arrow = supports_arrow
+        self.requests = []
+
+    def json_rows(self):
+        return [
+            [1, 'a', '2024-01-02 03:04:05.0', [1, 2], '{"x": 1}'],
+            [2, None, '2024-01-03 03:04:05.0', [], ''],
+        ]
+
+    def arrow_table(self):
+        fields = [
+            pa.field(name, arrow_type, metadata={'pinot.type': data_type})
+            for name, arrow_type, data_type in zip(
+                self.column_names,
+                [pa.int32(), pa.string(), pa.timestamp('ms'),
+                 pa.list_(pa.int32()), pa.string()],
+                self.column_data_types,
+            )
+        ]
+        schema = pa.schema(
+            fields, metadata={'pinot.response': json.dumps(self.stats)})
+        return pa.table([
+            [1, 2],
+            ['a', None],
+            [datetime.datetime(2024, 1, 2, 3, 4, 5),
+             datetime.datetime(2024, 1, 3, 3, 4, 5)],
+            [[1, 2], []],
+            ['{"x": 1}', ''],
+        ], schema=schema)
+
+    def handle(self, request):
+        self.requests.append(request)
+        if (
+            self.supports_arrow
+            and arrow.MEDIA_TYPE in request.headers.get('Accept', '')
+        ):
+            sink = pa.BufferOutputStream()
+            table = self.arrow_table()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return httpx.Response(
+                200, content=sink.getvalue().to_pybytes(),
+                headers={'Content-Type': arrow.MEDIA_TYPE})
+        return httpx.Response(200, json={
+            **self.stats,
+            'resultTable': {
+                'dataSchema': {
+                    'columnNames': self.column_names,
+                    'columnDataTypes': self.column_data_types,
+                },
+                'rows': self.json_rows(),
+            },
+        })
+
+
+EXPECTED_ROWS = [
+    [1, 'a', datetime.datetime(2024, 1, 2, 3, 4, 5), [1, 2], {'x': 1}],
+    [2, None, datetime.datetime(2024, 1, 3, 3, 4, 5), [], None],
+]
+
+
+@skipIf(pa is None, 'pyarrow is not installed')
+class ArrowCursorTest(TestCase):
+    def create_cursor(self, supports_arrow=True, response_format='arrow'):
+        self.broker = FakeBroker(supports_arrow)
+        return db.Cursor(
+            host='localhost',
+            session=httpx.Client(
+                transport=httpx.MockTransport(self.broker.handle)),
+            response_format=response_format)
+
+    def test_accepts_arrow_responses(self):
+        cursor = self.create_cursor()
+
+        cursor.execute('some statement')
+
+        self.assertEqual(
+            self.broker.requests[0].headers['Accept'],
+            'application/vnd.apache.arrow.stream, application/json;q=0.9')
+
+    def test_reads_arrow_responses(self):
+        cursor = self.create_cursor()
+
+        cursor.execute('some statement')
+
+        self.assertEqual(cursor.fetchall(), EXPECTED_ROWS)
+        self.assertEqual(
+            [column[0] for column in cursor.description],
+            FakeBroker.column_names)
+        self.assertEqual(cursor.query_stats['numServersQueried'], 1)
+
+    def test_falls_back_to_json_responses(self):
+        cursor = self.create_cursor(supports_arrow=False)
+
+        cursor.execute('some statement')
+
+        self.assertEqual(cursor.fetchall(), EXPECTED_ROWS)
+
+    def test_fetches_arrow_table_as_sent(self):
+        cursor = self.create_cursor()
+        cursor.execute('some statement')
+
+        cursor.fetchone()
+        table = cursor.fetch_arrow_table()
+
+        self.assertEqual(table.num_rows, 1)
+        self.assertEqual(table.column('id').to_pylist(), [2])
+        self.assertEqual(table.schema.field('created').type, pa.timestamp('ms'))
+        self.assertIsNone(cursor.fetchone())
+
+    def test_fetches_arrow_table_without_creating_rows(self):
+        cursor = self.create_cursor()
+
+        with patch.object(arrow, 'get_rows') as get_rows:
+            cursor.execute('some statement')
+            table = cursor.fetch_arrow_table()
+
+        get_rows.assert_not_called()
+        self.assertEqual(table.num_rows, 2)
+
+    def test_fetches_arrow_table_from_json_responses(self):
+        cursor = self.create_cursor(
+            supports_arrow=False, response_format='json')
+        cursor.execute('some statement')
+
+        table = cursor.fetch_arrow_table()
+
+        self.assertEqual(table.column_names, FakeBroker.column_names)
+        self.assertEqual(table.column('id').to_pylist(), [1, 2])
+
+    def test_fails_with_unknown_response_format(self):
+        with self.assertRaises(exceptions.NotSupportedError):
+            self.create_cursor(response_format='xml')
+
+    @patch('importlib.util.find_spec', return_value=None)
+    def test_fails_with_arrow_format_without_pyarrow(self, _):
+        with self.assertRaises(exceptions.NotSupportedError):
+            self.create_cursor()
+
+    def test_derives_column_data_types_from_arrow_types(self):
+        schema = pa.schema([
+            ('a', pa.int64()),
+            ('b', pa.float32()),
+            ('c', pa.list_(pa.float64())),
+            ('d', pa.binary()),
+            ('e', pa.string()),
+            ('f', pa.timestamp('ms')),
+            ('g', pa.map_(pa.string(), pa.string())),
+        ])
+
+        self.assertEqual(
+            [arrow.get_column_data_type(field) for field in schema],
+            ['LONG', 'FLOAT', 'DOUBLE_ARRAY', 'BYTES', 'STRING', 'TIMESTAMP',
+             'MAP'])
+
+
+@skipIf(pa is None, 'pyarrow is not installed')
+class GetRowsTest(TestCase):
+    def get_rows(self, table):
+        types = db.get_types_from_column_data_types(
+            [arrow.get_column_data_type(field) for field in table.schema])
+        return arrow.get_rows(table, types)
+
+    def test_converts_multi_value_timestamps(self):
+        first = datetime.datetime(2024, 1, 2, 3, 4, 5)
+        second = datetime.datetime(2024, 1, 3)
+        lists = pa.chunked_array([
+            [[first, second], None, []],
+            [[second, None]],
+        ], pa.list_(pa.timestamp('ms')))
+
+        rows = self.get_rows(pa.table({'ts': lists}))
+
+        self.assertEqual(rows, [
+            [[first, second]], [None], [[]], [[second, None]]])
+
+    def test_converts_multi_value_timestamps_of_sliced_tables(self):
+        first = datetime.datetime(2024, 1, 2, 3, 4, 5)
+        second = datetime.datetime(2024, 1, 3)
+        table = pa.table({
+            'ts': pa.array(
+                [[first], [first, second], [second]],
+                pa.list_(pa.timestamp('ms'))),
+        })
+
+        rows = self.get_rows(table.slice(1))
+
+        self.assertEqual(rows, [[[first, second]], [[second]]])
+
+    def test_converts_multi_value_columns_sent_as_strings(self):
+        field = pa.field(
+            'ts', pa.list_(pa.string()),
+            metadata={'pinot.type': 'TIMESTAMP_ARRAY'})
+        table = pa.table(
+            [[['2024-01-02 03:04:05.0'], []]], schema=pa.schema([field]))
+
+        rows = self.get_rows(table)
+
+        self.assertEqual(
+            rows, [[[datetime.datetime(2024, 1, 2, 3, 4, 5)]], [[]]])
+
+    def test_reads_bytes_as_hex_strings_like_json_responses(self):
+        table = pa.table({
+            'b': pa.array([b'\x01\xab', None], pa.binary()),
+            'bs': pa.array([[b'\xff', None], None], pa.list_(pa.binary())),
+        })
+
+        rows = self.get_rows(table)
+
+        self.assertEqual(rows, [['01ab', ['ff', None]], [None, None]])
+
+    def test_reads_maps_as_dicts(self):
+        table = pa.table({
+            'm': pa.array(
+                [[('a', '1')], None], pa.map_(pa.string(), pa.string())),
+        })
+
+        self.assertEqual(self.get_rows(table), [[{'a': '1'}], [None]])
+
+
+@skipIf(pa is None, 'pyarrow is not installed')
+class AsyncArrowCursorTest(IsolatedAsyncioTestCase):
+    async def test_reads_arrow_responses(self):
+        broker = FakeBroker()
+        cursor = db.AsyncCursor(
+            host='localhost',
+            session=httpx.AsyncClient(
+                transport=httpx.MockTransport(broker.handle)),
+            response_format='arrow')
+
+        await cursor.execute('some statement')
+
+        self.assertEqual(cursor.fetchall(), EXPECTED_ROWS)
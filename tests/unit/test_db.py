@@ -1,5 +1,12 @@
+import asyncio
 import datetime
+import decimal
+import gzip
+import json
+import re
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, Optional
 from unittest import TestCase
 from unittest.mock import ANY, MagicMock, patch
@@ -17,6 +24,7 @@ except ImportError:
     from mock import AsyncMock
 
 from pinotdb import db, exceptions
+from tests.unit import brokers
 
 
 class ConnectionTest(TestCase):
@@ -183,6 +191,97 @@ class ConnectionTest(TestCase):
 
         self.assertTrue(cursor.closed)
 
+    def test_extracts_partitions_concurrently(self):
+        broker = brokers.partitioned_broker()
+        connection = db.Connection(
+            host='localhost', session=httpx.Client(transport=broker))
+
+        rows = connection.extract(
+            'SELECT n FROM t WHERE {partition} LIMIT 100', 'n', parts=4)
+
+        self.assertEqual(list(rows), [[n] for n in range(10)])
+        self.assertEqual(broker.queries[0], 'SELECT MIN(n), MAX(n) FROM t')
+        self.assertCountEqual(broker.queries[1:], [
+            'SELECT n FROM t WHERE (n >= 0 AND n < 3) LIMIT 100',
+            'SELECT n FROM t WHERE (n >= 3 AND n < 6) LIMIT 100',
+            'SELECT n FROM t WHERE (n >= 6 AND n < 9) LIMIT 100',
+            'SELECT n FROM t WHERE (n >= 9 AND n <= 9) LIMIT 100',
+        ])
+
+    def test_extracts_partitions_unordered_with_bounds(self):
+        broker = brokers.partitioned_broker()
+        connection = db.Connection(
+            host='localhost', session=httpx.Client(transport=broker))
+
+        rows = connection.extract(
+            'SELECT n FROM t WHERE {partition}', 'n', parts=2,
+            bounds=(2, 7), ordered=False, max_workers=1)
+
+        self.assertEqual(sorted(rows), [[n] for n in range(2, 8)])
+        self.assertEqual(len(broker.queries), 2)
+
+    def test_streams_partitions_in_pages(self):
+        broker = brokers.partitioned_broker(range(12))
+        connection = db.Connection(
+            host='localhost', session=httpx.Client(transport=broker),
+            page_size=2)
+
+        rows = connection.extract(
+            'SELECT n FROM t WHERE {partition}', 'n', parts=3)
+
+        self.assertEqual(next(rows), [0])
+        # Only the first page of the other partitions was read.
+        self.assertEqual(
+            [r.method for r in broker.requests].count('GET'), 0)
+        self.assertEqual(list(rows), [[n] for n in range(1, 12)])
+        requests = [r.method for r in broker.requests]
+        self.assertEqual(requests.count('GET'), 3)
+        self.assertEqual(requests.count('DELETE'), 3)
+        # The cursors of the partitions are released.
+        self.assertEqual(len(connection.cursors), 1)
+
+    def test_requires_partition_placeholder_to_extract(self):
+        connection = db.Connection(host='localhost')
+
+        with self.assertRaises(exceptions.ProgrammingError):
+            connection.extract('SELECT n FROM t', 'n', bounds=(0, 1))
+
+    def test_splits_partition_ranges(self):
+        self.assertEqual(
+            db.get_partition_conditions('n', 0, 1, 4),
+            ['n >= 0 AND n < 1', 'n >= 1 AND n <= 1'])
+        self.assertEqual(
+            db.get_partition_conditions('n', 0.0, 0.5, 2),
+            ['n >= 0.0 AND n < 0.25', 'n >= 0.25 AND n <= 0.5'])
+        self.assertEqual(
+            db.get_partition_conditions('n', float('inf'), float('-inf'), 2),
+            [])
+
+    def test_splits_float_ranges_without_gaps_or_overlaps(self):
+        conditions = db.get_partition_conditions('n', 0.1, 0.7, 3)
+
+        bounds = [
+            re.match(r'n >= (\S+) AND n <=? (\S+)', c).groups()
+            for c in conditions
+        ]
+        self.assertEqual(len(bounds), 3)
+        self.assertEqual(bounds[0][0], '0.1')
+        self.assertEqual(bounds[-1][1], '0.7')
+        for (_, end), (start, _) in zip(bounds, bounds[1:]):
+            self.assertEqual(end, start)
+
+    def test_widens_long_ranges_read_as_doubles(self):
+        # MIN/MAX of LONG values beyond 2**53 are rounded to doubles.
+        low, high = 2 ** 60 + 1, 2 ** 60 + 2 ** 12 + 1
+
+        conditions = db.get_partition_conditions(
+            'n', float(low), float(high), 2)
+
+        first_low = int(re.match(r'n >= (\d+)', conditions[0]).group(1))
+        last_high = int(re.search(r'n <= (\d+)$', conditions[-1]).group(1))
+        self.assertLessEqual(first_low, low)
+        self.assertGreaterEqual(last_high, high)
+
     def test_connects_sync_via_function(self):
         connection = db.connect(
             host='localhost', session=MagicMock(spec=httpx.Client))
@@ -292,6 +391,37 @@ class AsyncConnectionTest(IsolatedAsyncioTestCase):
 
         self.assertIsInstance(cursor, db.AsyncCursor)
 
+    async def test_extracts_partitions_concurrently(self):
+        broker = brokers.partitioned_broker()
+        connection = db.AsyncConnection(
+            host='localhost', session=httpx.AsyncClient(transport=broker))
+
+        rows = [
+            row async for row in connection.extract(
+                'SELECT n FROM t WHERE {partition}', 'n', parts=3,
+                max_workers=2)
+        ]
+
+        self.assertEqual(rows, [[n] for n in range(10)])
+        self.assertEqual(len(broker.queries), 4)
+
+    async def test_streams_partitions_in_pages(self):
+        broker = brokers.partitioned_broker(range(12))
+        connection = db.AsyncConnection(
+            host='localhost', session=httpx.AsyncClient(transport=broker),
+            page_size=2)
+
+        rows = [
+            row async for row in connection.extract(
+                'SELECT n FROM t WHERE {partition}', 'n', parts=3)
+        ]
+
+        self.assertEqual(rows, [[n] for n in range(12)])
+        requests = [r.method for r in broker.requests]
+        self.assertEqual(requests.count('GET'), 3)
+        self.assertEqual(requests.count('DELETE'), 3)
+        self.assertEqual(len(connection.cursors), 1)
+
     def test_connects_async_via_function(self):
         connection = db.connect_async()
 
@@ -349,6 +479,83 @@ class CursorTest(TestCase):
         self.assertEqual(cursor.session.headers['baz'], 'yo')
         self.assertEqual(cursor.session.headers['Authorization'], 'Bearer foo=')
 
+    def test_instantiates_with_compression(self):
+        cursor = db.Cursor(
+            host='localhost', session=httpx.Client(), compression='gzip')
+
+        self.assertEqual(cursor.session.headers['Accept-Encoding'], 'gzip')
+
+    def test_fails_to_instantiate_with_unknown_compression(self):
+        with self.assertRaises(exceptions.NotSupportedError):
+            db.Cursor(
+                host='localhost', session=httpx.Client(), compression='lz4')
+
+    @patch('importlib.util.find_spec', return_value=None)
+    def test_fails_to_instantiate_with_unavailable_compression(self, _):
+        with self.assertRaises(exceptions.NotSupportedError):
+            db.Cursor(
+                host='localhost', session=httpx.Client(), compression='zstd')
+
+    def test_records_compressed_response_sizes(self):
+        body = json.dumps({
+            'numServersResponded': 1,
+            'numServersQueried': 1,
+            'resultTable': {
+                'dataSchema': {
+                    'columnNames': ['name'],
+                    'columnDataTypes': ['STRING'],
+                },
+                'rows': [['some name']] * 100,
+            },
+        }).encode()
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(
+                200, content=gzip.compress(body),
+                headers={'Content-Encoding': 'gzip'})
+
+        cursor = db.Cursor(
+            host='localhost',
+            session=httpx.Client(transport=httpx.MockTransport(handler)),
+            compression='gzip')
+
+        cursor.execute('some statement')
+
+        self.assertEqual(requests[0].headers['Accept-Encoding'], 'gzip')
+        self.assertEqual(cursor.fetchone(), ['some name'])
+        self.assertEqual(
+            cursor.query_stats['compressedResponseBytes'],
+            len(gzip.compress(body)))
+        self.assertEqual(
+            cursor.query_stats['decompressedResponseBytes'], len(body))
+
+    def test_warns_about_long_queries(self):
+        cursor = self.create_cursor()
+        cursor.max_query_length = 100
+
+        with self.assertLogs('pinotdb.db', level='WARNING') as logs:
+            cursor.execute(
+                'SELECT * FROM t WHERE id IN (%(ids)s)',
+                {'ids': list(range(100))})
+
+        self.assertIn('exceeds the 100 characters limit', logs.output[0])
+
+    def test_executes_prepared_statement(self):
+        cursor = self.create_cursor()
+        statement = db.PreparedStatement(
+            "SELECT * FROM t WHERE a = %(a)s AND b LIKE '%b'")
+
+        cursor.execute(statement, {'a': 'x'})
+
+        cursor.session.post.assert_called_once_with(
+            'http://localhost:8099/query/sql',
+            json={'sql': "SELECT * FROM t WHERE a = 'x' AND b LIKE '%b'"},
+            headers=ANY,
+            extensions=ANY,
+        )
+
     def test_checks_valid_exception_if_not_containing_error_code(self):
         cursor = db.Cursor(host='localhost', session=httpx.Client())
 
@@ -444,7 +651,7 @@ class CursorTest(TestCase):
         self.assertEqual(results, [])
         cursor.session.post.assert_called_once_with(
             'http://localhost:8099/query/sql', json={'sql': 'some statement'},
-            headers=ANY)
+            headers=ANY, extensions=ANY)
 
     def test_executes_query_within_session_with_query_options(self):
         cursor = self.create_cursor()
@@ -455,8 +662,8 @@ class CursorTest(TestCase):
         self.assertEqual(results, [])
         cursor.session.post.assert_called_once_with(
             'http://localhost:8099/query/sql', json={
-                'sql': 'some statement', 'queryOptions': {'foo': 'bar'}},
-            headers=ANY)
+                'sql': 'some statement', 'queryOptions': 'foo=bar'},
+            headers=ANY, extensions=ANY)
 
     def test_executes_query_preserving_types(self):
         cursor = self.create_cursor(preserve_types=True)
@@ -467,8 +674,9 @@ class CursorTest(TestCase):
         self.assertEqual(results, [])
         cursor.session.post.assert_called_once_with(
             'http://localhost:8099/query/sql',
-            json={'sql': "some statement OPTION(preserveType='true')"},
-            headers=ANY)
+            json={
+                'sql': 'some statement', 'queryOptions': 'preserveType=true'},
+            headers=ANY, extensions=ANY)
 
     def test_executes_query_using_multistage_engine(self):
         cursor = self.create_cursor(use_multistage_engine=True)
@@ -481,20 +689,33 @@ class CursorTest(TestCase):
             'http://localhost:8099/query/sql', json={
                 'sql': 'some statement',
                 'queryOptions': 'useMultistageEngine=true'},
-            headers=ANY)
+            headers=ANY, extensions=ANY)
 
     def test_executes_query_using_multistage_engine_plus_options(self):
         cursor = self.create_cursor(use_multistage_engine=True)
 
-        cursor.execute('some statement', queryOptions='something')
+        cursor.execute('some statement', queryOptions='timeoutMs=1000')
 
         results = list(iter(cursor))
         self.assertEqual(results, [])
         cursor.session.post.assert_called_once_with(
             'http://localhost:8099/query/sql', json={
                 'sql': 'some statement',
-                'queryOptions': 'something;useMultistageEngine=true'},
-            headers=ANY)
+                'queryOptions': 'useMultistageEngine=true;timeoutMs=1000'},
+            headers=ANY, extensions=ANY)
+
+    def test_executes_query_overriding_cursor_options(self):
+        cursor = self.create_cursor(use_multistage_engine=True)
+
+        cursor.execute(
+            'some statement',
+            queryOptions=db.QueryOptions(useMultistageEngine=False))
+
+        cursor.session.post.assert_called_once_with(
+            'http://localhost:8099/query/sql', json={
+                'sql': 'some statement',
+                'queryOptions': 'useMultistageEngine=false'},
+            headers=ANY, extensions=ANY)
 
     def test_sends_correlation_id_header(self):
         cursor = self.create_cursor()
@@ -541,9 +762,51 @@ class CursorTest(TestCase):
         results = list(iter(cursor))
         self.assertEqual(results, [
             [12, 'John', False, datetime.datetime(2010, 1, 1, 0, 30),
-             {'foo': 'bar'}, '"bicycles"'],
+             {'foo': 'bar'}, 'bicycles'],
         ])
 
+    def test_executes_query_with_multi_value_results(self):
+        cursor = self.create_cursor({
+            'dataSchema': {
+                'columnNames': ['ids', 'seen_at'],
+                'columnDataTypes': ['INT_ARRAY', 'TIMESTAMP_ARRAY'],
+            },
+            'rows': [
+                [[1, 2], ['2010-01-01 00:30:00.0', '2010-01-02 00:00:00.0']],
+                [[], []],
+            ],
+        })
+
+        cursor.execute('some statement')
+
+        self.assertEqual(cursor.fetchall(), [
+            [[1, 2], [
+                datetime.datetime(2010, 1, 1, 0, 30),
+                datetime.datetime(2010, 1, 2),
+            ]],
+            [[], []],
+        ])
+
+    def test_executes_query_with_big_decimals_and_maps(self):
+        cursor = self.create_cursor({
+            'dataSchema': {
+                'columnNames': ['price', 'attributes'],
+                'columnDataTypes': ['BIG_DECIMAL', 'MAP'],
+            },
+            'rows': [
+                ['12345678901234567890.12', {'color': 'red'}],
+                [None, None],
+            ],
+        })
+
+        cursor.execute('some statement')
+
+        self.assertEqual(cursor.fetchall(), [
+            [decimal.Decimal('12345678901234567890.12'), {'color': 'red'}],
+            [None, None],
+        ])
+        self.assertEqual(cursor.description[0][1], db.Type.NUMBER)
+
     def test_executes_query_with_simple_results(self):
         cursor = self.create_cursor({
             'dataSchema': {
@@ -597,6 +860,7 @@ class CursorTest(TestCase):
             'http://localhost:8099/query/sql',
             json={'sql': 'some statement'},
             headers=ANY,
+            extensions=ANY,
             auth=(b'john.doe', b'mypass'),
         )
 
@@ -650,6 +914,31 @@ class CursorTest(TestCase):
 
             self.assertGreater(len(mock_logger.info.mock_calls), 0)
 
+    def test_formats_no_rows_if_not_logged(self):
+        cursor = self.create_cursor({
+            'dataSchema': {'columnNames': ['a'], 'columnDataTypes': ['INT']},
+            'rows': [[1], [2]],
+        })
+
+        with patch.object(db.pprint, 'pformat') as pformat:
+            cursor.execute('some statement')
+
+        pformat.assert_not_called()
+
+    def test_logs_preview_of_rows(self):
+        cursor = self.create_cursor({
+            'dataSchema': {'columnNames': ['a'], 'columnDataTypes': ['INT']},
+            'rows': [[i] for i in range(100)],
+        })
+
+        with self.assertLogs('pinotdb.db', 'DEBUG') as logs:
+            cursor.execute('some statement')
+
+        [message] = [m for m in logs.output if 'Got 100 rows' in m]
+        self.assertIn('[9]', message)
+        self.assertNotIn('[10]', message)
+        self.assertIn('90 more rows', message)
+
     def test_raises_exception_if_error_in_status_code(self):
         cursor = self.create_cursor({}, status_code=400)
 
@@ -688,6 +977,24 @@ class CursorTest(TestCase):
 
         self.assertEqual(cursor.fetchall(), [[1], [2], [3]])
 
+    def test_fetches_remaining_results_after_partial_fetches(self):
+        cursor = self.create_cursor({
+            'dataSchema': {
+                'columnNames': ['age'],
+                'columnDataTypes': ['INT'],
+            },
+            'rows': [[1], [2], [3], [4]],
+        })
+
+        cursor.execute('some statement')
+
+        self.assertEqual(cursor.fetchone(), [1])
+        self.assertEqual(cursor.fetchmany(2), [[2], [3]])
+        self.assertEqual(cursor.fetchwithschema()['results'], [[4]])
+        self.assertEqual(cursor.fetchall(), [[4]])
+        self.assertIsNone(cursor.fetchone())
+        self.assertEqual(cursor.fetchmany(2), [])
+
     def test_fetches_with_schema(self):
         cursor = self.create_cursor({
             'dataSchema': {
@@ -961,6 +1268,7 @@ class AsyncCursorTest(IsolatedAsyncioTestCase):
             'http://localhost:8099/query/sql',
             json={'sql': 'some statement'},
             headers=ANY,
+            extensions=ANY,
             auth=(b'john.doe', b'mypass'),
         )
 
@@ -1002,15 +1310,824 @@ class AsyncCursorTest(IsolatedAsyncioTestCase):
 
         await cursor.execute('some statement')
 
+        response_bytes = len(cursor.session.post.return_value.content)
         self.assertEqual(cursor.query_stats, {
             'numServersResponded': 1,
             'numServersQueried': 1,
             'timeUsedMs': 5,
             'numEntriesScannedPostFilter': 18,
+            'compressedResponseBytes': response_bytes,
+            'decompressedResponseBytes': response_bytes,
         })
         self.assertEqual(cursor.timeUsedMs, 5)
 
 
+class ServerSideCursorTest(TestCase):
+    def create_cursor(self, num_rows=5, page_size=2, cursor_support=True):
+        broker = brokers.paging_broker(num_rows, page_size, cursor_support)
+        self.requests = broker.requests
+        return db.Cursor(
+            host='localhost', session=httpx.Client(transport=broker),
+            page_size=page_size)
+
+    def test_requests_a_cursor_from_the_broker(self):
+        cursor = self.create_cursor()
+
+        cursor.execute('some statement', server_side=True)
+
+        params = self.requests[0].url.params
+        self.assertEqual(params['getCursor'], 'true')
+        self.assertEqual(params['numRows'], '2')
+        self.assertEqual(cursor.fetchmany(2), [[0], [1]])
+        # Only the first page was fetched so far.
+        self.assertEqual(len(self.requests), 1)
+
+    def test_fetches_pages_on_demand(self):
+        cursor = self.create_cursor()
+        cursor.execute('some statement', server_side=True)
+
+        self.assertEqual(cursor.fetchmany(3), [[0], [1], [2]])
+        self.assertEqual(cursor.fetchone(), [3])
+        self.assertEqual(list(cursor), [[4]])
+        self.assertIsNone(cursor.fetchone())
+
+        pages = [r for r in self.requests if r.method == 'GET']
+        self.assertEqual(
+            [str(r.url) for r in pages],
+            [
+                'http://localhost:8099/responseStore/42/results'
+                '?offset=2&numRows=2',
+                'http://localhost:8099/responseStore/42/results'
+                '?offset=4&numRows=2',
+            ])
+
+    def test_deletes_stored_responses_of_all_cursors_when_closing(self):
+        broker = brokers.paging_broker(num_rows=5, page_size=2)
+        connection = db.connect(
+            host='localhost', session=httpx.Client(transport=broker),
+            page_size=2, server_side=True)
+        for cursor in [connection.cursor(), connection.cursor()]:
+            cursor.execute('some statement')
+
+        connection.close()
+
+        self.assertEqual(
+            len([r for r in broker.requests if r.method == 'DELETE']), 2)
+
+    def test_skips_deleting_stored_response_with_closed_session(self):
+        cursor = self.create_cursor()
+        cursor.execute('some statement', server_side=True)
+        cursor.session.close()
+
+        with self.assertLogs('pinotdb.db', 'WARNING'):
+            cursor.close()
+
+        self.assertNotIn('DELETE', [r.method for r in self.requests])
+
+    def test_fetches_all_remaining_pages(self):
+        cursor = self.create_cursor()
+        cursor.execute('some statement', server_side=True)
+
+        self.assertEqual(cursor.fetchone(), [0])
+        self.assertEqual(cursor.fetchall(), [[1], [2], [3], [4]])
+        self.assertEqual(cursor.fetchall(), [])
+
+    def test_deletes_stored_response_when_closing(self):
+        cursor = self.create_cursor()
+        cursor.execute('some statement', server_side=True)
+
+        cursor.close()
+
+        request = self.requests[-1]
+        self.assertEqual(request.method, 'DELETE')
+        self.assertEqual(
+            str(request.url), 'http://localhost:8099/responseStore/42')
+
+    def test_deletes_stored_response_when_executing_again(self):
+        cursor = self.create_cursor()
+        cursor.execute('some statement', server_side=True)
+
+        cursor.execute('some statement')
+
+        self.assertEqual(
+            [r.method for r in self.requests], ['POST', 'DELETE', 'POST'])
+        self.assertNotIn('getCursor', self.requests[-1].url.params)
+
+    def test_uses_server_side_cursor_by_default_if_configured(self):
+        cursor = self.create_cursor()
+        cursor.server_side = True
+
+        cursor.execute('some statement')
+
+        self.assertEqual(self.requests[0].url.params['getCursor'], 'true')
+
+    def test_reads_whole_result_if_broker_lacks_cursor_support(self):
+        cursor = self.create_cursor(cursor_support=False)
+        cursor.execute('some statement', server_side=True)
+
+        self.assertEqual(cursor.fetchall(), [[0], [1], [2], [3], [4]])
+        cursor.close()
+
+        self.assertEqual([r.method for r in self.requests], ['POST'])
+
+    def test_prefetches_following_pages(self):
+        cursor = self.create_cursor(num_rows=7)
+        cursor.prefetch_pages = 2
+        cursor.execute('some statement', server_side=True)
+
+        pending = list(cursor._pager.pending)
+        self.assertEqual(len(pending), 2)
+        for future in pending:
+            future.result()
+        pages = [r for r in self.requests if r.method == 'GET']
+        self.assertEqual(
+            [r.url.params['offset'] for r in pages], ['2', '4'])
+
+        self.assertEqual(
+            cursor.fetchall(), [[0], [1], [2], [3], [4], [5], [6]])
+
+    def test_limits_prefetched_pages_by_size(self):
+        cursor = self.create_cursor(num_rows=9)
+        cursor.prefetch_pages = 3
+        cursor.execute('some statement', server_side=True)
+        self.assertEqual(cursor._pager.prefetch_depth(), 3)
+
+        cursor.fetchmany(3)
+        cursor._pager.page_bytes = 100
+        cursor.prefetch_max_bytes = 250
+
+        self.assertEqual(cursor._pager.prefetch_depth(), 2)
+        cursor.prefetch_max_bytes = 10
+        self.assertEqual(cursor._pager.prefetch_depth(), 1)
+        self.assertEqual(
+            cursor.fetchall(), [[3], [4], [5], [6], [7], [8]])
+
+    def test_stops_prefetching_when_closing(self):
+        cursor = self.create_cursor(num_rows=7)
+        cursor.prefetch_pages = 2
+        cursor.execute('some statement', server_side=True)
+        pager = cursor._pager
+
+        cursor.close()
+
+        self.assertFalse(pager.pending)
+        self.assertEqual(self.requests[-1].method, 'DELETE')
+
+    def test_gets_server_side_cursor_from_connection(self):
+        conn = db.Connection(host='localhost', page_size=100)
+
+        cursor = conn.cursor(server_side=True)
+
+        self.assertTrue(cursor.server_side)
+        self.assertEqual(cursor.page_size, 100)
+        self.assertFalse(conn.cursor().server_side)
+
+
+class AsyncServerSideCursorTest(IsolatedAsyncioTestCase):
+    def create_cursor(self, num_rows=5, page_size=2):
+        broker = brokers.paging_broker(num_rows, page_size)
+        self.requests = broker.requests
+        return db.AsyncCursor(
+            host='localhost',
+            session=httpx.AsyncClient(transport=broker),
+            page_size=page_size, server_side=True)
+
+    async def test_iterates_over_pages(self):
+        cursor = self.create_cursor()
+        await cursor.execute('some statement')
+
+        rows = [row async for row in cursor]
+
+        self.assertEqual(rows, [[0], [1], [2], [3], [4]])
+
+    async def test_deletes_stored_responses_of_all_cursors_when_closing(
+            self):
+        broker = brokers.paging_broker(num_rows=5, page_size=2)
+        connection = db.connect_async(
+            host='localhost', session=httpx.AsyncClient(transport=broker),
+            page_size=2, server_side=True)
+        for cursor in [connection.cursor(), connection.cursor()]:
+            await cursor.execute('some statement')
+
+        await connection.close()
+
+        self.assertEqual(
+            len([r for r in broker.requests if r.method == 'DELETE']), 2)
+
+    async def test_iterates_over_prefetched_pages(self):
+        cursor = self.create_cursor(num_rows=7)
+        cursor.prefetch_pages = 2
+        await cursor.execute('some statement')
+
+        self.assertEqual(len(cursor._pager.pending), 2)
+        rows = [row async for row in cursor]
+
+        self.assertEqual(rows, [[0], [1], [2], [3], [4], [5], [6]])
+
+    async def test_cancels_prefetching_when_closing(self):
+        cursor = self.create_cursor(num_rows=7)
+        cursor.prefetch_pages = 2
+        await cursor.execute('some statement')
+        pending = list(cursor._pager.pending)
+
+        await cursor.close()
+
+        self.assertTrue(all(task.done() for task in pending))
+        self.assertEqual(self.requests[-1].method, 'DELETE')
+
+    async def test_fetches_page_explicitly(self):
+        cursor = self.create_cursor()
+        await cursor.execute('some statement')
+
+        self.assertEqual(cursor.fetchmany(2), [[0], [1]])
+        self.assertTrue(await cursor.fetch_page())
+        self.assertEqual(cursor.fetchmany(2), [[2], [3]])
+        self.assertTrue(await cursor.fetch_page())
+        self.assertEqual(cursor.fetchall(), [[4]])
+        self.assertFalse(await cursor.fetch_page())
+
+    async def test_fails_to_fetch_next_page_synchronously(self):
+        cursor = self.create_cursor()
+        await cursor.execute('some statement')
+
+        with self.assertRaises(exceptions.NotSupportedError):
+            cursor.fetchall()
+        with self.assertRaises(exceptions.NotSupportedError):
+            cursor.fetchmany(3)
+        self.assertEqual(cursor.fetchone(), [0])
+        self.assertEqual(cursor.fetchone(), [1])
+        with self.assertRaises(exceptions.NotSupportedError):
+            cursor.fetchone()
+        self.assertEqual([row async for row in cursor], [[2], [3], [4]])
+
+    async def test_deletes_stored_response_when_closing(self):
+        cursor = self.create_cursor()
+        await cursor.execute('some statement')
+
+        await cursor.close()
+
+        self.assertEqual(self.requests[-1].method, 'DELETE')
+
+
+class ParamstyleTest(TestCase):
+    def test_applies_pyformat_parameters_like_percent_formatting(self):
+        operations = [
+            'SELECT * FROM t',
+            'SELECT * FROM t WHERE a = %(a)s',
+            "SELECT * FROM t WHERE a = %(a)s AND b IN (%(b)s) LIMIT %(c)s",
+            "SELECT * FROM t WHERE a LIKE '%foo%' AND b = %(b)s",
+            "SELECT * FROM t WHERE a LIKE '100%%' AND b = %(b)s",
+            "SELECT a % 2, %(a)s, %(a)s",
+            "SELECT %(a)d, %(c)05d",
+        ]
+        parameters = {'a': 1, 'b': ["it's", 'x'], 'c': 10}
+        escaped = {
+            key: db.escape_parameter(value)
+            for key, value in parameters.items()
+        }
+
+        for operation in operations:
+            self.assertEqual(
+                db.apply_parameters(operation, parameters),
+                db.escape_operation(operation) % escaped,
+                operation)
+
+    def test_applies_qmark_parameters(self):
+        self.assertEqual(
+            db.apply_parameters(
+                "SELECT * FROM t WHERE a = ? AND b LIKE '%?' AND c IN (?)",
+                ['x', [1, 2]], 'qmark'),
+            "SELECT * FROM t WHERE a = 'x' AND b LIKE '%?' AND c IN (1, 2)")
+
+    def test_applies_numeric_parameters(self):
+        self.assertEqual(
+            db.apply_parameters(
+                'SELECT * FROM t WHERE a = :2 OR b = :1 OR c = :2',
+                ('x', 3), 'numeric'),
+            "SELECT * FROM t WHERE a = 3 OR b = 'x' OR c = 3")
+
+    def test_applies_named_parameters(self):
+        self.assertEqual(
+            db.apply_parameters(
+                "SELECT a::int, ':b' FROM t WHERE b = :b AND c = '%'",
+                {'b': True}, 'named'),
+            "SELECT a::int, ':b' FROM t WHERE b = TRUE AND c = '%'")
+
+    def test_skips_placeholders_in_quotes_and_comments(self):
+        self.assertEqual(
+            db.apply_parameters(
+                'SELECT "?", \'it\'\'s ?\' -- ?\n/* ? */ FROM t WHERE a = ?',
+                [1], 'qmark'),
+            'SELECT "?", \'it\'\'s ?\' -- ?\n/* ? */ FROM t WHERE a = 1')
+
+    def test_fails_with_missing_positional_parameters(self):
+        with self.assertRaises(exceptions.ProgrammingError):
+            db.apply_parameters('SELECT ?, ?', [1], 'qmark')
+        with self.assertRaises(exceptions.ProgrammingError):
+            db.apply_parameters('SELECT :0', [1], 'numeric')
+
+    def test_fails_with_unknown_paramstyle(self):
+        with self.assertRaises(exceptions.NotSupportedError):
+            db.apply_parameters('SELECT 1', {}, 'format')
+
+    def test_does_not_cache_long_operations(self):
+        db._parse_cached_operation.cache_clear()
+        values = ', '.join(str(i) for i in range(2000))
+        operation = f'SELECT * FROM t WHERE a IN ({values}) AND b = ?'
+
+        self.assertEqual(
+            db.apply_parameters(operation, ['x'], 'qmark'),
+            f"SELECT * FROM t WHERE a IN ({values}) AND b = 'x'")
+        self.assertEqual(db._parse_cached_operation.cache_info().currsize, 0)
+
+    def test_executes_with_connection_paramstyle(self):
+        connection = db.Connection(
+            host='localhost', session=MagicMock(spec=httpx.Client),
+            paramstyle='qmark')
+        connection.session.is_closed = False
+        response = connection.session.post.return_value
+        response.json.return_value = {
+            'numServersResponded': 1,
+            'numServersQueried': 1,
+        }
+        response.status_code = 200
+        cursor = connection.cursor()
+
+        cursor.execute('SELECT * FROM t WHERE a = ?', ['x'])
+
+        cursor.session.post.assert_called_once_with(
+            'http://localhost:8099/query/sql',
+            json={'sql': "SELECT * FROM t WHERE a = 'x'"},
+            headers=ANY,
+            extensions=ANY,
+        )
+        self.assertEqual(
+            connection.prepare('SELECT ?').bind([1]), 'SELECT 1')
+
+
+class PreparedStatementTest(TestCase):
+    def test_binds_parameters_like_apply_parameters(self):
+        operations = [
+            'SELECT * FROM t',
+            'SELECT * FROM t WHERE a = %(a)s',
+            "SELECT * FROM t WHERE a = %(a)s AND b IN (%(b)s) LIMIT %(c)s",
+            "SELECT * FROM t WHERE a LIKE '%foo%' AND b = %(b)s",
+            "SELECT * FROM t WHERE a LIKE '100%%' AND b = %(b)s",
+            "SELECT %(a)s, %(a)s",
+            "SELECT %(a)d",
+        ]
+        parameters = {'a': 1, 'b': ["it's", 'x'], 'c': 10}
+
+        for operation in operations:
+            self.assertEqual(
+                db.PreparedStatement(operation).bind(parameters),
+                db.apply_parameters(operation, parameters),
+                operation)
+
+    def test_binds_different_parameters(self):
+        statement = db.PreparedStatement(
+            "SELECT * FROM t WHERE name = %(name)s AND a LIKE '%x'")
+
+        self.assertEqual(
+            statement.bind({'name': 'foo'}),
+            "SELECT * FROM t WHERE name = 'foo' AND a LIKE '%x'")
+        self.assertEqual(
+            statement.bind({'name': True}),
+            "SELECT * FROM t WHERE name = TRUE AND a LIKE '%x'")
+
+    def test_fails_to_bind_missing_parameter(self):
+        statement = db.PreparedStatement('SELECT %(a)s')
+
+        with self.assertRaises(KeyError):
+            statement.bind({})
+
+    def test_prepares_statement_from_connection(self):
+        connection = db.Connection(host='localhost')
+
+        statement = connection.prepare('SELECT %(a)s')
+
+        self.assertIsInstance(statement, db.PreparedStatement)
+        self.assertEqual(statement.operation, 'SELECT %(a)s')
+
+
+class DeadlineTest(TestCase):
+    def create_cursor(self, timed_out=True, timeout=httpx.ReadTimeout):
+        broker = (
+            brokers.timing_out_broker(timeout) if timed_out
+            else brokers.broker())
+        self.requests = broker.requests
+        return db.Cursor(
+            host='localhost', session=httpx.Client(transport=broker))
+
+    def test_computes_server_timeout(self):
+        self.assertEqual(db.get_server_timeout_ms(5), 4500)
+        self.assertEqual(db.get_server_timeout_ms(60), 59000)
+        self.assertEqual(db.get_server_timeout_ms(0.0001), 1)
+
+    def test_sends_server_timeout_and_client_query_id(self):
+        cursor = self.create_cursor(timed_out=False)
+
+        cursor.execute('some statement', timeout=5)
+
+        request = self.requests[0]
+        self.assertEqual(json.loads(request.content), {
+            'sql': 'some statement',
+            'queryOptions': 'timeoutMs=4500;clientQueryId={}'.format(
+                request.headers['X-Correlation-Id']),
+        })
+
+    def test_reads_server_timeout_from_httpx_timeout(self):
+        cursor = self.create_cursor(timed_out=False)
+
+        cursor.execute(
+            'some statement', timeout=httpx.Timeout(1.0, read=20.0))
+
+        self.assertIn(
+            'timeoutMs=19000', json.loads(self.requests[0].content)[
+                'queryOptions'])
+
+    def test_keeps_explicit_server_timeout(self):
+        cursor = self.create_cursor(timed_out=False)
+
+        cursor.execute(
+            'some statement', queryOptions='timeoutMs=1000', timeout=5)
+
+        self.assertIn(
+            'timeoutMs=1000;', json.loads(self.requests[0].content)[
+                'queryOptions'])
+
+    def test_sends_no_options_without_timeout(self):
+        cursor = self.create_cursor(timed_out=False)
+
+        cursor.execute('some statement')
+
+        self.assertEqual(
+            json.loads(self.requests[0].content), {'sql': 'some statement'})
+
+    def test_cancels_query_when_timing_out(self):
+        cursor = self.create_cursor()
+
+        with self.assertRaises(httpx.ReadTimeout):
+            cursor.execute('some statement', timeout=5)
+
+        post, delete = self.requests
+        self.assertEqual(delete.method, 'DELETE')
+        self.assertEqual(
+            str(delete.url),
+            'http://localhost:8099/query/{}?client=true'.format(
+                post.headers['X-Correlation-Id']))
+
+    def test_does_not_cancel_query_not_sent(self):
+        for timeout in [httpx.ConnectTimeout, httpx.PoolTimeout]:
+            cursor = self.create_cursor(timeout=timeout)
+
+            with self.assertRaises(timeout):
+                cursor.execute('some statement', timeout=5)
+
+            self.assertEqual(len(self.requests), 1)
+
+    def test_does_not_cancel_query_without_timeout(self):
+        cursor = self.create_cursor()
+
+        with self.assertRaises(httpx.ReadTimeout):
+            cursor.execute('some statement')
+
+        self.assertEqual(len(self.requests), 1)
+
+
+class AsyncDeadlineTest(IsolatedAsyncioTestCase):
+    async def test_cancels_query_when_task_is_cancelled(self):
+        requests = []
+        received = asyncio.Event()
+
+        async def handler(request):
+            requests.append(request)
+            if request.method == 'DELETE':
+                return httpx.Response(200, json={})
+            received.set()
+            await asyncio.sleep(60)
+
+        cursor = db.AsyncCursor(
+            host='localhost', session=httpx.AsyncClient(
+                transport=httpx.MockTransport(handler)))
+        task = asyncio.ensure_future(
+            cursor.execute('some statement', timeout=5))
+        await received.wait()
+
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        post, delete = requests
+        self.assertEqual(
+            delete.url.path,
+            '/query/{}'.format(post.headers['X-Correlation-Id']))
+        self.assertEqual(delete.url.params['client'], 'true')
+
+
+    async def test_does_not_cancel_query_not_sent(self):
+        broker = brokers.timing_out_broker(httpx.ConnectTimeout)
+        cursor = db.AsyncCursor(
+            host='localhost', session=httpx.AsyncClient(transport=broker))
+
+        with self.assertRaises(httpx.ConnectTimeout):
+            await cursor.execute('some statement', timeout=5)
+
+        self.assertEqual(len(broker.requests), 1)
+
+
+class CancelTest(TestCase):
+    def test_sends_client_query_id_if_cancellable(self):
+        broker = brokers.broker()
+        cursor = db.Cursor(
+            host='localhost', session=httpx.Client(transport=broker),
+            cancellable=True)
+
+        cursor.execute('some statement')
+
+        request = broker.requests[0]
+        self.assertEqual(
+            json.loads(request.content)['queryOptions'],
+            'clientQueryId={}'.format(request.headers['X-Correlation-Id']))
+
+    def test_cancels_query_being_executed(self):
+        requests = []
+        received = threading.Event()
+        cancelled = threading.Event()
+
+        def handler(request):
+            requests.append(request)
+            if request.method == 'DELETE':
+                cancelled.set()
+                return httpx.Response(200, json={})
+            received.set()
+            cancelled.wait(5)
+            return httpx.Response(500, json={'exceptions': [
+                {'errorCode': 503, 'message': 'QueryCancellationError'}]})
+
+        cursor = db.Cursor(
+            host='localhost',
+            session=httpx.Client(transport=httpx.MockTransport(handler)),
+            cancellable=True)
+        with ThreadPoolExecutor(1) as executor:
+            future = executor.submit(cursor.execute, 'some statement')
+            received.wait(5)
+
+            self.assertTrue(cursor.cancel())
+            with self.assertRaises(exceptions.DatabaseError):
+                future.result()
+
+        post, delete = requests
+        self.assertEqual(
+            str(delete.url),
+            'http://localhost:8099/query/{}?client=true'.format(
+                post.headers['X-Correlation-Id']))
+
+    def test_cancels_nothing_if_not_executing(self):
+        broker = brokers.broker()
+        cursor = db.Cursor(
+            host='localhost', session=httpx.Client(transport=broker),
+            cancellable=True)
+        cursor.execute('some statement')
+
+        self.assertFalse(cursor.cancel())
+        self.assertEqual(len(broker.requests), 1)
+
+
+class AsyncCancelTest(IsolatedAsyncioTestCase):
+    def create_cursor(self):
+        self.requests = []
+        self.received = asyncio.Event()
+
+        async def handler(request):
+            self.requests.append(request)
+            if request.method == 'DELETE':
+                return httpx.Response(200, json={})
+            self.received.set()
+            await asyncio.sleep(60)
+
+        return db.AsyncCursor(
+            host='localhost', session=httpx.AsyncClient(
+                transport=httpx.MockTransport(handler)),
+            cancellable=True)
+
+    async def test_cancels_query_when_task_is_cancelled(self):
+        cursor = self.create_cursor()
+        task = asyncio.ensure_future(cursor.execute('some statement'))
+        await self.received.wait()
+
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        post, delete = self.requests
+        self.assertEqual(
+            delete.url.path,
+            '/query/{}'.format(post.headers['X-Correlation-Id']))
+
+    async def test_cancels_query_being_executed(self):
+        cursor = self.create_cursor()
+        task = asyncio.ensure_future(cursor.execute('some statement'))
+        await self.received.wait()
+
+        self.assertTrue(await cursor.cancel())
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertEqual(self.requests[1].method, 'DELETE')
+
+
+class QueryOptionsTest(TestCase):
+    def test_parses_options_string(self):
+        options = db.QueryOptions(
+            'timeoutMs=1000; useMultistageEngine=true;foo=bar;')
+
+        self.assertEqual(options['timeoutMs'], 1000)
+        self.assertIs(options['useMultistageEngine'], True)
+        self.assertEqual(options['foo'], 'bar')
+
+    def test_converts_known_options(self):
+        options = db.QueryOptions(
+            {'maxExecutionThreads': '4', 'enableNullHandling': 'FALSE'})
+
+        self.assertEqual(options['maxExecutionThreads'], 4)
+        self.assertIs(options['enableNullHandling'], False)
+
+    def test_skips_unset_options(self):
+        options = db.QueryOptions(timeoutMs=None, numGroupsLimit=10)
+
+        self.assertNotIn('timeoutMs', options)
+        self.assertEqual(str(options), 'numGroupsLimit=10')
+
+    def test_fails_with_invalid_option_value(self):
+        for options in [
+            {'timeoutMs': 'soon'},
+            {'timeoutMs': True},
+            {'useMultistageEngine': 'yes'},
+        ]:
+            with self.assertRaises(exceptions.ProgrammingError):
+                db.QueryOptions(options)
+
+    def test_fails_with_invalid_options_string(self):
+        with self.assertRaises(exceptions.ProgrammingError):
+            db.QueryOptions('timeoutMs')
+
+    def test_serializes_options(self):
+        options = db.QueryOptions(
+            timeoutMs=1000, useMultistageEngine=True, foo='bar')
+
+        self.assertEqual(
+            str(options), 'timeoutMs=1000;useMultistageEngine=true;foo=bar')
+
+    def test_merges_options_with_later_ones_taking_precedence(self):
+        options = db.QueryOptions(timeoutMs=1000, numGroupsLimit=10)
+
+        merged = options.merge(
+            {'timeoutMs': 2000}, 'maxExecutionThreads=2', None)
+
+        self.assertEqual(
+            str(merged),
+            'timeoutMs=2000;numGroupsLimit=10;maxExecutionThreads=2')
+        self.assertEqual(str(options), 'timeoutMs=1000;numGroupsLimit=10')
+
+    def test_merges_nothing_into_same_options(self):
+        options = db.QueryOptions(timeoutMs=1000)
+
+        self.assertIs(options.merge(None, '', {}), options)
+
+    def test_merges_cursor_options_into_connection_ones(self):
+        connection = db.Connection(
+            host='localhost', session=MagicMock(spec=httpx.Client),
+            query_options='timeoutMs=1000', use_multistage_engine=True)
+        connection.session.is_closed = False
+
+        cursor = connection.cursor(query_options={'numGroupsLimit': 10})
+
+        self.assertEqual(
+            str(cursor.query_options),
+            'useMultistageEngine=true;timeoutMs=1000;numGroupsLimit=10')
+        self.assertEqual(
+            str(connection.cursor().query_options),
+            'useMultistageEngine=true;timeoutMs=1000')
+
+
+class ColumnTypesTest(TestCase):
+    def test_maps_every_pinot_data_type(self):
+        types = db.get_types_from_column_data_types(db.PINOT_DATA_TYPES)
+
+        self.assertEqual(
+            dict(zip(db.PINOT_DATA_TYPES, types)),
+            {
+                'INT': (db.Type.NUMBER, False, False),
+                'LONG': (db.Type.NUMBER, False, False),
+                'FLOAT': (db.Type.NUMBER, False, False),
+                'DOUBLE': (db.Type.NUMBER, False, False),
+                'BIG_DECIMAL': (db.Type.NUMBER, False, True),
+                'BOOLEAN': (db.Type.BOOLEAN, False, False),
+                'TIMESTAMP': (db.Type.TIMESTAMP, False, True),
+                'STRING': (db.Type.STRING, False, False),
+                'JSON': (db.Type.JSON, False, True),
+                'BYTES': (db.Type.STRING, False, False),
+                'OBJECT': (db.Type.STRING, False, False),
+                'MAP': (db.Type.JSON, False, False),
+                'UNKNOWN': (db.Type.STRING, False, False),
+                'INT_ARRAY': (db.Type.NUMBER, True, False),
+                'LONG_ARRAY': (db.Type.NUMBER, True, False),
+                'FLOAT_ARRAY': (db.Type.NUMBER, True, False),
+                'DOUBLE_ARRAY': (db.Type.NUMBER, True, False),
+                'BOOLEAN_ARRAY': (db.Type.BOOLEAN, True, False),
+                'TIMESTAMP_ARRAY': (db.Type.TIMESTAMP, True, True),
+                'STRING_ARRAY': (db.Type.STRING, True, False),
+                'BYTES_ARRAY': (db.Type.STRING, True, False),
+            })
+
+    def test_shares_types_of_columns(self):
+        first = db.get_types_from_column_data_types(['INT', 'STRING'])
+        second = db.get_types_from_column_data_types(['STRING', 'INT'])
+
+        self.assertIs(first[0], second[1])
+        self.assertIs(first[1], db.COLUMN_TYPES['STRING'])
+
+    def test_remembers_types_of_schema(self):
+        schema = ['LONG', 'TIMESTAMP', 'JSON']
+
+        self.assertIs(
+            db.get_types_from_column_data_types(schema),
+            db.get_types_from_column_data_types(list(schema)))
+
+    def test_parses_unknown_data_types(self):
+        [data_type] = db.get_types_from_column_data_types(['VECTOR_ARRAY'])
+
+        self.assertEqual(data_type, (db.Type.STRING, True, False))
+
+
+class RowConverterTest(TestCase):
+    def test_converts_columns_needing_it(self):
+        types = db.get_types_from_column_data_types(
+            ['INT', 'TIMESTAMP', 'STRING', 'JSON'])
+
+        row_converter = db.get_row_converter(types)
+
+        self.assertEqual([i for i, _, _ in row_converter], [1, 3])
+        self.assertEqual(
+            db.convert_rows(row_converter, [
+                [1, '2024-01-02 03:04:05.0', 'a', '{"b": 1}'],
+                [2, None, None, ''],
+            ]),
+            [
+                [1, datetime.datetime(2024, 1, 2, 3, 4, 5), 'a', {'b': 1}],
+                [2, None, None, None],
+            ])
+
+    def test_converts_values_of_multi_value_columns(self):
+        types = db.get_types_from_column_data_types(['TIMESTAMP_ARRAY'])
+
+        rows = db.convert_rows(db.get_row_converter(types), [
+            [['2024-01-02 03:04:05.0', None]],
+        ])
+
+        self.assertEqual(
+            rows, [[[datetime.datetime(2024, 1, 2, 3, 4, 5), None]]])
+
+    def test_compiles_row_converter_once_per_schema(self):
+        first = db.get_row_converter(
+            db.get_types_from_column_data_types(['LONG', 'JSON']))
+        second = db.get_row_converter(
+            db.get_types_from_column_data_types(['LONG', 'JSON']))
+
+        self.assertIs(first, second)
+
+    def test_converts_nothing_without_columns_needing_it(self):
+        types = db.get_types_from_column_data_types(['INT', 'STRING_ARRAY'])
+
+        self.assertEqual(db.get_row_converter(types), ())
+
+
+class PreviewTest(TestCase):
+    def test_caps_rows(self):
+        preview = db.Preview([[i] for i in range(5)], max_rows=2)
+
+        self.assertEqual(str(preview), "[[0], [1], '... 3 more rows']")
+
+    def test_caps_rows_of_payload(self):
+        payload = {
+            'resultTable': {'rows': [[i] for i in range(5)]},
+            'timeUsedMs': 3,
+        }
+
+        preview = str(db.Preview(payload, max_rows=1))
+
+        self.assertIn("[[0], '... 4 more rows']", preview)
+        self.assertIn("'timeUsedMs': 3", preview)
+        self.assertEqual(len(payload['resultTable']['rows']), 5)
+
+    def test_caps_characters(self):
+        preview = str(db.Preview('x' * 100, max_chars=10))
+
+        self.assertEqual(preview, "'xxxxxxxxx... (102 characters)")
+
+
 class EscapeTest(TestCase):
     def test_escapes_asterisk(self):
         self.assertEqual(db.escape_parameter('*'), '*')
@@ -1031,6 +2148,32 @@ class EscapeTest(TestCase):
     def test_escapes_list(self):
         self.assertEqual(db.escape_parameter([1, 'two']), "1, 'two'")
 
+    def test_escapes_list_of_numbers(self):
+        self.assertEqual(db.escape_parameter([1, 2.5, -3]), '1, 2.5, -3')
+
+    def test_escapes_tuple_of_strings(self):
+        self.assertEqual(
+            db.escape_parameter(('a', "it's")), "'a', 'it''s'")
+
+    def test_escapes_list_of_strings_with_asterisk(self):
+        self.assertEqual(db.escape_parameter(['a', '*']), "'a', *")
+
+    def test_escapes_list_of_mixed_types(self):
+        self.assertEqual(
+            db.escape_parameter([1, 'a', True, None]), "1, 'a', TRUE, None")
+
+    def test_escapes_empty_list(self):
+        self.assertEqual(db.escape_parameter([]), '')
+
+    def test_escapes_numpy_like_arrays(self):
+        class Array:
+            dtype = 'int64'
+
+            def tolist(self):
+                return [1, 2, 3]
+
+        self.assertEqual(db.escape_parameter(Array()), '1, 2, 3')
+
     def test_bypasses_escaping_unknown_types(self):
         self.assertEqual(db.escape_parameter({1, 2}), {1, 2})
 
@@ -0,0 +1,63 @@
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, mock
+
+from pinotdb.lazy import LazyModule
+
+# Modules only imported once pinotdb is used.
+LAZY_MODULES = [
+    'asyncio', 'ciso8601', 'decimal', 'httpx', 'json', 'opentelemetry.trace',
+    'pprint', 'uuid',
+]
+
+
+class LazyModuleTest(TestCase):
+    def test_imports_module_on_first_use(self):
+        sys.modules.pop('colorsys', None)
+        module = LazyModule('colorsys')
+
+        self.assertNotIn('colorsys', sys.modules)
+        self.assertIs(
+            module.rgb_to_hsv, sys.modules['colorsys'].rgb_to_hsv)
+
+    def test_imports_module_once_from_concurrent_threads(self):
+        sys.modules.pop('colorsys', None)
+        module = LazyModule('colorsys')
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda _: module.rgb_to_hsv(0.2, 0.4, 0.4), range(32)))
+
+        self.assertEqual(len(set(results)), 1)
+
+    def test_sees_attributes_patched_on_module(self):
+        module = LazyModule('colorsys')
+        module.rgb_to_hsv
+
+        with mock.patch('colorsys.rgb_to_hsv') as rgb_to_hsv:
+            self.assertIs(module.rgb_to_hsv, rgb_to_hsv)
+        self.assertIs(
+            module.rgb_to_hsv, sys.modules['colorsys'].rgb_to_hsv)
+
+    def test_fails_on_missing_attribute(self):
+        with self.assertRaises(AttributeError):
+            LazyModule('colorsys').missing
+
+    def test_fails_on_missing_module(self):
+        with self.assertRaises(ImportError):
+            LazyModule('pinotdb_missing').attribute
+
+
+class ImportTest(TestCase):
+    def test_imports_no_lazy_modules(self):
+        imported = subprocess.run(
+            [
+                sys.executable, '-c',
+                'import sys, pinotdb.db; '
+                f'print(*[m for m in {LAZY_MODULES!r} if m in sys.modules])',
+            ],
+            check=True, capture_output=True, text=True,
+        ).stdout.split()
+
+        self.assertEqual(imported, [])
@@ -0,0 +1,148 @@
+import httpx
+from unittest import TestCase
+
+try:
+    from unittest import IsolatedAsyncioTestCase
+except ImportError:
+    from mock.backports import IsolatedAsyncioTestCase
+
+from pinotdb import db, exceptions, metrics
+from tests.unit import brokers
+
+LABELS = ('localhost:8099', 'airlineStats')
+
+
+class RegistryTest(TestCase):
+    def test_renders_counters_and_gauges(self):
+        registry = metrics.Registry()
+        counter = registry.counter('c_total', 'A counter.', ('a',))
+        gauge = registry.gauge('g', 'A gauge.')
+        counter.inc(('x"y',), 2)
+        gauge.set(value=3)
+        gauge.dec()
+
+        self.assertEqual(registry.render(), (
+            '# HELP c_total A counter.\n'
+            '# TYPE c_total counter\n'
+            'c_total{a="x\\"y"} 2\n'
+            '# HELP g A gauge.\n'
+            '# TYPE g gauge\n'
+            'g 2\n'
+        ))
+
+    def test_renders_histograms(self):
+        registry = metrics.Registry()
+        histogram = registry.histogram(
+            'h', 'A histogram.', ('a',), buckets=(1, 10))
+        for value in [0.5, 1, 5, 50]:
+            histogram.observe(('x',), value)
+
+        self.assertEqual(registry.render(), (
+            '# HELP h A histogram.\n'
+            '# TYPE h histogram\n'
+            'h_bucket{a="x",le="1"} 2\n'
+            'h_bucket{a="x",le="10"} 3\n'
+            'h_bucket{a="x",le="+Inf"} 4\n'
+            'h_sum{a="x"} 56.5\n'
+            'h_count{a="x"} 4\n'
+        ))
+
+    def test_fails_to_register_metric_twice(self):
+        registry = metrics.Registry()
+        registry.gauge('g', 'A gauge.')
+
+        with self.assertRaises(exceptions.ProgrammingError):
+            registry.gauge('g', 'Another gauge.')
+
+
+class ClientMetricsTest(TestCase):
+    def setUp(self):
+        self.client_metrics = metrics.enable()
+        self.addCleanup(metrics.disable)
+
+    def create_cursor(self, status_code=200, **result_args):
+        broker = brokers.broker(status_code, **result_args)
+        return db.Cursor(
+            host='localhost', session=httpx.Client(transport=broker))
+
+    def test_records_query_metrics(self):
+        cursor = self.create_cursor(rows=[[0], [1], [2]], timeUsedMs=250)
+
+        cursor.execute('SELECT n FROM airlineStats LIMIT 3')
+
+        m = self.client_metrics
+        self.assertEqual(m.query_duration.get_count(LABELS), 1)
+        self.assertEqual(m.broker_duration.get_sum(LABELS), 0.25)
+        self.assertEqual(m.rows.get_sum(LABELS), 3)
+        self.assertEqual(m.decode_duration.get_count(LABELS), 1)
+        self.assertEqual(
+            m.response_bytes.get_sum(LABELS),
+            cursor.query_stats['compressedResponseBytes'])
+        self.assertEqual(m.in_flight.get(('localhost:8099',)), 0)
+        self.assertIn(
+            'pinotdb_query_duration_seconds_count{broker="localhost:8099",'
+            'table="airlineStats"} 1',
+            m.registry.render())
+
+    def test_counts_errors_by_error_code(self):
+        cursor = self.create_cursor(exceptions=[
+            {'errorCode': 250, 'message': 'ExecutionTimeoutError'},
+            {'errorCode': 427, 'message': 'ServerNotRespondingError'},
+        ])
+
+        with self.assertRaises(exceptions.DatabaseError):
+            cursor.execute('SELECT n FROM airlineStats')
+
+        errors = self.client_metrics.errors
+        self.assertEqual(errors.get(LABELS + ('250',)), 1)
+        self.assertEqual(errors.get(LABELS + ('427',)), 1)
+
+    def test_counts_errors_by_status_code(self):
+        cursor = self.create_cursor(503)
+
+        with self.assertRaises(exceptions.ProgrammingError):
+            cursor.execute('SELECT n FROM airlineStats')
+
+        self.assertEqual(
+            self.client_metrics.errors.get(LABELS + ('http_503',)), 1)
+
+    def test_counts_client_errors(self):
+        def fail(request):
+            raise httpx.ConnectError('refused', request=request)
+
+        cursor = db.Cursor(
+            host='localhost',
+            session=httpx.Client(transport=httpx.MockTransport(fail)))
+
+        with self.assertRaises(httpx.ConnectError):
+            cursor.execute('SELECT n FROM airlineStats')
+
+        self.assertEqual(
+            self.client_metrics.errors.get(LABELS + ('ConnectError',)), 1)
+        self.assertEqual(
+            self.client_metrics.in_flight.get(('localhost:8099',)), 0)
+
+    def test_records_nothing_when_disabled(self):
+        metrics.disable()
+        cursor = self.create_cursor()
+
+        cursor.execute('SELECT n FROM airlineStats')
+
+        self.assertIsNone(metrics.get_client_metrics())
+        self.assertEqual(
+            self.client_metrics.query_duration.get_count(LABELS), 0)
+
+
+class AsyncClientMetricsTest(IsolatedAsyncioTestCase):
+    async def test_records_query_metrics(self):
+        client_metrics = metrics.enable()
+        self.addCleanup(metrics.disable)
+        cursor = db.AsyncCursor(
+            host='localhost',
+            session=httpx.AsyncClient(
+                transport=brokers.broker(rows=[[0], [1], [2]])))
+
+        await cursor.execute('SELECT n FROM airlineStats')
+
+        self.assertEqual(client_metrics.query_duration.get_count(LABELS), 1)
+        self.assertEqual(client_metrics.rows.get_sum(LABELS), 3)
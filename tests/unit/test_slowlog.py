@@ -0,0 +1,148 @@
+import httpx
+from unittest import TestCase
+from unittest.mock import patch
+
+try:
+    from unittest import IsolatedAsyncioTestCase
+except ImportError:
+    from mock.backports import IsolatedAsyncioTestCase
+
+from pinotdb import db, exceptions, slowlog
+from tests.unit import brokers
+
+STATS = {'numEntriesScannedInFilter': 1000, 'numSegmentsProcessed': 12}
+
+
+class SlowQueryLogTest(TestCase):
+    def create_connection(self, log, time_used_ms=10):
+        return db.connect(
+            host='localhost', slow_query_log=log,
+            session=httpx.Client(transport=brokers.broker(
+                timeUsedMs=time_used_ms, **STATS)))
+
+    def test_records_queries_slow_on_client(self):
+        log = slowlog.SlowQueryLog(threshold=0)
+        cursor = self.create_connection(log).cursor()
+
+        with self.assertLogs('pinotdb.slowlog', 'WARNING'):
+            cursor.execute(
+                'SELECT n FROM t', queryOptions='maxExecutionThreads=2')
+
+        [entry] = log.entries()
+        self.assertEqual(entry.sql, 'SELECT n FROM t')
+        self.assertEqual(entry.query_options, 'maxExecutionThreads=2')
+        self.assertEqual(entry.duration, cursor.timings.total)
+        self.assertEqual(entry.time_used_ms, 10)
+        self.assertEqual(entry.query_stats['numEntriesScannedInFilter'], 1000)
+        self.assertEqual(entry.query_stats['numSegmentsProcessed'], 12)
+        self.assertEqual(len(entry.correlation_id), 36)
+
+    def test_records_queries_slow_on_broker(self):
+        log = slowlog.SlowQueryLog(threshold=None, broker_threshold=0.5)
+        conn = self.create_connection(log, time_used_ms=500)
+
+        with self.assertLogs('pinotdb.slowlog', 'WARNING'):
+            conn.execute('SELECT n FROM t')
+
+        self.assertEqual(len(log), 1)
+
+    def test_ignores_fast_queries(self):
+        log = slowlog.SlowQueryLog(threshold=60, broker_threshold=0.5)
+        conn = self.create_connection(log, time_used_ms=499)
+
+        conn.execute('SELECT n FROM t')
+
+        self.assertEqual(log.entries(), [])
+
+    @patch('pinotdb.slowlog.random.random')
+    def test_samples_slow_queries(self, random):
+        random.side_effect = [0.3, 0.1]
+        log = slowlog.SlowQueryLog(threshold=0, sample_rate=0.2)
+        conn = self.create_connection(log)
+
+        with self.assertLogs('pinotdb.slowlog', 'WARNING'):
+            conn.execute('SELECT n FROM t')
+            conn.execute('SELECT n FROM t')
+
+        self.assertEqual(len(log), 1)
+
+    def test_keeps_last_queries(self):
+        log = slowlog.SlowQueryLog(threshold=0, size=2)
+        cursor = self.create_connection(log).cursor()
+
+        with self.assertLogs('pinotdb.slowlog', 'WARNING'):
+            for n in range(3):
+                cursor.execute(f'SELECT {n} FROM t')
+
+        self.assertEqual(
+            [entry.sql for entry in log.entries()],
+            ['SELECT 1 FROM t', 'SELECT 2 FROM t'])
+        log.clear()
+        self.assertEqual(len(log), 0)
+
+    def test_records_slow_queries_failing(self):
+        log = slowlog.SlowQueryLog(threshold=0)
+        cursor = db.connect(
+            host='localhost', slow_query_log=log,
+            session=httpx.Client(transport=brokers.timing_out_broker()),
+        ).cursor()
+
+        with self.assertLogs('pinotdb.slowlog', 'WARNING'):
+            with self.assertRaises(httpx.ReadTimeout):
+                cursor.execute('SELECT n FROM t')
+
+        [entry] = log.entries()
+        self.assertEqual(entry.sql, 'SELECT n FROM t')
+        self.assertIsInstance(entry.error, httpx.ReadTimeout)
+        self.assertEqual(entry.time_used_ms, -1)
+        self.assertEqual(entry.duration, cursor.timings.total)
+
+    def test_ignores_fast_queries_failing(self):
+        log = slowlog.SlowQueryLog(threshold=60)
+        cursor = db.connect(
+            host='localhost', slow_query_log=log,
+            session=httpx.Client(transport=brokers.timing_out_broker()),
+        ).cursor()
+
+        with self.assertRaises(httpx.ReadTimeout):
+            cursor.execute('SELECT n FROM t')
+
+        self.assertEqual(len(log), 0)
+
+    def test_needs_a_threshold(self):
+        with self.assertRaises(exceptions.ProgrammingError):
+            slowlog.SlowQueryLog(threshold=None)
+
+    def test_fails_on_invalid_sample_rate(self):
+        with self.assertRaises(exceptions.ProgrammingError):
+            slowlog.SlowQueryLog(sample_rate=2)
+
+
+class AsyncSlowQueryLogTest(IsolatedAsyncioTestCase):
+    async def test_records_slow_queries(self):
+        log = slowlog.SlowQueryLog(threshold=0)
+        conn = db.connect_async(
+            host='localhost', slow_query_log=log,
+            session=httpx.AsyncClient(
+                transport=brokers.broker(timeUsedMs=10, **STATS)))
+
+        with self.assertLogs('pinotdb.slowlog', 'WARNING'):
+            await conn.cursor().execute('SELECT n FROM t')
+
+        [entry] = log.entries()
+        self.assertEqual(entry.query_stats['numSegmentsProcessed'], 12)
+        self.assertIsNone(entry.error)
+
+    async def test_records_slow_queries_failing(self):
+        log = slowlog.SlowQueryLog(threshold=0)
+        conn = db.connect_async(
+            host='localhost', slow_query_log=log,
+            session=httpx.AsyncClient(
+                transport=brokers.timing_out_broker()))
+
+        with self.assertLogs('pinotdb.slowlog', 'WARNING'):
+            with self.assertRaises(httpx.ReadTimeout):
+                await conn.cursor().execute('SELECT n FROM t')
+
+        [entry] = log.entries()
+        self.assertIsInstance(entry.error, httpx.ReadTimeout)
@@ -16,35 +16,78 @@ from unittest import TestCase
 from unittest.mock import patch
 import json
 
-import responses
+import httpx
 from sqlalchemy import (
     BigInteger, Column, Integer, MetaData, String, Table,
-    column, func, select, text, types,
+    column, create_engine, func, select, text, types,
 )
 from sqlalchemy.dialects import registry
-from sqlalchemy.engine import make_url
+from sqlalchemy.engine import default, make_url
+from sqlalchemy.engine.reflection import ObjectKind, ObjectScope
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util.concurrency import greenlet_spawn
 
 import pinotdb
-from pinotdb import exceptions, sqlalchemy as ps
+from pinotdb import exceptions, metrics, sqlalchemy as ps
+from tests.unit import brokers
+
+
+class _FakeController:
+    """Serves canned controller responses through an httpx mock transport."""
+
+    def __init__(self):
+        self.routes = {}
+        self.calls = []
+
+    def get(self, url, json=None, body='', status=200):
+        self.routes.setdefault(url, []).append((status, json, body))
+
+    def handle(self, request):
+        self.calls.append(request)
+        url = str(request.url)
+        if url not in self.routes:
+            return httpx.Response(404, json={'code': 404, 'error': url})
+        replies = self.routes[url]
+        status, json, body = replies.pop(0) if len(replies) > 1 else replies[0]
+        if json is not None:
+            return httpx.Response(status, json=json)
+        return httpx.Response(status, text=body)
+
+    def transport(self):
+        return httpx.MockTransport(self.handle)
 
 
 class PinotTestCase(TestCase):
     def setUp(self) -> None:
+        self.controller = _FakeController()
+        patcher = patch.object(
+            ps.PinotDialect, '_create_controller_transport',
+            lambda dialect: self.controller.transport())
+        patcher.start()
+        self.addCleanup(patcher.stop)
         self.dialect = ps.PinotDialect(server='http://localhost:9000')
 
 
 class _FakeAsyncPinotCursor:
-    def __init__(self):
+    def __init__(self, server_side=False):
         self.description = [("col1", None, None, None, None, None, None)]
         self.rowcount = 1
         self.arraysize = 1
         self.closed = False
+        self.server_side = server_side
         self._rows = collections.deque([[1]])
+        # further pages, as read from the broker's response store
+        self._pages = collections.deque()
 
     async def execute(self, operation, parameters=None):
         return self
 
+    async def fetch_page(self):
+        if not self._pages:
+            return False
+        self._rows = collections.deque(self._pages.popleft())
+        return True
+
     def fetchone(self):
         if self._rows:
             return self._rows.popleft()
@@ -59,6 +102,11 @@ class _FakeAsyncPinotCursor:
         self._rows.clear()
         return rows
 
+    def _fetch_buffered(self, size=None):
+        if size is None:
+            return self.fetchall()
+        return self.fetchmany(size)
+
     async def close(self):
         self.closed = True
 
@@ -71,8 +119,8 @@ class _FakeAsyncPinotConnection:
         self.closed = False
         self._cursors = []
 
-    def cursor(self):
-        cursor = _FakeAsyncPinotCursor()
+    def cursor(self, server_side=None):
+        cursor = _FakeAsyncPinotCursor(server_side)
         self._cursors.append(cursor)
         return cursor
 
@@ -121,6 +169,192 @@ class PinotAsyncDialectTest(PinotTestCase):
         self.assertEqual(kwargs["path"], "query/sql")
         self.assertEqual(kwargs["scheme"], "http")
 
+    @patch("pinotdb.sqlalchemy.pinotdb.connect_async")
+    def test_streams_results_with_async_engine(self, connect_async):
+        registry.register("pinot.async", "pinotdb.sqlalchemy", "PinotAsyncDialect")
+        connect_async.side_effect = lambda *args, **kwargs: (
+            _FakeAsyncPinotConnection())
+
+        engine = create_async_engine(
+            "pinot+async://localhost:8000/query/sql"
+            "?controller=http://localhost:9000/"
+        )
+
+        async def _stream_query():
+            async with engine.connect() as connection:
+                result = await connection.stream(text("SELECT 1"))
+                rows = [tuple(row) async for row in result]
+            await engine.dispose()
+            return rows
+
+        self.assertEqual(asyncio.run(_stream_query()), [(1,)])
+
+
+class PinotAsyncAdaptCursorTest(TestCase):
+    def run_in_greenlet(self, fn, *args, **kwargs):
+        async def run():
+            return await greenlet_spawn(fn, *args, **kwargs)
+
+        return asyncio.run(run())
+
+    def create_cursor(self, server_side=False, rows=()):
+        adapt_connection = ps.PinotAsyncAdaptConnection(
+            ps._PINOT_ASYNC_DBAPI, _FakeAsyncPinotConnection())
+        cursor = adapt_connection.cursor(server_side=server_side)
+        cursor._cursor._rows = collections.deque(rows)
+        return cursor
+
+    def test_creates_buffered_cursor_by_default(self):
+        cursor = self.create_cursor()
+
+        self.assertIsInstance(cursor, ps.PinotAsyncAdaptCursor)
+        self.assertFalse(cursor.server_side)
+
+    def test_fetches_rows_after_soft_close(self):
+        cursor = self.create_cursor(rows=[[1], [2], [3], [4]])
+
+        self.run_in_greenlet(cursor.execute, 'SELECT 1')
+        asyncio.run(cursor._async_soft_close())
+
+        self.assertEqual(cursor.fetchone(), [1])
+        self.assertEqual(cursor.fetchmany(2), [[2], [3]])
+        self.assertEqual(cursor.fetchall(), [[4]])
+        self.assertIsNone(cursor.fetchone())
+        self.assertEqual(cursor.fetchmany(), [])
+
+    def test_creates_server_side_cursor(self):
+        cursor = self.create_cursor(server_side=True)
+
+        self.assertIsInstance(cursor, ps.PinotAsyncAdaptSSCursor)
+        self.assertTrue(cursor.server_side)
+
+    def test_streams_rows_from_underlying_cursor(self):
+        cursor = self.create_cursor(
+            server_side=True, rows=[[1], [2], [3], [4]])
+
+        self.run_in_greenlet(cursor.execute, 'SELECT 1')
+
+        self.assertEqual(cursor.fetchone(), [1])
+        # Nothing is buffered by the adapted cursor itself.
+        self.assertEqual(list(cursor._cursor._rows), [[2], [3], [4]])
+        self.assertEqual(cursor.fetchmany(2), [[2], [3]])
+        self.assertEqual(self.run_in_greenlet(list, cursor), [[4]])
+
+    def test_pages_through_underlying_cursor(self):
+        cursor = self.create_cursor(server_side=True, rows=[[1], [2]])
+        cursor._cursor._pages.extend([[[3], [4]], [[5]]])
+
+        def fetch():
+            cursor.execute('SELECT 1')
+            return cursor.fetchmany(3), cursor.fetchone(), cursor.fetchall()
+
+        self.assertTrue(cursor._cursor.server_side)
+        self.assertEqual(
+            self.run_in_greenlet(fetch), ([[1], [2], [3]], [4], [[5]]))
+
+    def test_pages_through_async_cursor(self):
+        broker = brokers.paging_broker(num_rows=7, page_size=2)
+        connection = pinotdb.connect_async(
+            host='localhost', session=httpx.AsyncClient(transport=broker))
+        cursor = ps.PinotAsyncAdaptConnection(
+            ps._PINOT_ASYNC_DBAPI, connection).cursor(server_side=True)
+
+        def fetch():
+            cursor.execute('SELECT n FROM t')
+            return (
+                cursor.fetchone(), cursor.fetchone(), cursor.fetchone(),
+                cursor.fetchmany(3), cursor.fetchall(),
+            )
+
+        self.assertEqual(
+            self.run_in_greenlet(fetch),
+            ([0], [1], [2], [[3], [4], [5]], [[6]]))
+
+
+class PinotAsyncControllerTest(TestCase):
+    def setUp(self) -> None:
+        self.requests = []
+        patcher = patch.object(
+            ps.PinotAsyncDialect, '_create_controller_transport',
+            lambda dialect: httpx.MockTransport(self.handle))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dialect = ps.PinotAsyncDialect(server='http://localhost:9000')
+        self.dialect.controller_retry_backoff = 0
+
+    async def handle(self, request):
+        self.requests.append(request)
+        # Give other coroutines a chance to run while "waiting" on the
+        # controller.
+        await asyncio.sleep(0.01)
+        if request.url.path == '/tables':
+            return httpx.Response(200, json={'tables': ['foo', 'bar']})
+        if request.url.path == '/flaky' and len(self.requests) == 1:
+            return httpx.Response(502)
+        return httpx.Response(200, json={'dimensionFieldSpecs': [
+            {'name': 'a', 'dataType': 'STRING'}]})
+
+    def run_in_greenlet(self, fn, *args, **kwargs):
+        async def run():
+            return await greenlet_spawn(fn, *args, **kwargs)
+
+        return asyncio.run(run())
+
+    def test_uses_async_controller_session(self):
+        session = self.run_in_greenlet(self.dialect.get_controller_session)
+
+        self.assertIsInstance(session, httpx.AsyncClient)
+
+    def test_gets_metadata_from_controller(self):
+        metadata = self.run_in_greenlet(
+            self.dialect.get_metadata_from_controller, 'tables')
+
+        self.assertEqual(metadata, {'tables': ['foo', 'bar']})
+
+    def test_retries_metadata_requests_on_transient_status(self):
+        metadata = self.run_in_greenlet(
+            self.dialect.get_metadata_from_controller, 'flaky')
+
+        self.assertIn('dimensionFieldSpecs', metadata)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_counts_retried_metadata_requests(self):
+        client_metrics = metrics.enable()
+        self.addCleanup(metrics.disable)
+
+        self.run_in_greenlet(
+            self.dialect.get_metadata_from_controller, 'flaky')
+
+        self.assertEqual(client_metrics.retries.get(('controller',)), 1)
+
+    def test_gets_multi_columns(self):
+        columns = self.run_in_greenlet(
+            self.dialect.get_multi_columns, 'conn')
+
+        self.assertEqual(
+            [key for key, _ in columns], [(None, 'foo'), (None, 'bar')])
+
+    def test_does_not_block_event_loop_while_reflecting(self):
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0.001)
+
+        async def run():
+            ticker = asyncio.ensure_future(tick())
+            try:
+                return await greenlet_spawn(
+                    self.dialect.get_columns, 'conn', 'foo')
+            finally:
+                ticker.cancel()
+
+        columns = asyncio.run(run())
+
+        self.assertEqual([c['name'] for c in columns], ['a'])
+        self.assertGreater(len(ticks), 1)
+
 
 class PinotDialectTest(PinotTestCase):
     def test_gets_pinot_db_module_as_dbapi(self):
@@ -202,19 +436,17 @@ class PinotDialectTest(PinotTestCase):
     def test_gets_secure_broker_port_from_https_dialect(self):
         self.assertEqual(ps.PinotHTTPSDialect().get_default_broker_port(), 443)
 
-    @responses.activate
     def test_gets_metadata_from_controller(self):
         url = f'{self.dialect._controller}/some-path'
-        responses.get(url, json={'foo': 'bar'})
+        self.controller.get(url, json={'foo': 'bar'})
 
         metadata = self.dialect.get_metadata_from_controller('some-path')
 
         self.assertEqual(metadata, {'foo': 'bar'})
 
-    @responses.activate
     def test_cannot_get_metadata_if_broken_json(self):
         url = f'{self.dialect._controller}/some-path'
-        responses.get(url, body='something')
+        self.controller.get(url, body='something')
 
         with self.assertRaises(exceptions.DatabaseError):
             self.dialect.get_metadata_from_controller('some-path')
@@ -226,19 +458,17 @@ class PinotDialectTest(PinotTestCase):
         names = self.dialect.get_schema_names('some connection')
         self.assertEqual(names, ['foo'])
 
-    @responses.activate
     def test_gets_table_names_from_controller(self):
         url = f'{self.dialect._controller}/tables'
-        responses.get(url, json={'tables': ['foo', 'bar']})
+        self.controller.get(url, json={'tables': ['foo', 'bar']})
 
         names = self.dialect.get_table_names('some connection')
 
         self.assertEqual(names, ['foo', 'bar'])
 
-    @responses.activate
     def test_checks_that_table_exists(self):
         url = f'{self.dialect._controller}/tables'
-        responses.get(url, json={'tables': ['foo', 'bar']})
+        self.controller.get(url, json={'tables': ['foo', 'bar']})
 
         self.assertTrue(self.dialect.has_table('some connection', 'foo'))
         self.assertFalse(self.dialect.has_table('some connection', 'none'))
@@ -249,11 +479,10 @@ class PinotDialectTest(PinotTestCase):
     def test_gets_empty_table_options(self):
         self.assertEqual(self.dialect.get_table_options('conn', 'table'), {})
 
-    @responses.activate
     def test_gets_columns_from_server(self):
         table_name = 'some-table'
         url = f'{self.dialect._controller}/tables/{table_name}/schema'
-        responses.get(url, json={
+        self.controller.get(url, json={
             'tables': [table_name],
             'timeFieldSpec': {},
             'dimensionFieldSpecs': [{'name': 'foo', 'dataType': 'STRING'}],
@@ -284,11 +513,10 @@ class PinotDialectTest(PinotTestCase):
             },
         ])
 
-    @responses.activate
     def test_gets_columns_with_different_default_values(self):
         table_name = 'some-table'
         url = f'{self.dialect._controller}/tables/{table_name}/schema'
-        responses.get(url, json={
+        self.controller.get(url, json={
             'tables': [table_name],
             'timeFieldSpec': {},
             'dimensionFieldSpecs': [{
@@ -309,11 +537,10 @@ class PinotDialectTest(PinotTestCase):
             },
         ])
 
-    @responses.activate
     def test_gets_columns_with_big_decimal_type(self):
         table_name = 'some-table'
         url = f'{self.dialect._controller}/tables/{table_name}/schema'
-        responses.get(url, json={
+        self.controller.get(url, json={
             'tables': [table_name],
             'timeFieldSpec': {},
             'dimensionFieldSpecs': [{
@@ -334,11 +561,10 @@ class PinotDialectTest(PinotTestCase):
             },
         ])
 
-    @responses.activate
     def test_gets_columns_with_time_spec(self):
         table_name = 'some-table'
         url = f'{self.dialect._controller}/tables/{table_name}/schema'
-        responses.get(url, json={
+        self.controller.get(url, json={
             'tables': [table_name],
             'timeFieldSpec': {
                 'incomingGranularitySpec': {
@@ -358,6 +584,165 @@ class PinotDialectTest(PinotTestCase):
             },
         ])
 
+    def test_gets_multi_columns_for_all_tables(self):
+        self.controller.get(
+            f'{self.dialect._controller}/tables',
+            json={'tables': ['foo', 'bar']})
+        self.controller.get(
+            f'{self.dialect._controller}/tables/foo/schema',
+            json={'dimensionFieldSpecs': [
+                {'name': 'a', 'dataType': 'STRING'}]})
+        self.controller.get(
+            f'{self.dialect._controller}/tables/bar/schema',
+            json={'metricFieldSpecs': [{'name': 'b', 'dataType': 'LONG'}]})
+
+        columns = dict(self.dialect.get_multi_columns('conn'))
+
+        self.assertEqual(columns, {
+            (None, 'foo'): [{
+                'default': None,
+                'name': 'a',
+                'nullable': True,
+                'type': String,
+            }],
+            (None, 'bar'): [{
+                'default': None,
+                'name': 'b',
+                'nullable': True,
+                'type': BigInteger,
+            }],
+        })
+
+    def test_gets_multi_columns_for_filtered_tables(self):
+        self.controller.get(
+            f'{self.dialect._controller}/tables',
+            json={'tables': ['foo', 'bar']})
+        self.controller.get(
+            f'{self.dialect._controller}/tables/bar/schema',
+            json={'metricFieldSpecs': [{'name': 'b', 'dataType': 'LONG'}]})
+
+        columns = dict(self.dialect.get_multi_columns(
+            'conn', filter_names=['bar', 'missing']))
+
+        self.assertEqual(list(columns), [(None, 'bar')])
+
+    def test_gets_multi_columns_without_listing_tables_if_named(self):
+        self.controller.get(
+            f'{self.dialect._controller}/tables/foo/schema',
+            json={'dimensionFieldSpecs': [
+                {'name': 'a', 'dataType': 'STRING'}]})
+
+        columns = dict(self.dialect.get_multi_columns(
+            'conn', filter_names=['foo'], scope=ObjectScope.ANY,
+            kind=ObjectKind.ANY))
+
+        self.assertEqual(list(columns), [(None, 'foo')])
+        self.assertEqual(len(self.controller.calls), 1)
+
+    def test_gets_no_multi_columns_for_views(self):
+        columns = self.dialect.get_multi_columns(
+            'conn', kind=ObjectKind.VIEW)
+
+        self.assertEqual(list(columns), [])
+
+    def test_fetches_many_controller_paths_concurrently(self):
+        with patch.object(
+                self.dialect, 'get_metadata_from_controller',
+                side_effect=lambda path: {'path': path}) as get_metadata:
+            payloads = self.dialect.get_many_metadata_from_controller(
+                ['a', 'b', 'c'])
+
+        self.assertEqual(
+            payloads, [{'path': 'a'}, {'path': 'b'}, {'path': 'c'}])
+        self.assertEqual(get_metadata.call_count, 3)
+
+    def test_reflects_metadata_with_a_single_table_listing(self):
+        self.controller.get(
+            f'{self.dialect._controller}/tables',
+            json={'tables': ['foo', 'bar']})
+        for name in ('foo', 'bar'):
+            self.controller.get(
+                f'{self.dialect._controller}/tables/{name}/schema',
+                json={'dimensionFieldSpecs': [
+                    {'name': 'a', 'dataType': 'STRING'}]})
+        registry.register('pinot', 'pinotdb.sqlalchemy', 'PinotDialect')
+        engine = create_engine(
+            'pinot://localhost:8000/query/sql'
+            '?controller=http://localhost:9000')
+
+        metadata = MetaData()
+        metadata.reflect(engine)
+
+        self.assertEqual(sorted(metadata.tables), ['bar', 'foo'])
+        listing_calls = [
+            call for call in self.controller.calls
+            if str(call.url).endswith('/tables')
+        ]
+        self.assertEqual(len(listing_calls), 1)
+
+    def test_reuses_controller_session(self):
+        session = self.dialect.get_controller_session()
+
+        self.assertIs(self.dialect.get_controller_session(), session)
+
+    def test_renews_controller_session_when_settings_change(self):
+        session = self.dialect.get_controller_session()
+
+        self.dialect.update_from_kwargs({'timeout': 3})
+
+        self.assertTrue(session.is_closed)
+        self.assertIsNot(self.dialect.get_controller_session(), session)
+
+    def test_configures_controller_session(self):
+        self.dialect.update_from_kwargs({
+            'username': 'john', 'password': 'secret', 'database': 'db1',
+            'timeout': 3,
+        })
+
+        session = self.dialect.get_controller_session()
+
+        self.assertIsInstance(session.auth, httpx.BasicAuth)
+        self.assertEqual(session.headers['Database'], 'db1')
+        self.assertEqual(session.headers['Accept'], 'application/json')
+        self.assertEqual(session.timeout, httpx.Timeout(3.0))
+
+    def test_retries_metadata_requests_on_transient_status(self):
+        self.dialect.controller_retry_backoff = 0
+        url = f'{self.dialect._controller}/some-path'
+        self.controller.get(url, status=503)
+        self.controller.get(url, json={'foo': 'bar'})
+
+        metadata = self.dialect.get_metadata_from_controller('some-path')
+
+        self.assertEqual(metadata, {'foo': 'bar'})
+        self.assertEqual(len(self.controller.calls), 2)
+
+    def test_counts_retried_metadata_requests(self):
+        self.dialect.controller_retry_backoff = 0
+        url = f'{self.dialect._controller}/some-path'
+        self.controller.get(url, status=503)
+        self.controller.get(url, json={'foo': 'bar'})
+        client_metrics = metrics.enable()
+        self.addCleanup(metrics.disable)
+
+        self.dialect.get_metadata_from_controller('some-path')
+
+        self.assertEqual(client_metrics.retries.get(('controller',)), 1)
+
+    def test_gives_up_on_persistent_transport_errors(self):
+        self.dialect.controller_retry_backoff = 0
+
+        def fail(request):
+            self.controller.calls.append(request)
+            raise httpx.ReadTimeout('timed out', request=request)
+
+        self.controller.handle = fail
+
+        with self.assertRaises(exceptions.OperationalError):
+            self.dialect.get_metadata_from_controller('some-path')
+        self.assertEqual(
+            len(self.controller.calls), self.dialect.controller_retries + 1)
+
     def test_gets_pk_constraint(self):
         result = self.dialect.get_pk_constraint('conn', 'some-table')
 
@@ -411,6 +796,19 @@ class PinotDialectTest(PinotTestCase):
     def test_do_rollback(self):
         self.assertIsNone(self.dialect.do_rollback('conn'))
 
+    @patch('pinotdb.sqlalchemy.pinotdb.connect')
+    def test_streams_results_with_server_side_cursor(self, connect):
+        registry.register('pinot', 'pinotdb.sqlalchemy', 'PinotDialect')
+        engine = create_engine(
+            'pinot://localhost:8000/query/sql'
+            '?controller=http://localhost:9000/')
+
+        with engine.connect() as connection:
+            connection.execution_options(stream_results=True).execute(
+                text('SELECT 1'))
+
+        connect.return_value.cursor.assert_called_with(server_side=True)
+
 
 class PinotMultiStageDialectTest(PinotTestCase):
     def setUp(self) -> None:
@@ -512,6 +910,78 @@ class PinotCompilerTest(PinotTestCase):
 
         self.assertIn('count(*)', str(compiler))
 
+    def test_does_not_modify_compiled_columns(self):
+        metadata = MetaData()
+        table = Table(
+            'some_table', metadata,
+            Column('order', Integer)
+        )
+        statement = select(table.c.order).where(table.c.order > 1)
+
+        compiler = self.dialect.statement_compiler(self.dialect, statement)
+
+        self.assertEqual(
+            str(compiler),
+            'SELECT some_table."order" \nFROM some_table '
+            '\nWHERE some_table."order" > :order_1',
+        )
+        self.assertFalse(table.c.order.is_literal)
+
+    def test_maps_results_to_original_columns(self):
+        metadata = MetaData()
+        table = Table(
+            'some_table', metadata,
+            Column('some_column', Integer)
+        )
+        statement = select(table.c.some_column)
+
+        compiler = self.dialect.statement_compiler(self.dialect, statement)
+
+        targets = compiler._result_columns[0].objects
+        self.assertIn(table.c.some_column, targets)
+
+
+class PinotStatementCacheTest(PinotTestCase):
+    def test_supports_statement_cache_in_every_dialect(self):
+        dialects = [
+            ps.PinotDialect, ps.PinotHTTPSDialect, ps.PinotMultiStageDialect,
+            ps.PinotHTTPSMultiStageDialect, ps.PinotAsyncDialect,
+            ps.PinotHTTPSAsyncDialect, ps.PinotMultiStageAsyncDialect,
+            ps.PinotHTTPSMultiStageAsyncDialect,
+        ]
+
+        for dialect in dialects:
+            self.assertTrue(dialect()._supports_statement_cache, dialect)
+
+    @patch('pinotdb.sqlalchemy.pinotdb.connect')
+    def test_reuses_compiled_statements(self, connect):
+        cursor = connect.return_value.cursor.return_value
+        cursor.description = [
+            ('some_column', None, None, None, None, None, None)]
+        cursor.fetchall.return_value = [[1]]
+        registry.register('pinot', 'pinotdb.sqlalchemy', 'PinotDialect')
+        engine = create_engine(
+            'pinot://localhost:8000/query/sql'
+            '?controller=http://localhost:9000/')
+        metadata = MetaData()
+        table = Table(
+            'some_table', metadata,
+            Column('some_column', Integer)
+        )
+
+        with engine.connect() as connection:
+            results = [
+                connection.execute(
+                    select(table.c.some_column)
+                    .where(table.c.some_column == value)
+                )
+                for value in (1, 2)
+            ]
+
+        hits = [result.context.cache_hit for result in results]
+        self.assertEqual(hits, [default.CACHE_MISS, default.CACHE_HIT])
+        self.assertEqual(results[1].all()[0]._mapping[table.c.some_column], 1)
+
 
 class PinotTypeCompilerTest(PinotTestCase):
     def setUp(self) -> None:
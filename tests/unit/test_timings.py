@@ -0,0 +1,123 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import httpx
+
+try:
+    from unittest import IsolatedAsyncioTestCase
+except ImportError:
+    from mock.backports import IsolatedAsyncioTestCase
+
+from pinotdb import db, timings
+from tests.unit import brokers
+
+# Enough timestamps to take some time converting.
+RESULT = {
+    'rows': [['2024-01-02 03:04:05.0']] * 100,
+    'column_names': ['ts'],
+    'column_data_types': ['TIMESTAMP'],
+}
+
+
+class RequestTimerTest(TestCase):
+    @patch('pinotdb.timings.time.perf_counter')
+    def test_times_request_phases(self, perf_counter):
+        events = [
+            ('connection.connect_tcp.started', 1),
+            ('connection.connect_tcp.complete', 3),
+            ('connection.start_tls.started', 3),
+            ('connection.start_tls.complete', 6),
+            ('http11.send_request_headers.started', 6),
+            ('http11.send_request_headers.complete', 7),
+            ('http11.send_request_body.started', 7),
+            ('http11.send_request_body.complete', 10),
+            ('http11.receive_response_headers.started', 10),
+            ('http11.receive_response_headers.complete', 20),
+            ('http11.receive_response_body.started', 20),
+            ('http11.receive_response_body.complete', 35),
+        ]
+        perf_counter.side_effect = [0] + [t for _, t in events] + [36]
+        result = timings.Timings()
+        timer = timings.RequestTimer(result)
+
+        for event, _ in events:
+            timer(event, {})
+        timer.finish()
+
+        self.assertEqual(result.as_dict(), {
+            'queue': 1, 'connect': 2, 'tls': 3, 'request': 4, 'wait': 10,
+            'download': 15, 'decode': 0.0, 'convert': 0.0, 'total': 0.0,
+        })
+        self.assertEqual(result.time_to_first_byte, 19)
+
+    @patch('pinotdb.timings.time.perf_counter')
+    def test_times_request_on_reused_connection(self, perf_counter):
+        perf_counter.side_effect = [0, 2, 3, 5]
+        result = timings.Timings()
+        timer = timings.RequestTimer(result)
+
+        timer('http11.send_request_headers.started', {})
+        timer('http11.send_request_body.complete', {})
+        timer.finish()
+
+        self.assertEqual(result.queue, 2)
+        self.assertEqual(result.connect, 0)
+        self.assertEqual(result.request, 1)
+
+    @patch('pinotdb.timings.time.perf_counter')
+    def test_counts_untraced_request_as_waiting(self, perf_counter):
+        perf_counter.side_effect = [1, 4]
+        result = timings.Timings()
+
+        timings.RequestTimer(result).finish()
+
+        self.assertEqual(result.wait, 3)
+        self.assertEqual(result.queue, 0)
+
+    def test_forwards_events(self):
+        forward = MagicMock()
+        timer = timings.RequestTimer(timings.Timings(), forward)
+
+        timer('http11.send_request_headers.started', {'a': 1})
+
+        forward.assert_called_once_with(
+            'http11.send_request_headers.started', {'a': 1})
+
+
+class CursorTimingsTest(TestCase):
+    def test_times_query_execution(self):
+        cursor = db.Cursor(
+            host='localhost', session=httpx.Client(
+                transport=brokers.broker(**RESULT)))
+
+        cursor.execute('SELECT ts FROM t')
+
+        t = cursor.timings
+        self.assertGreater(t.wait, 0)
+        self.assertGreater(t.decode, 0)
+        self.assertGreater(t.convert, 0)
+        self.assertGreaterEqual(t.total, t.wait + t.decode + t.convert)
+
+    def test_renews_timings_for_every_execute(self):
+        cursor = db.Cursor(
+            host='localhost', session=httpx.Client(
+                transport=brokers.broker(**RESULT)))
+        cursor.execute('SELECT ts FROM t')
+        first = cursor.timings
+
+        cursor.execute('SELECT ts FROM t')
+
+        self.assertIsNot(cursor.timings, first)
+
+
+class AsyncCursorTimingsTest(IsolatedAsyncioTestCase):
+    async def test_times_query_execution(self):
+        cursor = db.AsyncCursor(
+            host='localhost',
+            session=httpx.AsyncClient(transport=brokers.broker(**RESULT)))
+
+        await cursor.execute('SELECT ts FROM t')
+
+        t = cursor.timings
+        self.assertGreater(t.wait, 0)
+        self.assertGreaterEqual(t.total, t.wait + t.decode + t.convert)
@@ -0,0 +1,141 @@
+from unittest import TestCase, skipIf
+from unittest.mock import patch
+
+import httpx
+
+try:
+    from unittest import IsolatedAsyncioTestCase
+except ImportError:
+    from mock.backports import IsolatedAsyncioTestCase
+
+try:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+except ImportError:
+    TracerProvider = None
+
+from pinotdb import db, tracing
+from tests.unit import brokers
+
+RESULT = {
+    'rows': [['2024-01-02 03:04:05.0']],
+    'column_names': ['ts'],
+    'column_data_types': ['TIMESTAMP'],
+    'numDocsScanned': 97,
+    'timeUsedMs': 3,
+}
+
+
+@skipIf(TracerProvider is None, 'opentelemetry-sdk is not installed')
+class TracingTest(TestCase):
+    def setUp(self):
+        self.exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(self.exporter))
+        patcher = patch.object(
+            tracing, 'tracer', provider.get_tracer('pinotdb'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.broker = brokers.broker(**RESULT)
+
+    def spans(self):
+        return {span.name: span for span in self.exporter.get_finished_spans()}
+
+    def test_traces_query_execution(self):
+        cursor = db.Cursor(
+            host='localhost',
+            session=httpx.Client(transport=self.broker))
+
+        cursor.execute('SELECT ts FROM t')
+
+        spans = self.spans()
+        self.assertEqual(
+            set(spans),
+            {'pinot.query', 'pinot.request', 'pinot.decode', 'pinot.convert'})
+        query = spans['pinot.query']
+        for name in ['pinot.request', 'pinot.decode', 'pinot.convert']:
+            self.assertEqual(
+                spans[name].parent.span_id, query.context.span_id)
+        self.assertEqual(query.attributes['db.system'], 'pinot')
+        self.assertEqual(query.attributes['db.statement'], 'SELECT ts FROM t')
+        self.assertEqual(query.attributes['pinot.numDocsScanned'], 97)
+        self.assertEqual(query.attributes['pinot.timeUsedMs'], 3)
+
+    def test_propagates_trace_context_to_broker(self):
+        cursor = db.Cursor(
+            host='localhost',
+            session=httpx.Client(transport=self.broker))
+
+        cursor.execute('SELECT ts FROM t')
+
+        request_span = self.spans()['pinot.request']
+        traceparent = self.broker.requests[0].headers['traceparent']
+        self.assertIn(f'{request_span.context.trace_id:032x}', traceparent)
+        self.assertIn(f'{request_span.context.span_id:016x}', traceparent)
+        self.assertIn('X-Correlation-Id', self.broker.requests[0].headers)
+
+    def test_traces_request_phases(self):
+        with tracing.span('pinot.request'):
+            phases = tracing.request_phases()
+        for event in [
+            'http11.send_request_headers.started',
+            'http11.send_request_headers.complete',
+            'http11.send_request_body.started',
+            'http11.send_request_body.complete',
+            'http11.receive_response_headers.started',
+            'http11.receive_response_headers.complete',
+            'http11.receive_response_body.started',
+            'http11.receive_response_body.complete',
+        ]:
+            phases(event, {})
+
+        spans = self.spans()
+        self.assertEqual(set(spans), {
+            'pinot.request', 'pinot.request.send', 'pinot.response.wait',
+            'pinot.response.read'})
+        for name in [
+            'pinot.request.send', 'pinot.response.wait',
+            'pinot.response.read',
+        ]:
+            self.assertEqual(
+                spans[name].parent.span_id,
+                spans['pinot.request'].context.span_id)
+        self.assertLessEqual(
+            spans['pinot.request.send'].end_time,
+            spans['pinot.response.wait'].start_time)
+
+    def test_ends_request_phase_on_failure(self):
+        with tracing.span('pinot.request'):
+            phases = tracing.request_phases()
+        phases('http11.send_request_headers.started', {})
+        phases('http11.send_request_headers.failed', {})
+
+        self.assertIn('pinot.request.send', self.spans())
+
+    def test_adds_no_request_phases_if_not_recording(self):
+        self.assertIsNone(tracing.request_phases())
+
+
+@skipIf(TracerProvider is None, 'opentelemetry-sdk is not installed')
+class AsyncTracingTest(IsolatedAsyncioTestCase):
+    async def test_traces_query_execution(self):
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        broker = brokers.broker(**RESULT)
+        cursor = db.AsyncCursor(
+            host='localhost', session=httpx.AsyncClient(transport=broker))
+
+        with patch.object(tracing, 'tracer', provider.get_tracer('pinotdb')):
+            await cursor.execute('SELECT ts FROM t')
+
+        spans = {span.name: span for span in exporter.get_finished_spans()}
+        self.assertEqual(
+            spans['pinot.request'].parent.span_id,
+            spans['pinot.query'].context.span_id)
+        self.assertEqual(
+            spans['pinot.query'].attributes['pinot.numServersQueried'], 1)
+        self.assertIn('traceparent', broker.requests[0].headers)